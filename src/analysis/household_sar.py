@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Household secondary attack rate (SAR) at the start of the exponential growth stage, stratified by
+household size, for one run or an ensemble
+
+Python version of R/secondary_household_attack.R that works on the transmission and individual
+files.  Index cases are the first individual infected in each household among those infected by
+t_first (see `offspring_distribution.first_passage_time`); the SAR is the number of household
+members infected by the index cases (within `t_infect` days of t_first) over the number of
+household members of the index cases, excluding themselves.
+
+Households are indexed once in compressed sparse row (CSR) format (`house_index`), and index cases,
+household sizes and within-household transmissions are found with array operations, so the cost
+is linear in the population size.  Runs of an ensemble are processed in parallel:
+
+    python src/analysis/household_sar.py output/tables/household_sar.csv \
+        --transmission_files data/transmission_Run*.csv \
+        --individual_files data/individual_file_Run*.csv --n_total 1000000 --n_workers 8
+"""
+
+from os.path import join, dirname, abspath
+from multiprocessing import Pool, cpu_count
+import argparse, sys
+
+import numpy as np, pandas as pd
+
+sys.path.append(join(dirname(abspath(__file__)), "..", "viz"))
+import counting, model_output, rates
+
+from offspring_distribution import TOTAL_CASES, T_INFECT, first_passage_time
+
+SAR_COLUMNS = ["ID_source", "ID_recipient", "house_no_source", "house_no_recipient",
+    "time_infected"]
+
+
+def house_index(house_no):
+    """
+    Members of each household in CSR format
+
+    Arguments
+    ---------
+    house_no : np.array
+        Household number of each individual, indexed by ID (from the individual file)
+
+    Returns
+    -------
+    dict with entries offsets (np.array (n_houses + 1, )) and members (np.array (n_individuals, ));
+    the IDs of the members of household h are members[offsets[h]:offsets[h + 1]]
+    """
+    house_no = np.asarray(house_no, dtype = np.int64)
+
+    offsets = np.zeros(house_no.max() + 2, dtype = np.int64)
+    offsets[1:] = np.cumsum(np.bincount(house_no))
+
+    return({"offsets": offsets, "members": np.argsort(house_no, kind = "stable")})
+
+
+def house_sizes(index):
+    """Number of members of each household"""
+    return(np.diff(index["offsets"]))
+
+
+def index_cases(id_infected, time_infected, house_no):
+    """
+    First individual infected in each household (ties are broken by order of the file)
+
+    Arguments
+    ---------
+    id_infected, time_infected : np.array
+        IDs and days of infection of infected individuals
+    house_no : np.array
+        Household number of each individual, indexed by ID
+
+    Returns
+    -------
+    np.array of IDs of index cases
+    """
+    id_infected = np.asarray(id_infected, dtype = np.int64)
+
+    order = np.argsort(time_infected, kind = "stable")
+    id_infected = id_infected[order]
+
+    _, first = np.unique(house_no[id_infected], return_index = True)
+    return(id_infected[first])
+
+
+def household_transmissions(df_trans, t_last, n_individuals):
+    """
+    Number of members of their own household infected by each individual by day `t_last`
+    """
+    within_house = (df_trans.house_no_source.values == df_trans.house_no_recipient.values) & \
+        (df_trans.ID_source.values != df_trans.ID_recipient.values) & \
+        (df_trans.time_infected.values <= t_last)
+
+    return(np.bincount(df_trans.ID_source.values[within_house], minlength = n_individuals))
+
+
+def household_sar_counts(df_trans, house_no, t_first, t_infect = T_INFECT):
+    """
+    Secondary infections and household contacts of index cases by household size
+
+    Arguments
+    ---------
+    df_trans : pandas.DataFrame
+        Transmission file (with the columns in SAR_COLUMNS)
+    house_no : np.array
+        Household number of each individual, indexed by ID
+    t_first : int
+        Last day of infection of index cases
+    t_infect : int
+        Days after t_first over which secondary infections are counted
+
+    Returns
+    -------
+    secondary, contacts : np.array, np.array
+        Number of household members infected by index cases, and number of household members of
+        index cases (excluding themselves), in households of size 0, 1, 2, ...
+    """
+    house_no = np.asarray(house_no, dtype = np.int64)
+    index = house_index(house_no)
+    size = house_sizes(index)
+
+    time_infected = df_trans.time_infected.values
+    infected = (time_infected > 0) & (time_infected <= t_first)
+    cases = index_cases(df_trans.ID_recipient.values[infected], time_infected[infected],
+        house_no)
+
+    n_trans = household_transmissions(df_trans, t_first + t_infect, len(house_no))[cases]
+    case_size = size[house_no[cases]]
+
+    secondary = np.bincount(case_size, weights = n_trans, minlength = size.max() + 1)
+    contacts = np.bincount(case_size, weights = case_size - 1, minlength = size.max() + 1)
+
+    return(secondary.astype(np.int64), contacts.astype(np.int64))
+
+
+def run_household_sar(transmission_file, individual_file, n_total, total_cases = TOTAL_CASES,
+        t_infect = T_INFECT):
+    """
+    Household SAR counts of one run (see `household_sar_counts`)
+
+    Returns
+    -------
+    dict with entries file, t_first, secondary, and contacts; t_first is NaN and secondary and
+    contacts are empty if the run never reached `total_cases`
+    """
+    df_trans = model_output.read_transmissions(transmission_file, columns = SAR_COLUMNS)
+    df_indiv = model_output.read_individuals(individual_file, columns = ["ID", "house_no"])
+
+    house_no = np.zeros(df_indiv.shape[0], dtype = np.int64)
+    house_no[df_indiv.ID.values] = df_indiv.house_no.values
+
+    try:
+        t_first = first_passage_time(df_trans.time_infected.values, n_total, total_cases)
+    except ValueError:
+        empty = np.zeros(0, dtype = np.int64)
+        return({"file": transmission_file, "t_first": np.nan, "secondary": empty,
+            "contacts": empty})
+
+    secondary, contacts = household_sar_counts(df_trans, house_no, t_first, t_infect)
+
+    return({"file": transmission_file, "t_first": t_first, "secondary": secondary,
+        "contacts": contacts})
+
+
+def sar_table(runs, n_bootstrap = rates.N_BOOTSTRAP):
+    """
+    Household SAR by household size (and overall) of each run and of all runs pooled (file
+    "pooled"), with bootstrap confidence intervals (see `rates.stratified_rates`)
+
+    Runs that never reached `total_cases` (t_first is NaN) have a single row of NaN and are not
+    pooled.
+
+    Returns
+    -------
+    pandas.DataFrame with columns file, t_first, house_size, secondary, contacts, sar, lower, upper
+    """
+    reached = [run for run in runs if np.isfinite(run["t_first"])]
+    empty = np.zeros(0, dtype = np.int64)
+
+    pooled = {"file": "pooled", "t_first": np.nan,
+        "secondary": counting.combine_counts([run["secondary"] for run in reached] or [empty]),
+        "contacts": counting.combine_counts([run["contacts"] for run in reached] or [empty])}
+
+    dfs = []
+    for run in runs + [pooled]:
+        if len(run["contacts"]) == 0:
+            dfs.append(pd.DataFrame({"file": [run["file"]], "t_first": run["t_first"],
+                "house_size": "overall", "secondary": 0, "contacts": 0, "sar": np.nan,
+                "lower": np.nan, "upper": np.nan}))
+            continue
+
+        # Households of size 1 have no contacts
+        secondary, contacts = run["secondary"][2:], run["contacts"][2:]
+
+        df = rates.stratified_rates(secondary, contacts, n_bootstrap,
+            labels = np.arange(2, len(contacts) + 2))
+        df = df.rename(columns = {"stratum": "house_size", "numerator": "secondary",
+            "denominator": "contacts", "rate": "sar"})
+        df.insert(0, "t_first", run["t_first"])
+        df.insert(0, "file", run["file"])
+        dfs.append(df)
+
+    return(pd.concat(dfs, ignore_index = True))
+
+
+def household_sar_ensemble(transmission_files, individual_files, n_total,
+        total_cases = TOTAL_CASES, t_infect = T_INFECT, n_workers = None):
+    """
+    Household SAR counts of several runs, with runs processed in parallel over `n_workers`
+    processes (defaults to the number of CPUs)
+
+    Arguments
+    ---------
+    transmission_files, individual_files : list of str
+        Files of each run (a single individual file is used for all runs)
+
+    Returns
+    -------
+    list of dict (see `run_household_sar`)
+    """
+    if len(individual_files) == 1:
+        individual_files = individual_files*len(transmission_files)
+
+    tasks = [(trans_file, indiv_file, n_total, total_cases, t_infect)
+        for trans_file, indiv_file in zip(transmission_files, individual_files)]
+
+    if len(tasks) == 1:
+        return([run_household_sar(*tasks[0])])
+
+    n_workers = n_workers if n_workers else cpu_count()
+    with Pool(processes = min(n_workers, len(tasks))) as pool:
+        return(pool.starmap(run_household_sar, tasks, chunksize = 1))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = __doc__.split("\n\n")[0])
+    parser.add_argument("output_file", help = "Output CSV file")
+    parser.add_argument("--transmission_files", nargs = "+", required = True,
+        help = "Transmission file of each run")
+    parser.add_argument("--individual_files", nargs = "+", required = True,
+        help = "Individual file of each run (or one individual file for all runs)")
+    parser.add_argument("--n_total", type = int, help = "Population size", default = 1000000)
+    parser.add_argument("--total_cases", type = float,
+        help = "Fraction of the population infected by t_first", default = TOTAL_CASES)
+    parser.add_argument("--t_infect", type = int,
+        help = "Days after t_first over which secondary infections are counted",
+        default = T_INFECT)
+    parser.add_argument("--n_workers", type = int,
+        help = "Number of worker processes (defaults to number of CPUs)", default = None)
+    args = parser.parse_args()
+
+    runs = household_sar_ensemble(args.transmission_files, args.individual_files, args.n_total,
+        args.total_cases, args.t_infect, args.n_workers)
+
+    sar_table(runs).to_csv(args.output_file, index = False)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Offspring and sibling distributions at the start of the exponential growth stage, and negative
+binomial fits of the offspring distribution (mean and dispersion k), for one run or an ensemble
+
+Python version of R/figS20-offspring-distribution.R that works on transmission files.  The parents
+are those infected by t_first, the first day on which more than a fraction `total_cases` of the
+population has been infected; their offspring are counted over the following `t_infect` days
+(including parents who infected no one).  The negative binomial is fitted by maximum likelihood on
+the histogram of offspring counts, so the cost of a fit depends on the largest number of offspring
+rather than on the number of parents, and runs of an ensemble are processed in parallel:
+
+    python src/analysis/offspring_distribution.py output/tables/offspring \
+        data/transmission_Run*.csv --n_total 1000000 --n_workers 8
+
+writes the fit of each run (and of all runs pooled) to output/tables/offspring_fits.csv and the
+pooled offspring/sibling distributions to output/tables/offspring_distribution.csv.
+"""
+
+from os.path import join, dirname, abspath
+from functools import partial
+from multiprocessing import Pool, cpu_count
+import argparse, sys
+
+import numpy as np, pandas as pd
+from scipy import optimize, special, stats
+
+sys.path.append(join(dirname(abspath(__file__)), "..", "viz"))
+import counting, model_output, rolling
+
+# Fraction of the population infected by t_first, and days over which offspring are counted
+TOTAL_CASES = 0.01
+T_INFECT = 30
+
+OFFSPRING_COLUMNS = ["ID_source", "ID_recipient", "time_infected"]
+
+
+def first_passage_time(time_infected, n_total, total_cases = TOTAL_CASES):
+    """
+    First day on which the total number infected exceeds a fraction `total_cases` of the population
+
+    Arguments
+    ---------
+    time_infected : np.array
+        Day of infection of each infected individual (from the transmission file)
+    n_total : int
+        Population size
+    total_cases : float
+        Fraction of the population
+
+    Returns
+    -------
+    int (day)
+    """
+    total_infected = np.cumsum(rolling.daily_counts(time_infected))
+    days = np.flatnonzero(total_infected > n_total*total_cases)
+
+    if len(days) == 0:
+        raise ValueError("Fewer than {} of the population were infected".format(total_cases))
+    return(int(days[0]))
+
+
+def offspring_counts(id_source, id_recipient, time_infected, t_first, t_infect = T_INFECT):
+    """
+    Number of individuals infected within `t_infect` days of t_first by each parent (individuals
+    infected on days 1, ..., t_first), including parents who infected no one
+
+    Returns
+    -------
+    np.array of number of offspring of each parent
+    """
+    id_source = np.asarray(id_source, dtype = np.int64)
+    id_recipient = np.asarray(id_recipient, dtype = np.int64)
+    time_infected = np.asarray(time_infected)
+
+    parents = id_recipient[(time_infected > 0) & (time_infected <= t_first)]
+
+    transmitted = (id_source != id_recipient) & (time_infected <= t_first + t_infect)
+    n_individuals = int(max(id_source.max(), id_recipient.max())) + 1
+    offspring = np.bincount(id_source[transmitted], minlength = n_individuals)
+
+    return(offspring[parents])
+
+
+def nb_log_likelihood(counts, mu, k):
+    """
+    Log-likelihood of a negative binomial (mean mu, dispersion k) given a histogram of counts
+    (counts[n] is the number of parents with n offspring)
+    """
+    n = np.arange(len(counts))
+    log_pmf = special.gammaln(n + k) - special.gammaln(k) - special.gammaln(n + 1) + \
+        k*np.log(k/(k + mu)) + n*np.log(mu/(k + mu))
+    return(np.sum(counts*log_pmf))
+
+
+def fit_negative_binomial(counts):
+    """
+    Maximum likelihood estimates of the mean (mu) and dispersion (k) of a negative binomial from a
+    histogram of counts
+
+    The MLE of mu is the sample mean; k solves the profile score equation
+    sum_n counts[n] (digamma(n + k) - digamma(k)) + N log(k/(k + mu)) = 0, which is evaluated over
+    the distinct values of n only.  k is infinite (Poisson) if the counts are not overdispersed.
+
+    Arguments
+    ---------
+    counts : np.array
+        Number of parents with 0, 1, 2, ... offspring
+
+    Returns
+    -------
+    mu, k : float, float
+    """
+    counts = np.asarray(counts, dtype = float)
+    n = np.arange(len(counts))
+    observed = counts > 0
+    n, counts = n[observed], counts[observed]
+
+    N = counts.sum()
+    mu = np.sum(n*counts)/N
+    variance = np.sum((n - mu)**2*counts)/N
+
+    if mu == 0 or variance <= mu:
+        return(mu, np.inf)
+
+    def score(log_k):
+        k = np.exp(log_k)
+        digamma = special.digamma(n + k) - special.digamma(k)
+        return(np.sum(counts*digamma) + N*np.log(k/(k + mu)))
+
+    # The score is positive for small k; widen the upper bound until it is negative
+    lower, upper = np.log(1e-8), np.log(mu**2/(variance - mu)) + 1
+    while score(upper) > 0:
+        if upper > np.log(1e12):
+            return(mu, np.inf)
+        upper += 2
+
+    return(mu, float(np.exp(optimize.brentq(score, lower, upper))))
+
+
+def distribution_table(counts, mu = None, k = None):
+    """
+    Sample (and fitted negative binomial) offspring and sibling distributions and the cumulative
+    fractions of offspring and transmissions, as in R/figS20-offspring-distribution.R
+
+    Returns
+    -------
+    pandas.DataFrame with one row per observed number of offspring N
+    """
+    counts = np.asarray(counts)
+    N = np.flatnonzero(counts)
+    count = counts[N]
+
+    df = pd.DataFrame({"N": N, "count": count, "tot_trans": N*count})
+    df["prob_offspring"] = df["count"]/df["count"].sum()
+    df["prob_sibling"] = df["tot_trans"]/df["tot_trans"].sum()
+
+    if mu is not None:
+        if np.isfinite(k):
+            df["prob_offspring_fit_nb"] = stats.nbinom.pmf(N, k, k/(k + mu))
+        else:
+            df["prob_offspring_fit_nb"] = stats.poisson.pmf(N, mu)
+        sibling = df["prob_offspring_fit_nb"]*N
+        df["prob_sibling_fit_nb"] = sibling/sibling.sum()
+
+    df["frac_count"] = np.cumsum(count)/count.sum()
+    df["frac_tot_trans"] = np.cumsum(N*count)/np.sum(N*count)
+
+    return(df)
+
+
+def run_offspring(transmission_file, n_total, total_cases = TOTAL_CASES, t_infect = T_INFECT):
+    """
+    Histogram of offspring counts of the parents of one run (see module docstring)
+
+    Returns
+    -------
+    dict with entries file, t_first, and counts (np.array of number of parents with 0, 1, 2, ...
+    offspring); t_first is NaN and counts is empty if the run never reached `total_cases`
+    """
+    df_trans = model_output.read_transmissions(transmission_file, columns = OFFSPRING_COLUMNS)
+
+    try:
+        t_first = first_passage_time(df_trans.time_infected.values, n_total, total_cases)
+    except ValueError:
+        return({"file": transmission_file, "t_first": np.nan,
+            "counts": np.zeros(0, dtype = np.int64)})
+
+    offspring = offspring_counts(df_trans.ID_source.values, df_trans.ID_recipient.values,
+        df_trans.time_infected.values, t_first, t_infect)
+
+    return({"file": transmission_file, "t_first": t_first, "counts": np.bincount(offspring)})
+
+
+def pooled_counts(runs):
+    """Histogram of offspring counts of all runs that reached `total_cases` (see `run_offspring`)"""
+    return(counting.combine_counts([run["counts"] for run in runs if np.isfinite(run["t_first"])]
+        or [np.zeros(0, dtype = np.int64)]))
+
+
+def fit_table(runs):
+    """
+    Negative binomial fit of each run, and of all runs pooled (last row, file "pooled")
+
+    Runs that never reached `total_cases` (t_first is NaN) have a row of NaN and are not pooled.
+
+    Arguments
+    ---------
+    runs : list of dict
+        Output of `run_offspring` for each run
+
+    Returns
+    -------
+    pandas.DataFrame with columns file, t_first, n_parents, variance, mu (mean), k, log_likelihood
+    """
+    pooled = {"file": "pooled", "t_first": np.nan, "counts": pooled_counts(runs)}
+
+    rows = []
+    for run in runs + [pooled]:
+        counts = run["counts"]
+        n_parents = counts.sum()
+
+        if n_parents == 0:
+            rows.append({"file": run["file"], "t_first": run["t_first"], "n_parents": 0,
+                "variance": np.nan, "mu": np.nan, "k": np.nan, "log_likelihood": np.nan})
+            continue
+
+        n = np.arange(len(counts))
+        mu, k = fit_negative_binomial(counts)
+
+        rows.append({"file": run["file"], "t_first": run["t_first"], "n_parents": n_parents,
+            "variance": np.sum((n - mu)**2*counts)/n_parents, "mu": mu, "k": k,
+            "log_likelihood": nb_log_likelihood(counts, mu, k) if np.isfinite(k) else np.nan})
+
+    return(pd.DataFrame(rows))
+
+
+def offspring_ensemble(transmission_files, n_total, total_cases = TOTAL_CASES,
+        t_infect = T_INFECT, n_workers = None):
+    """
+    Offspring histograms of several runs, with runs processed in parallel over `n_workers`
+    processes (defaults to the number of CPUs)
+
+    Returns
+    -------
+    list of dict (see `run_offspring`)
+    """
+    func = partial(run_offspring, n_total = n_total, total_cases = total_cases,
+        t_infect = t_infect)
+
+    if len(transmission_files) == 1:
+        return([func(transmission_files[0])])
+
+    n_workers = n_workers if n_workers else cpu_count()
+    with Pool(processes = min(n_workers, len(transmission_files))) as pool:
+        return(pool.map(func, transmission_files, chunksize = 1))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = __doc__.split("\n\n")[0])
+    parser.add_argument("output_prefix", help = "Prefix of the output CSV files")
+    parser.add_argument("transmission_files", nargs = "+",
+        help = "Transmission file of each run")
+    parser.add_argument("--n_total", type = int, help = "Population size", default = 1000000)
+    parser.add_argument("--total_cases", type = float,
+        help = "Fraction of the population infected by t_first", default = TOTAL_CASES)
+    parser.add_argument("--t_infect", type = int,
+        help = "Days after t_first over which offspring are counted", default = T_INFECT)
+    parser.add_argument("--n_workers", type = int,
+        help = "Number of worker processes (defaults to number of CPUs)", default = None)
+    args = parser.parse_args()
+
+    runs = offspring_ensemble(args.transmission_files, args.n_total, args.total_cases,
+        args.t_infect, args.n_workers)
+
+    df_fits = fit_table(runs)
+    df_fits.to_csv(args.output_prefix + "_fits.csv", index = False)
+
+    pooled = df_fits.iloc[-1]
+    counts = pooled_counts(runs)
+    df_dist = distribution_table(counts, pooled["mu"], pooled["k"])
+    df_dist.to_csv(args.output_prefix + "_distribution.csv", index = False)
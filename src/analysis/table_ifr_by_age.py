@@ -3,43 +3,58 @@
 Table of infection fatality ratio (IFR) stratified by age
 """
 
-from os.path import join
+from os.path import join, dirname, abspath
 
 import pandas as pd, numpy as np, sys
 from matplotlib import pyplot as plt
 
-from COVID19.model import AgeGroupEnum, EVENT_TYPES, TransmissionTypeEnum, OccupationNetworkEnum
+sys.path.append(join(dirname(abspath(__file__)), "..", "viz"))
+import rates, transmission_aggregates
+
+from model_enums import AgeGroupEnum, EVENT_TYPES, TransmissionTypeEnum, OccupationNetworkEnum
 
 n_age = len(AgeGroupEnum)
 age_group_labels = [enum.name[1:].replace("_","-") for enum in AgeGroupEnum]
 age_group_labels[-1] = "80+"
 
-if __name__ == "__main__":
-    numerator_var = "time_death"
-    denominator_var = "time_infected"
-    age_group_var = "age_group_recipient"
+
+def ifr_table(aggregates, n_bootstrap = rates.N_BOOTSTRAP):
+    """
+    Table of IFR (%) by age group and for the whole population, with bootstrap 95% confidence
+    intervals
     
-    transmission_file = sys.argv[1]
-    output_table = sys.argv[2]
+    Arguments
+    ---------
+    aggregates : dict
+        Aggregates of the transmission file (see `transmission_aggregates`)
+    n_bootstrap : int
+        Number of bootstrap replicates (confidence intervals are NaN if 0)
+    
+    Returns
+    -------
+    pandas.DataFrame of IFR by age group (formatted for output)
+    """
+    df_rates = transmission_aggregates.ifr_by_age(aggregates, n_bootstrap)
     
-    df_trans = pd.read_csv(transmission_file)
+    col_titles = ["Age group", "Infection fatality ratio (IFR; %)", 
+        "Lower 95% CI (%)", "Upper 95% CI (%)"]
+    col_age = age_group_labels + [ "Whole population" ]
     
-    bins = np.arange(0, n_age + 1) - 0.5
+    df_ifr = pd.DataFrame({"age_group": col_age})
+    for col in ["rate", "lower", "upper"]:
+        df_ifr[col] = (df_rates[col].values*100).astype(float)
+        df_ifr[col] = df_ifr[col].map("{:,.4f}".format)
+    df_ifr.columns = col_titles
     
-    height_n, bins_n = np.histogram(df_trans[df_trans[numerator_var] > 0][age_group_var], 
-        bins, density = False)
-    height_d, bins_d = np.histogram(df_trans[df_trans[denominator_var] > 0][age_group_var], 
-        bins, density = False)
+    return(df_ifr)
+
+
+if __name__ == "__main__":
     
-    heights = np.divide(height_n, height_d)
-    overall_ifr = height_n.sum()/height_d.sum()
+    transmission_file = sys.argv[1]
+    output_table = sys.argv[2]
     
-    col_titles = ["Age group", "Infection fatality ratio (IFR; %)"]
-    col_age = age_group_labels + [ "Whole population" ]
-    col_ifr = np.insert(heights, len(heights), overall_ifr)
+    aggregates = transmission_aggregates.load_aggregates(transmission_file)
     
-    df_ifr = pd.DataFrame({"age_group": col_age, "ifr": col_ifr*100})
-    df_ifr.ifr = df_ifr.ifr.map("{:,.4f}".format)
-    df_ifr.columns = col_titles
+    df_ifr = ifr_table(aggregates)
     df_ifr.to_csv(output_table, index = False)
-
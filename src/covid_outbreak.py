@@ -4,23 +4,38 @@ Python script to run OpenABM-Covid19 with a basic intervention scenario of self-
 symptoms or positive test, and lockdown.  Triggers for self-isolation on symptoms and lockdown
 are based upon prevalence.  
 
+An ensemble of independent replicates (one per random seed) can be run across a pool of worker
+processes using --n_replicates and --n_workers.  Replicate i uses the seed rng_seed + i - 1 and
+writes output files with the suffix _Run<i>; seeds used are recorded in rng_seeds.csv.
+
+Alternatively, several scenarios can be branched from a shared simulated prefix using the
+--branch_* arguments.  The simulation is run once until self-isolation is triggered and the
+process is forked once per self-quarantine fraction; each of these is run until lockdown is
+triggered and forked again once per combination of lockdown duration and app timing.  Forked
+processes inherit the in-memory state of the model at the trigger point (including the state of
+the random number generator) so the shared prefix is only simulated once.  Branch i writes output
+files with the suffix _Run<i>; the parameters of each branch are recorded in branches.csv.
+
 Created: August 2020
 Authors: p-robot, aneln
 """
 
-import argparse, numpy as np, pandas as pd
-from os.path import join
+import argparse, numpy as np, pandas as pd, sys
+from os.path import join, dirname, abspath, exists
+from itertools import product
+from multiprocessing import Pool, cpu_count, get_context
 
 from COVID19.model import Model, Parameters, ModelParameterException
 import COVID19.simulation as simulation
 
+sys.path.append(join(dirname(abspath(__file__)), "viz"))
+import model_output
 
-if __name__ == "__main__":
-    
-    ################################
-    # Parse command-line arguments #
-    ################################
 
+def build_parser():
+    """
+    Build the parser of command-line arguments (see `parse_args`)
+    """
     parser = argparse.ArgumentParser()
 
     # -------------------------
@@ -61,17 +76,107 @@ if __name__ == "__main__":
     parser.add_argument("--file_prefix", type = str,
         help = "Prefix of timeseries files", default = "covid19_timeseries")
 
+    parser.add_argument("--output_format", type = str, choices = model_output.OUTPUT_FORMATS,
+        help = "Format of output files (parquet and feather files are typed and compressed)",
+        default = "csv")
+
+    # -------------------------
+    # Ensemble parameters
+    # -------------------------
+
+    parser.add_argument("--n_replicates", type = int,
+        help = "Number of replicate simulations (each with a different random seed)", default = 1)
+
+    parser.add_argument("--n_workers", type = int,
+        help = "Number of worker processes used to run replicates (defaults to number of CPUs)",
+        default = None)
+
+    # -------------------------
+    # Branching parameters (scenarios forked from a shared simulated prefix)
+    # -------------------------
+
+    parser.add_argument("--branch_self_quarantine_fractions", type = float, nargs = "+",
+        help = "Self-quarantine fractions of branches forked when self-isolation is triggered",
+        default = None)
+
+    parser.add_argument("--branch_lockdown_durations", type = int, nargs = "+",
+        help = "Lockdown durations (days) of branches forked when lockdown is triggered",
+        default = None)
+
+    parser.add_argument("--branch_app_turn_on", type = int, nargs = "+",
+        help = "Days before the end of lockdown at which the app is turned on in branches "
+        "forked when lockdown is triggered (-1 for the app not to be turned on)",
+        default = None)
+
+    return(parser)
+
+
+def parse_args(parser = None):
+    """
+    Parse command-line arguments
+
+    Arguments
+    ---------
+    parser : argparse.ArgumentParser
+        Parser of command-line arguments (defaults to that from `build_parser`)
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Project-specific arguments
+    param_dict : dict
+        Dictionary of param-name: param-value of all remaining arguments (these are interpreted
+        as parameters native to the model)
+    """
+    if parser is None:
+        parser = build_parser()
+
     # ---------------------------------------------------------------------------
     # All remaining parameters are interpreted as parameters native to the model
     # ---------------------------------------------------------------------------
 
     args, additional_args = parser.parse_known_args()
 
+    if args.n_replicates < 1:
+        parser.error("--n_replicates must be at least 1")
+
+    branching = any(a is not None for a in [args.branch_self_quarantine_fractions,
+        args.branch_lockdown_durations, args.branch_app_turn_on])
+    if branching and args.n_replicates > 1:
+        parser.error("--branch_* arguments and --n_replicates > 1 can't be combined")
+
+    # The app is turned on during lockdown, so no earlier than the start of the shortest lockdown
+    lockdown_durations = args.branch_lockdown_durations or [args.lockdown_duration]
+    if args.branch_app_turn_on and max(args.branch_app_turn_on) > min(lockdown_durations):
+        parser.error("--branch_app_turn_on ({}) must not exceed the lockdown duration ({} "
+            "days)".format(max(args.branch_app_turn_on), min(lockdown_durations)))
+
     # Parse the additional args to create a param-name: param-value dictionary
     additional_args = [a[2:] if "--" in a else a for a in additional_args]
     param_dict = dict(zip(additional_args[::2], additional_args[1::2]))
-    print(param_dict)
 
+    return(args, param_dict)
+
+
+def create_simulation(args, param_dict, run = 1, rng_seed = None):
+    """
+    Instantiate the model/simulation object for a single run of the scenario
+
+    Arguments
+    ---------
+    args : argparse.Namespace
+        Project-specific arguments (see `parse_args`)
+    param_dict : dict
+        Dictionary of param-name: param-value of parameters native to the model
+    run : int
+        Run number; used as the model's param_id so output files are suffixed with _Run<run>
+    rng_seed : int
+        Random seed of the model (defaults to the seed in the parameter file or `param_dict`)
+
+    Returns
+    -------
+    sim, params : COVID19.simulation.Simulation, COVID19.model.Parameters
+    """
     params = Parameters(
         args.input_parameter_file, 
         args.parameter_line_number, 
@@ -80,16 +185,26 @@ if __name__ == "__main__":
 
     # Set any parameter values that have been passed to the model
     params.set_param_dict(param_dict)
-    
+    params.set_param("param_id", run)
+
+    if rng_seed is not None:
+        params.set_param("rng_seed", rng_seed)
+
     end_time = params.get_param( "end_time" )
 
     # Instantiate the model/simulation object
     model = simulation.COVID19IBM(model = Model(params))
     sim = simulation.Simulation(env = model, end_time = end_time )
-    
+
+    return(sim, params)
+
+
+def run_to_intervention(sim, params, args):
+    """
+    Start the epidemic and run until the prevalence trigger for self-isolation is met
+    """
     # Start the epidemic
     sim.steps(1)
-    et = 1 # record elapsed time
     
     # Write the interactions file on the first day of the simulation
     sim.env.model.write_interactions_file()
@@ -97,41 +212,278 @@ if __name__ == "__main__":
     # Turn on self-isolation on symptoms when a specific prevalence is met
     while ( ( sim.results["total_infected"][ -1]/params.get_param("n_total") ) < args.intervention_prevalence_trigger/100. ):
         sim.steps(1)
-        et += 1
     
+
+def start_self_isolation(sim, self_quarantine_fraction):
+    """
+    Turn on self-isolation on symptoms and on positive test
+    """
     # During self-isolation, assume a specific proportion of population self-isolate 
     # (with their HH) on symptoms, and also do so on return of a positive test
-    sim.env.model.update_running_params( "self_quarantine_fraction", args.intervention_self_quarantine_fraction )
+    sim.env.model.update_running_params( "self_quarantine_fraction", self_quarantine_fraction )
     sim.env.model.update_running_params( "quarantine_household_on_symptoms", 1 )
     sim.env.model.update_running_params( "quarantine_household_on_positive", 1 )
     
+
+def run_to_lockdown(sim, params, args):
+    """
+    Run until the prevalence trigger for lockdown is met
+    """
     # Turn lockdown on when a specific prevalence of population infected
     while ( ( sim.results["total_infected"][ -1]/params.get_param("n_total") ) < args.lockdown_prevalence_trigger/100. ):
         sim.steps(1)
-        et += 1
     
+
+def run_lockdown(sim, lockdown_duration, app_turn_on = None):
+    """
+    Turn lockdown on and run for the duration of lockdown
+
+    Arguments
+    ---------
+    sim : COVID19.simulation.Simulation
+        Simulation object
+    lockdown_duration : int
+        Duration of lockdown (days)
+    app_turn_on : int
+        Number of days before the end of lockdown at which the app is turned on (the app is
+        not turned on if None)
+
+    Returns
+    -------
+    el : int
+        Elapsed time in lockdown
+    """
     sim.env.model.update_running_params("lockdown_on", 1)
-    
+
+    app_time = lockdown_duration - (7 if app_turn_on is None else app_turn_on)
+
     el = 0 # elapsed lockdown
-    while el < (args.lockdown_duration - 7):
+    while el < app_time:
         sim.steps(1)
-        et += 1
         el += 1
-    
-    # >> Turn app on here if being simulated (a week before the end of lockdown)
-    
-    while el < args.lockdown_duration:
+
+    # Turn app on here if being simulated (e.g. a week before the end of lockdown)
+    if app_turn_on is not None:
+        sim.env.model.update_running_params("app_turned_on", 1)
+
+    while el < lockdown_duration:
         sim.steps(1)
-        et += 1
         el += 1
-    
-    print("Elapsed time:", el)
-    
-    # Write output files
+
+    return(el)
+
+
+def run_scenario(sim, params, args):
+    """
+    Run the self-isolation and lockdown scenario
+
+    Arguments
+    ---------
+    sim : COVID19.simulation.Simulation
+        Simulation object as returned from `create_simulation`
+    params : COVID19.model.Parameters
+        Parameter object used to create the simulation
+    args : argparse.Namespace
+        Project-specific arguments (see `parse_args`)
+
+    Returns
+    -------
+    el : int
+        Elapsed time in lockdown
+    """
+    run_to_intervention(sim, params, args)
+    start_self_isolation(sim, args.intervention_self_quarantine_fraction)
+    run_to_lockdown(sim, params, args)
+
+    return(run_lockdown(sim, args.lockdown_duration))
+
+
+def write_outputs(sim, output_dir, run = 1, output_format = "csv"):
+    """
+    Write transmission, individual and timeseries files of a simulation
+
+    Files are written as CSV by the model and converted to `output_format` (the interactions
+    file, written on the first day of the simulation, is also converted if present).
+    """
     sim.env.model.write_transmissions()
     sim.env.model.write_individual_file()
-    
+
+    schemas = {
+        "transmission": model_output.TRANSMISSION_SCHEMA,
+        "individual_file": model_output.INDIVIDUAL_SCHEMA,
+        "interactions": model_output.INTERACTION_SCHEMA
+    }
+
+    for prefix, schema in schemas.items():
+        csv_file = join(output_dir, "{}_Run{}.csv".format(prefix, run))
+
+        if (prefix != "interactions") or exists(csv_file):
+            model_output.convert_output(csv_file, output_format, schema)
+
     # Write timeseries file
     timeseries = pd.DataFrame( sim.results )
-    timeseries.to_csv(join(args.output_dir, "covid_timeseries_Run1.csv"), index = False)
+    model_output.write_output(timeseries,
+        join(output_dir, "covid_timeseries_Run{}.csv".format(run)), output_format,
+        model_output.TIMESERIES_SCHEMA)
+
+
+def run_replicate(args, param_dict, run, rng_seed):
+    """
+    Create, run, and write output from a single replicate of the scenario
+    """
+    sim, params = create_simulation(args, param_dict, run = run, rng_seed = rng_seed)
+    el = run_scenario(sim, params, args)
+
+    print("Run {} (rng_seed {}) elapsed time: {}".format(run, rng_seed, el))
+
+    write_outputs(sim, args.output_dir, run = run, output_format = args.output_format)
+
+    return(run, rng_seed)
+
+
+def set_run(params, run):
+    """
+    Set the run number (param_id) of a running model so output files are suffixed with _Run<run>
+
+    The model holds a pointer to the parameter struct of `params` so this also applies to a model
+    that is already running (e.g. in a branch forked from a shared prefix).
+    """
+    params.set_param("param_id", run)
+
+
+def branch_grid(args):
+    """
+    Return a DataFrame of all branches (one row per combination of branching parameters)
+    """
+    self_quarantine_fractions = args.branch_self_quarantine_fractions or \
+        [args.intervention_self_quarantine_fraction]
+    lockdown_durations = args.branch_lockdown_durations or [args.lockdown_duration]
+    app_turn_on = args.branch_app_turn_on or [-1]
+
+    df_branches = pd.DataFrame(
+        list(product(self_quarantine_fractions, lockdown_durations, app_turn_on)),
+        columns = ["self_quarantine_fraction", "lockdown_duration", "app_turn_on"])
+    df_branches.insert(0, "run", np.arange(1, df_branches.shape[0] + 1))
+
+    return(df_branches)
+
+
+# Simulation state at the most recent trigger point; inherited by forked branch processes
+_snapshot = {}
+
+
+def _run_lockdown_branch(run, lockdown_duration, app_turn_on):
+    """
+    Continue a simulation from the lockdown trigger point (runs in a forked process)
+    """
+    sim, params, args = _snapshot["sim"], _snapshot["params"], _snapshot["args"]
+
+    set_run(params, run)
+    run_lockdown(sim, lockdown_duration, None if app_turn_on < 0 else app_turn_on)
+    write_outputs(sim, args.output_dir, run = run, output_format = args.output_format)
+
+    return(run)
+
+
+def _run_self_isolation_branch(args, self_quarantine_fraction, df_lockdown_branches, n_workers):
+    """
+    Continue a simulation from the self-isolation trigger point until lockdown is triggered and
+    fork the lockdown branches from there
+    """
+    sim, params = _snapshot["sim"], _snapshot["params"]
+
+    start_self_isolation(sim, self_quarantine_fraction)
+    run_to_lockdown(sim, params, args)
+
+    fork_branches(_run_lockdown_branch,
+        df_lockdown_branches[["run", "lockdown_duration", "app_turn_on"]].values.tolist(),
+        n_workers)
+
+
+def fork_branches(func, branches, n_workers):
+    """
+    Call func(*branch) for each branch in a pool of forked processes (forked processes share the
+    in-memory model state at the time of forking, copy-on-write)
+    """
+    if len(branches) == 1:
+        return([func(*branches[0])])
+
+    with get_context("fork").Pool(processes = min(n_workers, len(branches))) as pool:
+        return(pool.starmap(func, branches, chunksize = 1))
+
+
+def run_branches(args, param_dict):
+    """
+    Run all branches of the scenario, simulating the prefixes before each trigger point once
+    """
+    df_branches = branch_grid(args)
+    df_branches.to_csv(join(args.output_dir, "branches.csv"), index = False)
+
+    n_workers = args.n_workers if args.n_workers else cpu_count()
+
+    sim, params = create_simulation(args, param_dict)
+    run_to_intervention(sim, params, args)
+
+    _snapshot.update(sim = sim, params = params, args = args)
+
+    groups = list(df_branches.groupby("self_quarantine_fraction", sort = False))
+
+    if len(groups) == 1:
+        _run_self_isolation_branch(args, groups[0][0], groups[0][1], n_workers)
+        return(df_branches)
+
+    # Pool processes are daemonic and can't fork their own pool so processes of the first
+    # branching point are managed directly; workers are shared between them
+    n_workers_branch = max(1, n_workers // len(groups))
+
+    ctx = get_context("fork")
+    processes = [ctx.Process(target = _run_self_isolation_branch,
+        args = (args, fraction, df_group, n_workers_branch)) for fraction, df_group in groups]
+
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+
+    failed = [fraction for (fraction, df_group), p in zip(groups, processes) if p.exitcode != 0]
+    if failed:
+        raise RuntimeError("Branches failed for self_quarantine_fraction: {}".format(failed))
+
+    return(df_branches)
+
+
+if __name__ == "__main__":
+
+    args, param_dict = parse_args()
+    print(param_dict)
+
+    branching = any(a is not None for a in [args.branch_self_quarantine_fractions,
+        args.branch_lockdown_durations, args.branch_app_turn_on])
+
+    if branching:
+        run_branches(args, param_dict)
+    else:
+        # Seeds of each replicate are consecutive from the seed passed to the model
+        # (or the seed within the parameter file if not passed)
+        if "rng_seed" in param_dict:
+            base_seed = int(param_dict["rng_seed"])
+        else:
+            base_seed = int(pd.read_csv(args.input_parameter_file).rng_seed.values[args.parameter_line_number - 1])
+
+        runs = np.arange(1, args.n_replicates + 1)
+        rng_seeds = base_seed + runs - 1
+        tasks = [(args, param_dict, int(run), int(seed)) for run, seed in zip(runs, rng_seeds)]
+
+        if args.n_replicates == 1:
+            results = [run_replicate(*tasks[0])]
+        else:
+            n_workers = args.n_workers if args.n_workers else cpu_count()
+            n_workers = min(n_workers, args.n_replicates)
+
+            # One replicate per task so that long-running replicates don't hold up a batch
+            with Pool(processes = n_workers) as pool:
+                results = pool.starmap(run_replicate, tasks, chunksize = 1)
 
+        # Record the random seed used in each replicate
+        df_seeds = pd.DataFrame(results, columns = ["run", "rng_seed"])
+        df_seeds.to_csv(join(args.output_dir, "rng_seeds.csv"), index = False)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Run the outbreak scenario of covid_outbreak.py and generate tables and figures directly from the
+model's in-memory output (without writing and re-reading the transmission, individual, and
+timeseries files).
+
+Generates Table 1 and Figures 3, 4, S1, S2, and S13.  Takes all arguments of covid_outbreak.py
+(the --output_dir argument is the directory the model would write files to) along with the
+directories for output figures and tables.
+
+Example:
+    python src/pipeline.py --input_parameter_file ... --household_demographics_file ...
+        --output_dir data --figure_dir output/figures --table_dir output/tables --n_total 1000000
+"""
+
+import pandas as pd, sys
+from os.path import join, dirname, abspath
+from matplotlib import pyplot as plt
+
+import covid_outbreak
+
+sys.path.append(join(dirname(abspath(__file__)), "viz"))
+sys.path.append(join(dirname(abspath(__file__)), "analysis"))
+
+import figure_S1, ifr_hist_by_age, plot_R_timeseries, transmission_heatmap_by_age_by_infectiousness
+import model_output, transmission_aggregates
+import table_ifr_by_age
+
+
+def model_tables(sim):
+    """
+    Return transmission, individual, and timeseries tables of a simulation from memory
+
+    Returns
+    -------
+    df_trans, df_indiv, df_ts : pandas.DataFrame
+    """
+    df_trans = model_output.apply_schema(pd.DataFrame(sim.env.model.get_transmissions()),
+        model_output.TRANSMISSION_SCHEMA)
+    df_indiv = model_output.apply_schema(pd.DataFrame(sim.env.model.get_individuals()),
+        model_output.INDIVIDUAL_SCHEMA)
+    df_ts = model_output.apply_schema(pd.DataFrame(sim.results), model_output.TIMESERIES_SCHEMA)
+
+    return(df_trans, df_indiv, df_ts)
+
+
+def parameters_table(args, param_dict, params):
+    """
+    Parameters used in the simulation: the line of the parameter file, with the parameters passed
+    on the command line set to their values in the model
+
+    Returns
+    -------
+    pandas.DataFrame (one row)
+    """
+    df_params = pd.read_csv(args.input_parameter_file)
+    df_params = df_params.iloc[[args.parameter_line_number - 1]].reset_index(drop = True)
+
+    for name in param_dict:
+        df_params[name] = params.get_param(name)
+
+    return(df_params)
+
+
+def analyse(df_trans, df_indiv, df_ts, df_params, figure_dir, table_dir, file_format = "png"):
+    """
+    Generate Table 1 and Figures 3, 4, S1, S2, and S13 from model output
+
+    Arguments
+    ---------
+    df_trans, df_indiv, df_ts : pandas.DataFrame
+        Transmission, individual, and timeseries tables of a simulation
+    df_params : pandas.DataFrame
+        Parameters used in the simulation (one row)
+    figure_dir, table_dir : str
+        Output directories for figures and tables
+    file_format : str
+        File format of figures
+    """
+    plt.rcParams["savefig.format"] = file_format
+
+    aggregates = transmission_aggregates.compute_aggregates(df_trans)
+
+    df_ifr = table_ifr_by_age.ifr_table(aggregates)
+    df_ifr.to_csv(join(table_dir, "tab1_ifr_by_age.csv"), index = False)
+
+    figures = [
+        ("fig3_transmission_matrix_by_age_by_infectiousness",
+            lambda: transmission_heatmap_by_age_by_infectiousness.figure_3(aggregates), {}),
+        ("fig4_ifr_by_age", lambda: ifr_hist_by_age.figure_4(aggregates), {}),
+        ("figS1_I_H_D", lambda: figure_S1.figure_S1(aggregates, df_indiv), {}),
+        ("figS2_H_ICU_D", lambda: figure_S1.figure_S2(aggregates), {}),
+        ("figS13_actual_R",
+            lambda: plot_R_timeseries.figure_S13(aggregates, df_ts, df_params), {"dpi": 300})
+    ]
+
+    for name, make_figure, savefig_kwargs in figures:
+        fig, ax = make_figure()
+        plt.savefig(join(figure_dir, name), **savefig_kwargs)
+        plt.close()
+
+
+if __name__ == "__main__":
+
+    parser = covid_outbreak.build_parser()
+
+    parser.add_argument("--figure_dir", type = str,
+        help = "Directory of output figures", default = "output/figures")
+
+    parser.add_argument("--table_dir", type = str,
+        help = "Directory of output tables", default = "output/tables")
+
+    parser.add_argument("--figure_format", type = str,
+        help = "File format of output figures", default = "png")
+
+    args, param_dict = covid_outbreak.parse_args(parser)
+
+    sim, params = covid_outbreak.create_simulation(args, param_dict)
+    el = covid_outbreak.run_scenario(sim, params, args)
+
+    print("Elapsed time:", el)
+
+    df_params = parameters_table(args, param_dict, params)
+
+    df_trans, df_indiv, df_ts = model_tables(sim)
+
+    analyse(df_trans, df_indiv, df_ts, df_params,
+        args.figure_dir, args.table_dir, args.figure_format)
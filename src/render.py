@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Render figures and tables from the model output in parallel, rebuilding only what has changed
+
+Each target of the Makefile that generates a figure or table (and the aggregates of the
+transmission file they share) is listed by `targets` with its script, arguments, input files and
+output files; `check_targets` checks that every such target of the Makefile is listed (run with
+`--check`, and before rendering).  Targets are scheduled on a pool of worker processes as soon as
+the targets that produce their inputs have finished, so independent figures are rendered
+concurrently.  Workers use the Agg backend and run scripts in-process (with `runpy`), so
+matplotlib, scipy and the model's enums are imported once per worker rather than once per figure.
+
+A target is skipped if its outputs exist and the digest of its inputs (contents of input files,
+the plotting code, and the script arguments) is the one recorded when it was last built.  Digests
+are recorded in `--state_file`; contents of input files are only re-hashed when their size or
+modification time has changed.
+
+Example:
+    python src/render.py --figure_format png --n_workers 8
+    python src/render.py figure3 figure4 --force
+"""
+
+from os.path import join, dirname, abspath, exists, splitext
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import cpu_count, get_context
+import argparse, glob, hashlib, json, os, re, runpy, subprocess, sys, time, uuid
+
+sys.path.append(join(dirname(abspath(__file__)), "viz"))
+import model_output, output_cache
+
+SRC_DIR = dirname(abspath(__file__))
+REPO_DIR = dirname(SRC_DIR)
+
+# Directories of the code used by all targets (changes to any module rebuild all targets)
+CODE_DIRS = [join(SRC_DIR, "viz"), join(SRC_DIR, "analysis")]
+
+MAKEFILE = join(REPO_DIR, "Makefile")
+
+# Targets of the Makefile running a script of CODE_DIRS that don't generate figures or tables
+MAKEFILE_NON_OUTPUT_TARGETS = ["model_enums"]
+
+
+def targets(figure_format = "png", interaction_chunksize = 4194304, app_uptake = 0.6,
+        data_dir = "data", figure_dir = "output/figures", table_dir = "output/tables",
+        model_dir = "OpenABM-Covid19"):
+    """
+    Figure and table targets of the Makefile
+
+    Returns
+    -------
+    dict of target name to dict with entries script (path relative to the repository), args (list
+    of str), inputs (list of paths), outputs (list of paths), and optionally optional_outputs
+    (list of paths the script writes depending on its inputs, not required for the target to be
+    up to date)
+    """
+    transmission_file = join(data_dir, "transmission_Run1.csv")
+    individual_file = join(data_dir, "individual_file_Run1.csv")
+    interaction_file = join(data_dir, "interactions_Run1.csv")
+    timeseries_file = join(data_dir, "covid_timeseries_Run1.csv")
+    aggregates_file = join(data_dir, "transmission_aggregates_Run1.npz")
+    parameter_file = join(model_dir, "tests", "data", "baseline_parameters.csv")
+    parameter_transpose_file = join(model_dir, "tests", "data",
+        "baseline_parameters_transpose.csv")
+
+    def figure(name):
+        return(join(figure_dir, name + "." + figure_format))
+
+    generation_time = join(figure_dir, "generation_time_by_infectiousness")
+
+    fig2 = ["fig2a_daily_interactions_by_network", "fig2b_daily_interactions_by_age",
+        "fig2c_transmission_matrix_occupation", "fig2d_transmission_matrix_household",
+        "fig2e_transmission_matrix_random"]
+
+    return({
+        "aggregates": {"script": "src/viz/transmission_aggregates.py",
+            "args": [transmission_file, aggregates_file],
+            "inputs": [transmission_file], "outputs": [aggregates_file]},
+        "figure2": {"script": "src/viz/figure_2.py",
+            "args": [interaction_file, individual_file, figure_dir, figure_format,
+                str(interaction_chunksize)],
+            "inputs": [interaction_file, individual_file],
+            "outputs": [figure(name) for name in fig2]},
+        "figure3": {"script": "src/viz/transmission_heatmap_by_age_by_infectiousness.py",
+            "args": [aggregates_file,
+                join(figure_dir, "fig3_transmission_matrix_by_age_by_infectiousness"),
+                figure_format],
+            "inputs": [aggregates_file],
+            "outputs": [figure("fig3_transmission_matrix_by_age_by_infectiousness")]},
+        "figure4": {"script": "src/viz/ifr_hist_by_age.py",
+            "args": [aggregates_file, join(figure_dir, "fig4_ifr_by_age"), figure_format],
+            "inputs": [aggregates_file], "outputs": [figure("fig4_ifr_by_age")]},
+        "table1": {"script": "src/analysis/table_ifr_by_age.py",
+            "args": [aggregates_file, join(table_dir, "tab1_ifr_by_age.csv")],
+            "inputs": [aggregates_file], "outputs": [join(table_dir, "tab1_ifr_by_age.csv")]},
+        "figureS1_S2": {"script": "src/viz/figure_S1.py",
+            "args": [aggregates_file, individual_file, figure_dir + "/", figure_format],
+            "inputs": [aggregates_file, individual_file],
+            "outputs": [figure("figS1_I_H_D"), figure("figS2_H_ICU_D")]},
+        "figureS3": {"script": "src/viz/waiting_time_distributions.py",
+            "args": [parameter_file, join(figure_dir, "figS3_waiting_time_distributions"),
+                figure_format],
+            "inputs": [parameter_file], "outputs": [figure("figS3_waiting_time_distributions")]},
+        "figureS4": {"script": "src/viz/histogram_app_uptake.R",
+            "args": [str(app_uptake), parameter_transpose_file,
+                join(figure_dir, "figS4_histogram_app_uptake"), figure_format],
+            "inputs": [parameter_transpose_file],
+            "outputs": [figure("figS4_histogram_app_uptake")]},
+        "figureS13": {"script": "src/viz/plot_R_timeseries.py",
+            "args": [aggregates_file, timeseries_file, parameter_file,
+                join(figure_dir, "figS13_actual_R"), figure_format],
+            "inputs": [aggregates_file, timeseries_file, parameter_file],
+            "outputs": [figure("figS13_actual_R")]},
+        "figure_generation_time": {"script": "src/viz/generation_time_by_infectiousness.py",
+            "args": [aggregates_file, timeseries_file, generation_time, figure_format],
+            "inputs": [aggregates_file, timeseries_file],
+            "outputs": [figure("generation_time_by_infectiousness")],
+            # Only written if lockdown occurs in the timeseries file
+            "optional_outputs": [figure("generation_time_by_infectiousness_" + suffix)
+                for suffix in ["pre_lockdown", "post_lockdown", "lockdown_windows"]]},
+        "figure_occupancy": {"script": "src/viz/occupancy.py",
+            "args": [join(figure_dir, "occupancy_by_age"), figure_format, transmission_file],
+            "inputs": [transmission_file],
+            "outputs": [figure("occupancy_by_age"), join(figure_dir, "occupancy_by_age.csv")]}
+    })
+
+
+def makefile_targets(makefile = MAKEFILE):
+    """
+    Targets of the Makefile whose recipe runs a script of CODE_DIRS
+
+    Returns
+    -------
+    dict of target name (as written in the Makefile) to script (path relative to the repository)
+    """
+    code_dirs = "|".join(re.escape(os.path.relpath(d, REPO_DIR)) for d in CODE_DIRS)
+    script_pattern = re.compile(r"^\t(?:python|Rscript) ((?:{})/\S+)".format(code_dirs))
+
+    rules, name = {}, None
+    with open(makefile) as f:
+        for line in f:
+            rule = re.match(r"^([^\s:=#][^:=]*):(?!=)", line)
+            if rule:
+                name = rule.group(1).strip()
+            elif name is not None and script_pattern.match(line):
+                rules[name] = script_pattern.match(line).group(1)
+    return(rules)
+
+
+def check_targets(target_dict, makefile = MAKEFILE):
+    """
+    Check that every figure and table target of the Makefile is listed in `target_dict` with the
+    same script (targets named by a variable, such as the aggregates file, are matched by script)
+
+    Returns
+    -------
+    list of str (description of each Makefile target that is missing)
+    """
+    scripts = {target["script"]: name for name, target in target_dict.items()}
+
+    missing = []
+    for name, script in makefile_targets(makefile).items():
+        if name in MAKEFILE_NON_OUTPUT_TARGETS:
+            continue
+        if name.startswith("$("):
+            listed = script in scripts
+        else:
+            listed = target_dict.get(name, {}).get("script") == script
+        if not listed:
+            missing.append("{} ({})".format(name, script))
+    return(missing)
+
+
+def dependencies(target_dict):
+    """
+    Targets producing the inputs of each target
+
+    Returns
+    -------
+    dict of target name to set of target names
+    """
+    producers = {output: name for name, target in target_dict.items()
+        for output in target["outputs"] + target.get("optional_outputs", [])}
+
+    return({name: {producers[path] for path in target["inputs"] if path in producers}
+        for name, target in target_dict.items()})
+
+
+def read_state(state_file):
+    """Recorded digests of targets and hashes of input files"""
+    try:
+        with open(state_file) as f:
+            return(json.load(f))
+    except (OSError, ValueError):
+        return({"targets": {}, "files": {}})
+
+
+def write_state(state, state_file):
+    """Write the state file atomically"""
+    os.makedirs(dirname(abspath(state_file)), exist_ok = True)
+    tmp_file = "{}.{}".format(state_file, uuid.uuid4().hex)
+    with open(tmp_file, "w") as f:
+        json.dump(state, f, indent = 1)
+    os.replace(tmp_file, state_file)
+
+
+def input_hash(path, file_state):
+    """
+    Hash of the contents of an input file (in any output format), reusing the recorded hash if
+    its size and modification time haven't changed
+
+    Arguments
+    ---------
+    path : str
+        Path to input file
+    file_state : dict
+        Recorded size, modification time and hash of input files (updated in place)
+    """
+    try:
+        path = model_output.find_output_file(path)
+    except FileNotFoundError:
+        return(None)
+
+    stat = os.stat(path)
+    key = abspath(path)
+    recorded = file_state.get(key)
+
+    if recorded and (recorded["size"], recorded["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+        return(recorded["hash"])
+
+    content_hash = output_cache.file_hash(path)
+    file_state[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": content_hash}
+    return(content_hash)
+
+
+def code_hash():
+    """Hash of the plotting and analysis code (and data files next to it, e.g. model_enums.json)"""
+    h = hashlib.blake2b(digest_size = 16)
+    for code_dir in CODE_DIRS:
+        for path in sorted(glob.glob(join(code_dir, "*.py")) + glob.glob(join(code_dir, "*.R")) +
+                glob.glob(join(code_dir, "*.json"))):
+            h.update(path.encode())
+            h.update(output_cache.file_hash(path).encode())
+    return(h.hexdigest())
+
+
+def target_digest(target, file_state, code_digest):
+    """
+    Digest of the inputs, code, and arguments of a target (None if an input is missing)
+    """
+    hashes = [input_hash(path, file_state) for path in target["inputs"]]
+    if None in hashes:
+        return(None)
+
+    h = hashlib.blake2b(digest_size = 16)
+    h.update(json.dumps([target["script"], target["args"], hashes, code_digest]).encode())
+    return(h.hexdigest())
+
+
+def up_to_date(name, target, digest, state):
+    """Whether the outputs of a target exist and were built from the same inputs"""
+    return((state["targets"].get(name) == digest) and all(exists(p) for p in target["outputs"]))
+
+
+def _init_worker():
+    """Import plotting libraries once per worker, with a non-interactive backend"""
+    os.environ["MPLBACKEND"] = "Agg"
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib import pyplot as plt
+
+
+def run_target(target):
+    """
+    Run the script of a target (Python scripts are run in this process, R scripts with Rscript)
+
+    Returns
+    -------
+    float (elapsed time in seconds)
+    """
+    start = time.time()
+    script, args = join(REPO_DIR, target["script"]), target["args"]
+
+    for path in target["outputs"] + target.get("optional_outputs", []):
+        os.makedirs(dirname(abspath(path)), exist_ok = True)
+
+    if splitext(script)[1] == ".R":
+        subprocess.run(["Rscript", script] + args, check = True)
+        return(time.time() - start)
+
+    import matplotlib
+    from matplotlib import pyplot as plt
+
+    argv, path = sys.argv, list(sys.path)
+    sys.argv = [script] + args
+    sys.path.insert(0, dirname(abspath(script)))
+
+    # Scripts set rcParams (figure size, savefig format) globally; restore them after each target
+    try:
+        with matplotlib.rc_context():
+            runpy.run_path(script, run_name = "__main__")
+    finally:
+        plt.close("all")
+        sys.argv, sys.path[:] = argv, path
+
+    return(time.time() - start)
+
+
+def render(target_dict, names = None, n_workers = None, state_file = ".cache/render_state.json",
+        force = False):
+    """
+    Build targets (and the targets producing their inputs) in parallel, skipping targets that are
+    up to date
+
+    Arguments
+    ---------
+    target_dict : dict
+        Targets (see `targets`)
+    names : list of str
+        Names of targets to build (defaults to all targets)
+    n_workers : int
+        Number of worker processes (defaults to the number of CPUs)
+    state_file : str
+        File recording the digest of each target when it was last built
+    force : bool
+        Rebuild targets even if they are up to date
+
+    Returns
+    -------
+    dict of target name to status ("built", "skipped", "failed", or "not built")
+    """
+    deps = dependencies(target_dict)
+
+    # Targets requested and those producing their inputs
+    selected = set()
+    stack = list(names) if names else list(target_dict)
+    while stack:
+        name = stack.pop()
+        if name not in target_dict:
+            raise ValueError("Unknown target: {}".format(name))
+        if name not in selected:
+            selected.add(name)
+            stack.extend(deps[name])
+
+    state = read_state(state_file)
+    code_digest = code_hash()
+    status = {}
+    running = {}
+
+    n_workers = n_workers if n_workers else cpu_count()
+    executor = ProcessPoolExecutor(max_workers = min(n_workers, len(selected)),
+        mp_context = get_context("fork"), initializer = _init_worker)
+
+    with executor:
+        while len(status) < len(selected):
+
+            # Schedule all targets whose inputs have been built
+            for name in sorted(selected - set(status) - {name for name, _ in running.values()}):
+                dep_status = [status.get(dep) for dep in deps[name]]
+                if any(s in ("failed", "not built") for s in dep_status):
+                    status[name] = "not built"
+                    print("{}: not built (a target it depends on failed)".format(name))
+                    continue
+                if not all(s in ("built", "skipped") for s in dep_status):
+                    continue
+
+                target = target_dict[name]
+                digest = target_digest(target, state["files"], code_digest)
+
+                if digest is None:
+                    status[name] = "failed"
+                    print("{}: failed (missing input files)".format(name))
+                elif not force and up_to_date(name, target, digest, state):
+                    status[name] = "skipped"
+                    print("{}: up to date".format(name))
+                else:
+                    running[executor.submit(run_target, target)] = (name, digest)
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when = FIRST_COMPLETED)
+            for future in done:
+                name, digest = running.pop(future)
+                try:
+                    elapsed = future.result()
+                except Exception as e:
+                    status[name] = "failed"
+                    state["targets"].pop(name, None)
+                    print("{}: failed ({})".format(name, e))
+                else:
+                    status[name] = "built"
+                    state["targets"][name] = digest
+                    print("{}: built in {:.1f}s".format(name, elapsed))
+                write_state(state, state_file)
+
+    return(status)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = __doc__.split("\n\n")[0])
+    parser.add_argument("targets", nargs = "*",
+        help = "Targets to build (defaults to all targets)")
+    parser.add_argument("--figure_format", type = str, help = "File format of figures",
+        default = "png")
+    parser.add_argument("--interaction_chunksize", type = int,
+        help = "Number of rows of the interactions file read at a time", default = 4194304)
+    parser.add_argument("--app_uptake", type = float, help = "App uptake (Figure S4)",
+        default = 0.6)
+    parser.add_argument("--data_dir", type = str, help = "Directory of model output",
+        default = "data")
+    parser.add_argument("--figure_dir", type = str, help = "Directory of output figures",
+        default = "output/figures")
+    parser.add_argument("--table_dir", type = str, help = "Directory of output tables",
+        default = "output/tables")
+    parser.add_argument("--model_dir", type = str, help = "Directory of OpenABM-Covid19",
+        default = "OpenABM-Covid19")
+    parser.add_argument("--n_workers", type = int,
+        help = "Number of worker processes (defaults to number of CPUs)", default = None)
+    parser.add_argument("--state_file", type = str,
+        help = "File recording the inputs each target was last built from",
+        default = ".cache/render_state.json")
+    parser.add_argument("--force", action = "store_true",
+        help = "Rebuild targets even if they are up to date")
+    parser.add_argument("--check", action = "store_true",
+        help = "Only check that all figure and table targets of the Makefile are listed")
+    args = parser.parse_args()
+
+    target_dict = targets(args.figure_format, args.interaction_chunksize, args.app_uptake,
+        args.data_dir, args.figure_dir, args.table_dir, args.model_dir)
+
+    missing = check_targets(target_dict)
+    for target in missing:
+        print("Makefile target not rendered: {}".format(target), file = sys.stderr)
+
+    if args.check:
+        sys.exit(1 if missing else 0)
+
+    status = render(target_dict, args.targets, args.n_workers, args.state_file, args.force)
+
+    if any(s in ("failed", "not built") for s in status.values()):
+        sys.exit(1)
@@ -3,7 +3,7 @@
 Constants associated with the model OpenABM-Covid19
 """
 
-from COVID19.model import AgeGroupEnum, EVENT_TYPES, TransmissionTypeEnum, OccupationNetworkEnum
+from model_enums import AgeGroupEnum, EVENT_TYPES, TransmissionTypeEnum, OccupationNetworkEnum
 
 # Define arrays associated with networks/ages
 interaction_labels = [c.name[1:].title() for c in TransmissionTypeEnum]
@@ -14,3 +14,6 @@ n_age = len(AgeGroupEnum)
 age_group_labels = [enum.name[1:].replace("_","-") for enum in AgeGroupEnum]
 age_group_labels[-1] = "80+"
 n_age_groups = len(age_group_labels)
+
+# Number of event types (the status of the source of a transmission is an event type)
+n_status = len(EVENT_TYPES)
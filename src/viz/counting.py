@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Counts and histograms of integer-coded events computed in a single pass with np.bincount
+
+These functions don't use matplotlib, so modules that only aggregate model output (for instance
+transmission_aggregates) import this module rather than `plotting` (which re-exports them).
+"""
+
+import numpy as np, pandas as pd
+
+
+def grouped_histogram(values, groups, n_groups, bins, weights = None, density = False):
+    """
+    Histograms of values in each group computed in a single pass (with np.bincount)
+
+    Bins follow np.histogram: bins are half-open except the last, which includes its right edge,
+    and values outside the bin edges (or in groups outside [0, n_groups)) are not counted.
+
+    Arguments
+    ---------
+    values : np.array
+        Values to bin
+    groups : np.array
+        Integer-coded group (0, ..., n_groups - 1) of each value
+    n_groups : int
+        Number of groups
+    bins : np.array
+        Monotonically increasing bin edges
+    weights : np.array
+        Weight of each value (counts are the sum of weights if given)
+    density : boolean
+        Should each group's histogram be normalised to a density (as in np.histogram)
+
+    Returns
+    -------
+    np.array (n_groups, len(bins) - 1) of counts (or densities) in each group and bin
+    """
+    bins = np.asarray(bins, dtype = float)
+    values = np.asarray(values)
+    groups = np.asarray(groups, dtype = np.int64)
+    n_bins = len(bins) - 1
+
+    index = np.searchsorted(bins, values, side = "right") - 1
+    index[values == bins[-1]] = n_bins - 1
+
+    valid = (index >= 0) & (index < n_bins) & (groups >= 0) & (groups < n_groups)
+    if weights is not None:
+        weights = np.asarray(weights)[valid]
+
+    counts = np.bincount(groups[valid]*n_bins + index[valid], weights = weights,
+        minlength = n_groups*n_bins).reshape(n_groups, n_bins)
+
+    if density:
+        with np.errstate(invalid = "ignore", divide = "ignore"):
+            counts = counts/counts.sum(axis = 1, keepdims = True)/np.diff(bins)
+
+    return(counts)
+
+
+def histogram_by_indicator(values, indicators, bins):
+    """
+    Histograms of values for each of several (possibly overlapping) subsets of rows, in a single
+    pass
+
+    Arguments
+    ---------
+    values : np.array
+        Values to bin (one per row)
+    indicators : np.array (n_rows, n_subsets)
+        Boolean array of whether each row is in each subset
+    bins : np.array
+        Bin edges (see `grouped_histogram`)
+
+    Returns
+    -------
+    np.array (n_subsets, len(bins) - 1)
+    """
+    indicators = np.asarray(indicators, dtype = bool)
+    rows, subsets = np.nonzero(indicators)
+
+    return(grouped_histogram(np.asarray(values)[rows], subsets, indicators.shape[1], bins))
+
+
+def group_histogram_df(df, groupvar, binvar, bins, groups = None, density = False):
+    """
+    Histograms of column `binvar` of a DataFrame in each group of `groupvar` (in a single pass)
+
+    Arguments
+    ---------
+    groups : list
+        Values of `groupvar` to use as groups (defaults to unique values in order of appearance)
+
+    See `grouped_histogram` for remaining arguments.
+
+    Returns
+    -------
+    np.array (len(groups), len(bins) - 1)
+    """
+    if groups is None:
+        groups = df[groupvar].unique()
+
+    codes = pd.Categorical(df[groupvar], categories = groups).codes
+
+    return(grouped_histogram(df[binvar].values, codes, len(groups), bins, density = density))
+
+
+def count_tensor(keys, shape, weights = None):
+    """
+    Count occurrences of each combination of integer keys in a single pass (with np.bincount)
+
+    Arguments
+    ---------
+    keys : tuple of np.array
+        Integer arrays (one per dimension) of the same length; values outside [0, shape[i]) in any
+        dimension are not counted
+    shape : tuple of int
+        Number of categories in each dimension
+    weights : np.array
+        Weight of each element (the returned array is then the sum of weights)
+
+    Returns
+    -------
+    np.array of counts of shape `shape`
+    """
+    keys = tuple(np.asarray(k, dtype = np.int64) for k in keys)
+
+    valid = np.ones(len(keys[0]), dtype = bool)
+    for k, n in zip(keys, shape):
+        valid &= (k >= 0) & (k < n)
+
+    if not valid.all():
+        keys = tuple(k[valid] for k in keys)
+        if weights is not None:
+            weights = np.asarray(weights)[valid]
+
+    flat = np.ravel_multi_index(keys, shape)
+    counts = np.bincount(flat, weights = weights, minlength = int(np.prod(shape)))
+
+    return(counts.reshape(shape))
+
+
+def combine_counts(arrays):
+    """
+    Sum arrays of counts of several runs (e.g. of an ensemble), padding each with zeros to the
+    largest shape along every dimension
+    """
+    shape = tuple(np.max([a.shape for a in arrays], axis = 0))
+
+    combined = np.zeros(shape, dtype = np.result_type(*arrays))
+    for a in arrays:
+        combined[tuple(slice(0, n) for n in a.shape)] += a
+    return(combined)
+
+
+def transmission_tensor(df, group1var, group2var, n_groups, panelvar = None, panels = None,
+        weights = None):
+    """
+    Array of counts of transmission (or contact) events by panel and two integer-coded grouping
+    variables (for instance, age group of the source and the recipient), computed in one pass
+
+    Arguments
+    ---------
+    df : pandas.DataFrame
+        Transmission or interaction events
+    group1var, group2var : str
+        Column names of the grouping variables (coded 0, ..., n_groups - 1)
+    n_groups : int
+        Number of groups of each grouping variable
+    panelvar : str
+        Column name of the variable defining panels (all events are in one panel if None)
+    panels : list
+        Values of `panelvar` of each panel (defaults to the sorted unique values); events with
+        other values are not counted
+    weights : str or np.array
+        Column name or array of the weight of each event (events are counted if None)
+
+    Returns
+    -------
+    np.array (n_panels, n_groups, n_groups) where element [p, i, j] is the number of events in
+    panel p with group1var == i and group2var == j
+    """
+    if panelvar is None:
+        panel_index = np.zeros(df.shape[0], dtype = np.int64)
+        n_panels = 1
+    else:
+        if panels is None:
+            panels = np.unique(df[panelvar])
+        panel_index = pd.Categorical(df[panelvar], categories = panels).codes
+        n_panels = len(panels)
+
+    if isinstance(weights, str):
+        weights = df[weights].values
+
+    return(count_tensor((panel_index, df[group1var].values, df[group2var].values),
+        (n_panels, n_groups, n_groups), weights = weights))
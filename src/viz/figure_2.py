@@ -1,71 +1,44 @@
 #!/usr/bin/env python3
 """
 Script to create subfigures for figure 2
+
+Figure 2 is rendered from aggregates of the interactions file (see `interaction_aggregates`), which
+are computed by streaming the interactions file in chunks (so that memory use is bounded by the
+chunk size and population size rather than by the number of interactions).  
+
+Usage: 
+    python figure_2.py <interaction_file or aggregates.npz> <individual_file> <output_dir> \
+        <file_format> [chunksize]
 """
 
 from os.path import join
 
-import pandas as pd, numpy as np, sys
+import numpy as np, sys
 from matplotlib import pyplot as plt
 
-import plotting, constants
-from COVID19.model import TransmissionTypeEnum, AgeGroupEnum
+import plotting, constants, interaction_aggregates
+from model_enums import TransmissionTypeEnum, AgeGroupEnum
 
 NBINS = 30
 bin_edges = np.arange(NBINS + 1) - 0.5
 
-if __name__ == "__main__":
-    
-    interaction_file = sys.argv[1]
-    individual_file = sys.argv[2]
-    output_dir = sys.argv[3]
-    file_format = sys.argv[4]
-    
-    plt.rcParams["savefig.format"] = file_format
-    
-    # Import the data output from the model
-    df_interact = pd.read_csv(interaction_file)
-    df_indiv = pd.read_csv(individual_file)
-    
-    # Find population size
-    n_total = df_indiv.shape[0]
-    
-    # Convert network type to categorical so that zero counts are calculated
-    df_interact["ID_1"] = pd.Categorical(df_interact.ID_1, categories = df_indiv.ID)
-    df_interact["ID_2"] = pd.Categorical(df_interact.ID_2, categories = df_indiv.ID)
-    df_interact["type"] = pd.Categorical(df_interact["type"])
-    #df_interact["age_group_1"] = pd.Categorical(df_interact.age_group_1)
-    #df_interact["age_group_2"] = pd.Categorical(df_interact.age_group_2)
-    
-    plt.rcParams['figure.figsize'] = [6, 4]
-    
-    #############
-    # Figure 2A 
-    # ---------
-    # Histogram of number of daily interactions per person by network
-    #################################################################
+
+def figure_2a(aggregates):
+    """
+    Histogram of number of daily interactions per person by network
+    """
+    n_total = aggregates["age_group"].shape[0]
     
-    # Count interactions for each individual by "type" of interaction
-    df_agg = df_interact.groupby(["ID_1", "type"]).size().reset_index(name = "counts")
+    heights_by_type = interaction_aggregates.degree_hist_by_type(aggregates, bin_edges)
     
-    fig, ax = plt.subplots(nrows = 3)
-
-    df = df_agg
-    groupvar = "type"
-    binvar = "counts"
-    groups = constants.interaction_types
     bins = bin_edges 
-    group_colours = plotting.network_colours
     group_labels = constants.interaction_labels
     normalising_constant = n_total/100
-    groups = df[groupvar].unique()
-    density = False
-    legend_title = ""
     width = 0.8
-    n_groups = len(groups)
     
-    for i, g in enumerate(groups):
-        heights, b = np.histogram(df.loc[df[groupvar] == g][binvar], bins, density = density)
+    fig, ax = plt.subplots(nrows = 3)
+    
+    for i, heights in enumerate(heights_by_type):
         
         if normalising_constant:
             heights = heights/float(normalising_constant)
@@ -91,38 +64,25 @@ if __name__ == "__main__":
         
         for tick in ax[i].yaxis.get_major_ticks():
             tick.label.set_fontsize(10)
-
-    plt.savefig(join(output_dir, "fig2a_daily_interactions_by_network"))
-    plt.close()
     
+    return(fig, ax)
+
+
+def figure_2b(aggregates):
+    """
+    Histogram of number of daily interactions per person by age group
+    """
+    n_total = aggregates["age_group"].shape[0]
     
-    #############
-    # Figure 2B
-    # ---------
-    # Number of daily interactions by age
-    #####################################
+    heights_by_age = interaction_aggregates.degree_hist_by_age(aggregates, bin_edges)
     
-    plt.rcParams['figure.figsize'] = [6, 12]
     fig, ax = plt.subplots(nrows = constants.n_age_groups)
     
-    #df_agg = df_interact.groupby(["ID_1", "age_group_1"]).size().reset_index(name = "counts")
-    
     for i, age in enumerate(constants.age_group_labels):
         
-        df_age = df_interact.loc[df_interact.age_group_1 == i]
-        df_age["ID_1"] = pd.Categorical(df_age["ID_1"], 
-             categories = df_indiv.loc[df_indiv["age_group"] == i].ID)
-        
-        hist = df_age.groupby(["ID_1"]).size().reset_index(name = "counts").counts
-        
-        # Split by age group
-        #hist = df_agg.loc[df_agg["age_group_1"] == i].counts
-        
-        heights, bin_edges = np.histogram(hist, bin_edges)
-        
         ax[i].bar(
             x = bin_edges[1:] - 0.5, 
-            height = 100*heights/n_total, 
+            height = 100*heights_by_age[i]/n_total, 
             label = constants.age_group_labels[i], 
             color = "#0072B2", 
             edgecolor = "#0072B2", 
@@ -148,6 +108,71 @@ if __name__ == "__main__":
         ax[i].text(0.75, 0.4, "{}".format(constants.age_group_labels[i]),
             ha = 'left', va = 'bottom', transform = ax[i].transAxes, fontsize = 16)
     
+    return(fig, ax)
+
+
+def figure_2_network(aggregates, network, vmax, cbar_incr):
+    """
+    Interaction matrix by age for one network ("occupation", "household", or "random")
+    """
+    # Tick labels for colourbar
+    cbar_ticks = np.arange(cbar_incr, vmax + cbar_incr, cbar_incr)
+    cbar_ticks = np.insert(cbar_ticks, 0, 1)
+    
+    interaction_types_sub = [c.value for c in TransmissionTypeEnum \
+                                                if c.name in ["_" + network]]
+    
+    array = aggregates["type_age_age"][interaction_types_sub].sum(axis = 0)
+    
+    return(plotting.plot_heatmap(array, 
+        xlabel = "Age of individual 1", 
+        ylabel = "Age of individual 2", 
+        legend_title = "Number of\ntransmission events",
+        xticklabels = constants.age_group_labels, 
+        yticklabels = constants.age_group_labels, 
+        cbar_ticks = cbar_ticks, 
+        vmax = vmax, vmin = 1))
+
+
+if __name__ == "__main__":
+    
+    interaction_file = sys.argv[1]
+    individual_file = sys.argv[2]
+    output_dir = sys.argv[3]
+    file_format = sys.argv[4]
+    
+    if len(sys.argv) > 5:
+        chunksize = int(sys.argv[5])
+    else:
+        chunksize = interaction_aggregates.CHUNKSIZE
+    
+    plt.rcParams["savefig.format"] = file_format
+    
+    # Stream the interactions file and accumulate the aggregates needed by all panels
+    aggregates = interaction_aggregates.load_aggregates(interaction_file, individual_file, 
+        chunksize)
+    
+    #############
+    # Figure 2A 
+    # ---------
+    # Histogram of number of daily interactions per person by network
+    #################################################################
+    
+    plt.rcParams['figure.figsize'] = [6, 4]
+    
+    fig, ax = figure_2a(aggregates)
+    plt.savefig(join(output_dir, "fig2a_daily_interactions_by_network"))
+    plt.close()
+    
+    #############
+    # Figure 2B
+    # ---------
+    # Number of daily interactions by age
+    #####################################
+    
+    plt.rcParams['figure.figsize'] = [6, 12]
+    
+    fig, ax = figure_2b(aggregates)
     plt.savefig(join(output_dir, "fig2b_daily_interactions_by_age"))
     plt.close()
     
@@ -160,34 +185,14 @@ if __name__ == "__main__":
     plt.rcParams['figure.figsize'] = [14, 12]
     
     vmaxes = [1000000, 120000, 120000]
-    
-    # Tick labels for colourbar
     cbar_incr = [200000, 20000, 20000]
-    cbar_ticks = [np.arange(incr, vmax + incr, incr) for incr, vmax in zip(cbar_incr, vmaxes)]
-    cbar_ticks = [np.insert(c, 0, 1) for c in cbar_ticks]
     
     indices = ["c", "d", "e"]
     networks = ["occupation", "household", "random"]
     
-    for i, (index, network) in enumerate(zip(indices, networks)):
-        
-        interaction_types_sub = [c.value for c in TransmissionTypeEnum \
-                                                    if c.name in ["_" + network]]
-        interaction_labels_sub = [c.name[1:].title() for c in TransmissionTypeEnum \
-                                                    if c.name in ["_" + network]]
-        
-        df_interact_sub = df_interact.loc[df_interact["type"].isin(interaction_types_sub)]
+    for index, network, vmax, incr in zip(indices, networks, vmaxes, cbar_incr):
         
-        plotting.plot_transmission_heatmap_by_age(
-            df_interact_sub, "age_group_1", "age_group_2", 
-            bins = len(AgeGroupEnum), 
-            xlabel = "Age of individual 1", 
-            ylabel = "Age of individual 2", 
-            legend_title = "Number of\ntransmission events",
-            xticklabels = constants.age_group_labels, 
-            yticklabels = constants.age_group_labels, 
-            cbar_ticks = cbar_ticks[i], 
-            vmax = vmaxes[i], vmin = 1)
+        fig, ax = figure_2_network(aggregates, network, vmax, incr)
         
         plt.savefig(join(output_dir, "fig2{}_transmission_matrix_{}".format(index, network)))
         plt.close()
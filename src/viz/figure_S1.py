@@ -8,66 +8,43 @@ from os.path import join
 import pandas as pd, numpy as np, sys
 from matplotlib import pyplot as plt
 
-import plotting
-from COVID19.model import AgeGroupEnum, EVENT_TYPES, TransmissionTypeEnum, OccupationNetworkEnum
+import plotting, model_output, outcome_cube, transmission_aggregates
+from model_enums import AgeGroupEnum, EVENT_TYPES, TransmissionTypeEnum, OccupationNetworkEnum
 
 age_group_labels = [enum.name[1:].replace("_","-") for enum in AgeGroupEnum]
 age_group_labels[-1] = "80+"
 
-if __name__ == "__main__":
-    
-    transmission_file = sys.argv[1]
-    individual_file = sys.argv[2]
-    output_dir = sys.argv[3]
-    file_format = sys.argv[4]
-    
-    plt.rcParams["savefig.format"] = file_format
-    
-    df_trans = pd.read_csv(transmission_file)
-    df_indiv = pd.read_csv(individual_file)
-    
-    ################################################################
-    # Proportion of infected/recovered/death within each age group #
-    ################################################################
-    
+
+def figure_S1(aggregates, df_indiv):
+    """
+    Proportion of each age group infected, hospitalised, and dead
+    
+    Arguments
+    ---------
+    aggregates : dict
+        Aggregates of the transmission file (see `transmission_aggregates`)
+    df_indiv : pandas.DataFrame
+        Individual file output from the model
+    """
     plt.rcParams['figure.figsize'] = [12, 12]
     
-    groupvars = ["time_infected", "time_hospitalised", "time_death"]
+    outcomes = ["infected", "hospitalised", "dead"]
     labels = ["Infected", "Hospitalisations", "Deaths"]
-    n_groups = len(groupvars)
-    
-    df_indiv_sub = df_indiv.groupby("age_group").size().reset_index(name = "total_popn")
-    
-    df_trans_sub_infected = df_trans[df_trans["time_infected"] > 0].groupby("age_group_recipient").size().reset_index(name = "total_infected")
-    df_trans_sub_hospitalised = df_trans[df_trans["time_hospitalised"] > 0].groupby("age_group_recipient").size().reset_index(name = "total_hospitalised")
-    df_trans_sub_death = df_trans[df_trans["time_death"] > 0].groupby("age_group_recipient").size().reset_index(name = "total_death")
+    n_groups = len(outcomes)
     
-    df = pd.merge(df_indiv_sub, df_trans_sub_infected, 
-        left_on = "age_group", right_on = "age_group_recipient", how = "left")
-    df = pd.merge(df, df_trans_sub_hospitalised, 
-        left_on = "age_group", right_on = "age_group_recipient", how = "left")
-    df = pd.merge(df, df_trans_sub_death, 
-        left_on = "age_group", right_on = "age_group_recipient", how = "left")
-    
-    df = df[["age_group", "total_popn", "total_infected", "total_hospitalised", "total_death"]]
-    df = df.replace(np.nan, 0)
-    
-    df["prop_infected"] = df.total_infected / df.total_popn
-    df["prop_hospitalised"] = df.total_hospitalised / df.total_popn
-    df["prop_death"] = df.total_death / df.total_popn
+    cube = transmission_aggregates.age_outcome_cube(aggregates, df_indiv)
+    proportions = outcome_cube.outcome_proportions(cube)
+    proportions = [proportions[:, cube["outcomes"].index(outcome)] for outcome in outcomes]
     
     bins = np.arange(0, len(AgeGroupEnum) + 1) - 0.1
-    plotvars = ["prop_infected", "prop_hospitalised", "prop_death"]
     xticklabels = age_group_labels
     xlabel = "Age group"
     ylims = [0.2, 0.015, 0.008]
     
     fig, ax = plt.subplots(nrows = n_groups)
-    for axi, var in enumerate(plotvars):
+    for axi, height in enumerate(proportions):
         
-        height = df[var].values
-        
-        ax[axi].bar(df["age_group"] + 0.4, height = height, width = 0.8,
+        ax[axi].bar(np.arange(len(height)) + 0.4, height = height, width = 0.8,
             alpha = 1.0, color = "#0072B2", edgecolor = "#0d1a26", 
             linewidth = 0.5, zorder = 3)
 
@@ -97,21 +74,47 @@ if __name__ == "__main__":
     
     plt.subplots_adjust(hspace = 0.5)
     
-    plt.savefig(join(output_dir, "figS1_I_H_D"))
-    plt.close()
+    return(fig, ax)
 
 
-    ####################################################################
-    # Age distribution of hospitalisations, ICU admissions, and deaths #
-    ####################################################################
-    
+def figure_S2(aggregates):
+    """
+    Age distribution of hospitalisations, ICU admissions, and deaths
+    
+    Arguments
+    ---------
+    aggregates : dict
+        Aggregates of the transmission file (see `transmission_aggregates`)
+    """
     plt.rcParams['figure.figsize'] = [12, 12]
-    groupvars = ["time_hospitalised", "time_critical", "time_death"]
+    outcomes = ["hospitalised", "critical", "dead"]
     labels = ["Hospitalisations", "ICU", "Deaths"]
+    
+    cube = transmission_aggregates.age_outcome_cube(aggregates)
+    counts = [cube["counts"][:, cube["outcomes"].index(outcome)] for outcome in outcomes]
+    
+    fig, ax = plotting.plot_bars_by_age(counts, group_labels = labels,
+        density = True, xticklabels = age_group_labels, xlabel = "Age group", ylim = 0.5)
+    
+    return(fig, ax)
 
-    fig, ax = plotting.plot_hist_by_age(df_trans, groupvars = groupvars, group_labels = labels,
-        NBINS = len(AgeGroupEnum), density = True, xticklabels = age_group_labels, 
-        xlabel = "Age group", ylim = 0.5, age_group_var = "age_group_recipient")
+
+if __name__ == "__main__":
+    
+    transmission_file = sys.argv[1]
+    individual_file = sys.argv[2]
+    output_dir = sys.argv[3]
+    file_format = sys.argv[4]
+    
+    plt.rcParams["savefig.format"] = file_format
+    
+    aggregates = transmission_aggregates.load_aggregates(transmission_file)
+    df_indiv = model_output.read_individuals(individual_file, columns = ["age_group"])
+    
+    fig, ax = figure_S1(aggregates, df_indiv)
+    plt.savefig(join(output_dir, "figS1_I_H_D"))
+    plt.close()
     
+    fig, ax = figure_S2(aggregates)
     plt.savefig(join(output_dir, "figS2_H_ICU_D"))
     plt.close()
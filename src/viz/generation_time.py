@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Generation times by infectious status of the source within windows of infection time
+
+The generation-time cube (aggregate generation_time_by_status_day of `transmission_aggregates`)
+counts transmissions by status of the source, day of infection of the recipient, and generation
+time, and is built in one pass over the transmission file.  Counts within any window of infection
+days are differences of its cumulative sum over days (see `rolling`), so windows (before/after
+lockdown, rolling 14-day windows from `rolling.window_bounds`, ...) are cheap slices rather than
+rescans of the transmission file.  Cubes of several runs (e.g. of an ensemble) can be pooled
+with `counting.combine_counts`.
+"""
+
+import numpy as np
+
+import rolling
+
+# Default length of windows (days)
+WINDOW_LENGTH = 14
+
+
+def window_counts(cube, start, end):
+    """
+    Generation-time counts by status of the source for recipients infected on days [start, end)
+
+    Arguments
+    ---------
+    cube : np.array (n_status, n_days, n_generation_times)
+        Generation-time cube
+    start, end : int
+        First day and day after the last day of the window (clipped to the days of the cube)
+
+    Returns
+    -------
+    np.array (n_status, n_generation_times)
+    """
+    return(windows_counts(cube, [(start, end)])[0])
+
+
+def windows_counts(cube, windows):
+    """
+    Generation-time counts by status of the source in each of several windows of infection days
+
+    Arguments
+    ---------
+    cube : np.array (n_status, n_days, n_generation_times)
+        Generation-time cube
+    windows : list of tuples
+        (start, end) days of each window (see `window_counts`)
+
+    Returns
+    -------
+    np.array (n_windows, n_status, n_generation_times)
+    """
+    return(rolling.window_sums(cube, windows, axis = 1).transpose(1, 0, 2))
+
+
+def lockdown_windows(lockdown_start, window = WINDOW_LENGTH, gap = 7):
+    """
+    Windows of `window` days before and after lockdown, each `gap` days from the start of
+    lockdown (so that transmissions around the start of lockdown are excluded)
+
+    Returns
+    -------
+    list of (start, end) days of the windows before and after lockdown
+    """
+    return([(lockdown_start - window - gap, lockdown_start - gap),
+        (lockdown_start + gap, lockdown_start + gap + window)])
+
+
+def mean_generation_time(counts):
+    """
+    Mean generation time of counts over generation times (the last axis); nan if no counts
+    """
+    counts = np.asarray(counts, dtype = float)
+    generation_times = np.arange(counts.shape[-1])
+
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+        return(counts @ generation_times / counts.sum(axis = -1))
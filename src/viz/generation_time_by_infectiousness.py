@@ -3,15 +3,19 @@
 Script to create figure 3
 
 Histogram of generation time of transmission events stratified by infectious state of the source
+
+If lockdown occurs in the timeseries file, histograms are also drawn for recipients infected in the
+14 days ending 7 days before lockdown and starting 7 days after lockdown (suffixed "_pre_lockdown"
+and "_post_lockdown"), along with a comparison of both windows (suffixed "_lockdown_windows").  
 """
 
-from os.path import join
+from os.path import join, splitext
 
 import pandas as pd, numpy as np, sys
 from matplotlib import pyplot as plt
 
-import plotting
-from COVID19.model import AgeGroupEnum, EVENT_TYPES, TransmissionTypeEnum, OccupationNetworkEnum
+import plotting, model_output, generation_time, transmission_aggregates
+from model_enums import AgeGroupEnum, EVENT_TYPES, TransmissionTypeEnum, OccupationNetworkEnum
 
 infectious_compartments = ["PRESYMPTOMATIC", "PRESYMPTOMATIC_MILD", \
     "ASYMPTOMATIC", "SYMPTOMATIC", "SYMPTOMATIC_MILD"]
@@ -20,36 +24,53 @@ infectious_names = [e.name for e in EVENT_TYPES if e.name in infectious_compartm
 infectious_labels = [plotting.EVENT_TYPE_STRING[e.value] for e in EVENT_TYPES if e.name in infectious_compartments]
 
 
-if __name__ == "__main__":
+def rebin_generation_times(generation_time_by_status, bins):
+    """
+    Rebin counts of each generation time (days) by infectious status to `bins`
     
-    transmission_file = sys.argv[1]
-    timeseries_file = sys.argv[2]
-    output_file = sys.argv[3]
+    Returns
+    -------
+    np.array (n_status, len(bins) - 1)
+    """
+    n_groups, n_times = generation_time_by_status.shape
     
-    df_trans = pd.read_csv(transmission_file)
-    df_ts = pd.read_csv(timeseries_file)
+    return(plotting.grouped_histogram(np.tile(np.arange(n_times), n_groups), 
+        np.repeat(np.arange(n_groups), n_times), n_groups, bins, 
+        weights = generation_time_by_status.ravel()))
+
+
+def figure_generation_time(aggregates, NBINS = 18, window = None, ylim = 11000):
+    """
+    Histograms of generation time by infectious status of the source
     
+    Arguments
+    ---------
+    aggregates : dict
+        Aggregates of the transmission file (see `transmission_aggregates`)
+    NBINS : int
+        Number of bin edges of generation time (days)
+    window : tuple
+        (start, end) days of infection of recipients to include (all transmissions if None)
+    ylim : float
+        Upper limit of the y-axis (set automatically if None)
+    """
     plt.rcParams['figure.figsize'] = [10, 10]
     
-    # # Find lockdown time (in simulation time)
-    # lockdown_start = np.min(df_ts.loc[df_ts.lockdown == 1]["time"])
-    #
-    # # Window length (days)
-    # window_length = 14
-    #
-    # # First panel will show 14 days preceding lockdown, second panel 14 days succeeding lockdown
-    # window1_start = lockdown_start - window_length - 7
-    # window2_start = lockdown_start + 7
-    # window_start_times = [window1_start, window2_start]
+    if window is None:
+        generation_time_by_status = aggregates["generation_time_by_status"][infectious_types]
+    else:
+        generation_time_by_status = generation_time.window_counts(
+            aggregates["generation_time_by_status_day"], *window)[infectious_types]
     
     n_groups = len(infectious_types)
-    NBINS = 18
+    bins = np.arange(NBINS)
+    
+    counts_by_group = rebin_generation_times(generation_time_by_status, bins)
     
     fig, ax = plt.subplots(nrows = n_groups)
-    for i, state in enumerate(infectious_types):
-        hist = df_trans.loc[df_trans["status_source"] == state]["generation_time"]
-        bins = np.arange(NBINS)
-        ax[i].hist(hist, bins, color = "#0072B2",
+    for i, counts in enumerate(counts_by_group):
+        
+        ax[i].hist(bins[:-1], bins, weights = counts, color = "#0072B2",
                    width = 0.8, edgecolor = "#0072B2",
                    linewidth = 0.5, zorder = 3,
                    label = infectious_labels[i])
@@ -57,11 +78,12 @@ if __name__ == "__main__":
         ax[i].spines["right"].set_visible(False)
         ax[i].set_xlabel("")
         ax[i].set_ylabel("")
-        ax[i].set_ylim([0, 11000])
         ax[i].set_xlim([0, 15])
         
-        ax[i].set_yticks([0, 10000])
-        ax[i].set_yticklabels([0, 10000], size = 16)
+        if ylim is not None:
+            ax[i].set_ylim([0, ylim])
+            ax[i].set_yticks([0, 10000])
+            ax[i].set_yticklabels([0, 10000], size = 16)
         
         if i == (n_groups - 1):
             ax[i].set_xticks([0, 5, 10, 15])
@@ -76,6 +98,99 @@ if __name__ == "__main__":
             ax[i].set_xlabel("Generation time", fontsize = 20)
         if i ==0:
             ax[i].set_title("", size = 20)
+    
+    return(fig, ax)
+
+
+def figure_generation_time_windows(aggregates, windows, window_labels, NBINS = 18):
+    """
+    Distributions of generation time by infectious status of the source in several windows of
+    infection time (for instance, before and after lockdown)
+    
+    Arguments
+    ---------
+    aggregates : dict
+        Aggregates of the transmission file (see `transmission_aggregates`)
+    windows : list of tuples
+        (start, end) days of infection of recipients in each window
+    window_labels : list of str
+        Legend labels of each window
+    NBINS : int
+        Number of bin edges of generation time (days)
+    """
+    plt.rcParams['figure.figsize'] = [10, 10]
+    
+    counts = generation_time.windows_counts(aggregates["generation_time_by_status_day"], windows)
+    counts = counts[:, infectious_types]
+    means = generation_time.mean_generation_time(counts)
+    
+    n_groups = len(infectious_types)
+    bins = np.arange(NBINS)
+    colours = ["#0072B2", "#D55E00", "#009E73", "#CC79A7"]
+    
+    fig, ax = plt.subplots(nrows = n_groups)
+    for j, (counts_window, label) in enumerate(zip(counts, window_labels)):
+        
+        counts_by_group = rebin_generation_times(counts_window, bins)
+        
+        with np.errstate(invalid = "ignore", divide = "ignore"):
+            density = counts_by_group/counts_by_group.sum(axis = 1, keepdims = True)
+        
+        for i in range(n_groups):
+            ax[i].step(bins[:-1], density[i], where = "mid", color = colours[j], lw = 2, 
+                label = "{} (mean {:.1f})".format(label, means[j, i]))
+    
+    for i in range(n_groups):
+        ax[i].spines["top"].set_visible(False)
+        ax[i].spines["right"].set_visible(False)
+        ax[i].set_xlim([0, 15])
+        ax[i].legend(frameon = False, fontsize = 10, loc = "upper right")
+        ax[i].text(0.02, 0.75, "{}".format(infectious_labels[i]),
+            ha = 'left', va = 'bottom', transform = ax[i].transAxes, fontsize = 14)
+        
+        if i == (n_groups - 1):
+            ax[i].set_xticks([0, 5, 10, 15])
+            ax[i].set_xticklabels([0, 5, 10, 15], size = 16)
+            ax[i].set_xlabel("Generation time", fontsize = 20)
+        else: 
+            ax[i].set_xticks([])
+    
+    return(fig, ax)
 
+
+if __name__ == "__main__":
+    
+    transmission_file = sys.argv[1]
+    timeseries_file = sys.argv[2]
+    output_file = sys.argv[3]
+    
+    if len(sys.argv) > 4:
+        plt.rcParams["savefig.format"] = sys.argv[4]
+    
+    aggregates = transmission_aggregates.load_aggregates(transmission_file)
+    
+    fig, ax = figure_generation_time(aggregates)
+    
     plt.savefig(output_file)
     plt.close()
+    
+    # Find lockdown time (in simulation time)
+    df_ts = model_output.read_timeseries(timeseries_file, columns = ["time", "lockdown"])
+    lockdown_times = df_ts.loc[df_ts.lockdown == 1]["time"]
+    
+    if (len(lockdown_times) > 0) and ("generation_time_by_status_day" in aggregates):
+        lockdown_start = np.min(lockdown_times)
+        stem, ext = splitext(output_file)
+        
+        # Windows of 14 days ending 7 days before lockdown and starting 7 days after lockdown
+        windows = generation_time.lockdown_windows(lockdown_start)
+        window_labels = ["Before lockdown", "After lockdown"]
+        
+        for window, suffix in zip(windows, ["pre_lockdown", "post_lockdown"]):
+            fig, ax = figure_generation_time(aggregates, window = window, ylim = None)
+            plt.savefig(stem + "_" + suffix + ext)
+            plt.close()
+        
+        fig, ax = figure_generation_time_windows(aggregates, windows, window_labels)
+        plt.savefig(stem + "_lockdown_windows" + ext)
+        plt.close()
@@ -8,13 +8,35 @@ from os.path import join
 import pandas as pd, numpy as np, sys
 from matplotlib import pyplot as plt
 
-import plotting
-from COVID19.model import AgeGroupEnum, EVENT_TYPES, TransmissionTypeEnum, OccupationNetworkEnum
+import plotting, rates, transmission_aggregates
+from model_enums import AgeGroupEnum, EVENT_TYPES, TransmissionTypeEnum, OccupationNetworkEnum
 
 n_age = len(AgeGroupEnum) + 1
 age_group_labels = [enum.name[1:].replace("_","-") for enum in AgeGroupEnum]
 age_group_labels[-1] = "80+"
 
+
+def figure_4(aggregates, n_bootstrap = rates.N_BOOTSTRAP):
+    """
+    Bar chart of IFR by age group (with bootstrap 95% confidence intervals) from aggregates of the
+    transmission file (no error bars if n_bootstrap is 0)
+    """
+    plt.rcParams['figure.figsize'] = [12, 8]
+    
+    df_rates = transmission_aggregates.ifr_by_age(aggregates, n_bootstrap).iloc[:-1]
+    
+    # Error bars of bootstrap 95% confidence intervals
+    heights = df_rates.rate.values
+    yerr = np.abs(np.vstack([heights - df_rates.lower.values, df_rates.upper.values - heights]))
+    if np.isnan(yerr).all():
+        yerr = None
+    
+    fig, ax = plotting.plot_ifr_by_age(heights, 
+        xticklabels = age_group_labels, xlabel = "Age group", yerr = yerr)
+    
+    return(fig, ax)
+
+
 if __name__ == "__main__":
     
     transmission_file = sys.argv[1]
@@ -22,13 +44,10 @@ if __name__ == "__main__":
     file_format = sys.argv[3]
     
     plt.rcParams["savefig.format"] = file_format
-    plt.rcParams['figure.figsize'] = [12, 8]
     
-    df_trans = pd.read_csv(transmission_file)
+    aggregates = transmission_aggregates.load_aggregates(transmission_file)
     
-    fig, ax = plotting.ifr_hist_by_age(df_trans, "time_death", "time_infected", NBINS = n_age - 1, 
-        xticklabels = age_group_labels, xlabel = "Age group", age_group_var = "age_group_recipient")
+    fig, ax = figure_4(aggregates)
     
     plt.savefig(output_figure)
     plt.close()
-
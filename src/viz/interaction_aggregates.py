@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Aggregates of the interactions file used by Figure 2
+
+The interactions file is streamed in chunks of rows and only the aggregates needed by the panels
+of Figure 2 are accumulated, so peak memory is bounded by the chunk size and the population size
+rather than by the number of interactions.  Aggregates can be saved to (and loaded from) a .npz
+file:
+
+    python src/viz/interaction_aggregates.py <interaction_file> <individual_file> \
+        <aggregates_file.npz> [chunksize]
+
+Individual IDs are assumed to be 0, 1, ..., n_individuals - 1 (as written by the model).
+
+Aggregates (keys of the returned dictionary)
+--------------------------------------------
+degree_by_type : np.array (n_individuals, n_types)
+    Number of daily interactions of each individual (indexed by ID) on each network (individuals
+    without interactions have zero counts)
+age_group : np.array (n_individuals, )
+    Age group of each individual (indexed by ID)
+type_age_age : np.array (n_types, n_age, n_age)
+    Number of interactions by network type, age group of individual 1 and age group of
+    individual 2
+"""
+
+from os.path import splitext
+import sys
+
+import numpy as np
+
+import constants, counting, model_output
+
+# Columns of the interactions file needed to compute all aggregates
+INTERACTION_COLUMNS = ["ID_1", "age_group_1", "age_group_2", "type"]
+
+# Default number of rows of the interactions file read at a time
+CHUNKSIZE = 2**22
+
+
+def empty_aggregates(age_group, n_types = len(constants.interaction_types),
+        n_age = constants.n_age):
+    """
+    Aggregates of an empty interactions file
+
+    Arguments
+    ---------
+    age_group : np.array
+        Age group of each individual (indexed by ID)
+    """
+    age_group = np.asarray(age_group)
+
+    return({
+        "degree_by_type": np.zeros((len(age_group), n_types), dtype = np.int32),
+        "age_group": age_group,
+        "type_age_age": np.zeros((n_types, n_age, n_age), dtype = np.int64)
+    })
+
+
+def contact_degree(id_1, types, n_individuals, n_types = len(constants.interaction_types)):
+    """
+    Number of interactions of each individual on each network (with a single np.bincount)
+
+    Arguments
+    ---------
+    id_1 : np.array
+        ID of individual 1 of each interaction
+    types : np.array
+        Network type of each interaction
+    n_individuals : int
+        Number of individuals (individuals without interactions have a degree of zero)
+    n_types : int
+        Number of network types
+
+    Returns
+    -------
+    np.array (n_individuals, n_types) of degree of each individual (indexed by ID) on each network
+    """
+    keys = np.asarray(id_1, dtype = np.int64)*n_types + np.asarray(types, dtype = np.int64)
+
+    return(np.bincount(keys, minlength = n_individuals*n_types).reshape(n_individuals, n_types))
+
+
+def accumulate(aggregates, df_interact):
+    """
+    Add the interactions in a chunk of the interactions file to aggregates (in place)
+
+    Arguments
+    ---------
+    aggregates : dict
+        Aggregates (see `empty_aggregates`)
+    df_interact : pandas.DataFrame
+        Chunk of the interactions file with (at least) the columns in INTERACTION_COLUMNS
+    """
+    degree_by_type = aggregates["degree_by_type"]
+    type_age_age = aggregates["type_age_age"]
+
+    types = np.asarray(df_interact["type"], dtype = np.int64)
+
+    degree_by_type += contact_degree(df_interact["ID_1"], types, *degree_by_type.shape)
+
+    type_age_age += counting.transmission_tensor(df_interact, "age_group_1", "age_group_2",
+        n_groups = type_age_age.shape[1], panelvar = "type", panels = range(type_age_age.shape[0]))
+
+    return(aggregates)
+
+
+def individual_age_groups(individual_file):
+    """
+    Age group of each individual indexed by ID (from the individual file)
+    """
+    df_indiv = model_output.read_individuals(individual_file, columns = ["ID", "age_group"])
+
+    age_group = np.zeros(df_indiv.shape[0], dtype = np.int8)
+    age_group[df_indiv.ID.values] = df_indiv.age_group.values
+    return(age_group)
+
+
+def compute_aggregates(interaction_file, individual_file, chunksize = CHUNKSIZE):
+    """
+    Compute all aggregates of the interactions file by streaming it in chunks (see module
+    docstring)
+
+    Arguments
+    ---------
+    interaction_file, individual_file : str
+        Paths to interactions and individual files (in any output format)
+    chunksize : int
+        Number of rows of the interactions file read at a time
+
+    Returns
+    -------
+    dict of np.array
+    """
+    aggregates = empty_aggregates(individual_age_groups(individual_file))
+
+    for df_interact in model_output.iter_interactions(interaction_file,
+            columns = INTERACTION_COLUMNS, chunksize = chunksize):
+        accumulate(aggregates, df_interact)
+
+    return(aggregates)
+
+
+def save_aggregates(aggregates, path):
+    np.savez_compressed(path, **aggregates)
+
+
+def load_aggregates(path, individual_file = None, chunksize = CHUNKSIZE):
+    """
+    Load aggregates from a .npz file or compute them from an interactions file
+    """
+    if splitext(path)[1] == ".npz":
+        with np.load(path) as data:
+            return({key: data[key] for key in data.files})
+
+    return(compute_aggregates(path, individual_file, chunksize))
+
+
+def degree_hist_by_type(aggregates, bin_edges):
+    """
+    Histogram of the number of daily interactions per individual on each network
+
+    Returns
+    -------
+    np.array (n_types, len(bin_edges) - 1)
+    """
+    degree_by_type = aggregates["degree_by_type"]
+
+    return(np.stack([np.histogram(degree_by_type[:, t], bin_edges)[0]
+        for t in range(degree_by_type.shape[1])]))
+
+
+def degree_hist_by_age(aggregates, bin_edges, n_age = constants.n_age):
+    """
+    Histogram of the number of daily interactions per individual (across all networks) in each
+    age group
+
+    Returns
+    -------
+    np.array (n_age, len(bin_edges) - 1)
+    """
+    degree = aggregates["degree_by_type"].sum(axis = 1)
+
+    return(counting.grouped_histogram(degree, aggregates["age_group"], n_age, bin_edges))
+
+
+if __name__ == "__main__":
+
+    interaction_file = sys.argv[1]
+    individual_file = sys.argv[2]
+    aggregates_file = sys.argv[3]
+    chunksize = int(sys.argv[4]) if len(sys.argv) > 4 else CHUNKSIZE
+
+    aggregates = compute_aggregates(interaction_file, individual_file, chunksize)
+    save_aggregates(aggregates, aggregates_file)
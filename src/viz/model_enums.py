@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Enums of the model OpenABM-Covid19 used by the figure and table scripts, without the simulator
+
+AgeGroupEnum, EVENT_TYPES, TransmissionTypeEnum and OccupationNetworkEnum are rebuilt from a
+snapshot of the names and values of their members (model_enums.json, next to this module), so
+that scripts that only read model output don't import the compiled simulator (COVID19.model).
+The snapshot is generated from, and checked against, the installed model:
+
+    python src/viz/model_enums.py            # check the snapshot against COVID19.model
+    python src/viz/model_enums.py --update   # regenerate the snapshot from COVID19.model
+"""
+
+from os.path import join, dirname, abspath
+import enum, json, sys
+
+SNAPSHOT_FILE = join(dirname(abspath(__file__)), "model_enums.json")
+
+# Enums of COVID19.model included in the snapshot
+ENUM_NAMES = ["AgeGroupEnum", "EVENT_TYPES", "TransmissionTypeEnum", "OccupationNetworkEnum"]
+
+
+def snapshot_from_model():
+    """
+    Names and values of the members of each enum of the installed model (imports COVID19.model)
+
+    Returns
+    -------
+    dict of enum name to dict of the value of each member (by name)
+    """
+    from COVID19 import model
+
+    return({name: {member.name: member.value for member in getattr(model, name)}
+        for name in ENUM_NAMES})
+
+
+def read_snapshot(snapshot_file = SNAPSHOT_FILE):
+    """Names and values of the members of each enum in the snapshot"""
+    with open(snapshot_file) as f:
+        return(json.load(f))
+
+
+def write_snapshot(snapshot, snapshot_file = SNAPSHOT_FILE):
+    """Write a snapshot of enums"""
+    with open(snapshot_file, "w") as f:
+        json.dump(snapshot, f, indent = 1)
+        f.write("\n")
+
+
+def check_snapshot(snapshot_file = SNAPSHOT_FILE):
+    """
+    Check the snapshot against the enums of the installed model
+
+    Raises
+    ------
+    ValueError if the members of an enum differ from those in the snapshot
+    """
+    snapshot = read_snapshot(snapshot_file)
+    model_snapshot = snapshot_from_model()
+
+    for name in ENUM_NAMES:
+        if list(snapshot.get(name, {}).items()) != list(model_snapshot[name].items()):
+            raise ValueError("Snapshot of {} in {} differs from COVID19.model; regenerate it "
+                "with `python src/viz/model_enums.py --update`".format(name, snapshot_file))
+
+
+_snapshot = read_snapshot()
+
+AgeGroupEnum = enum.Enum("AgeGroupEnum", _snapshot["AgeGroupEnum"])
+EVENT_TYPES = enum.Enum("EVENT_TYPES", _snapshot["EVENT_TYPES"])
+TransmissionTypeEnum = enum.Enum("TransmissionTypeEnum", _snapshot["TransmissionTypeEnum"])
+OccupationNetworkEnum = enum.Enum("OccupationNetworkEnum", _snapshot["OccupationNetworkEnum"])
+
+
+if __name__ == "__main__":
+
+    if "--update" in sys.argv[1:]:
+        write_snapshot(snapshot_from_model())
+    else:
+        check_snapshot()
+        print("Snapshot of model enums matches COVID19.model")
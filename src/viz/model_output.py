@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Reading and writing of output files of OpenABM-Covid19 (transmission, individual, interaction,
+and timeseries files) in either CSV or a typed, compressed columnar format (parquet or feather)
+
+Each type of output file has a known schema of compact dtypes (int8 for age groups and statuses,
+int16 for times, int32 for IDs, category for network types) and readers only load the columns
+requested by each consumer, for instance:
+
+    df_trans = read_transmissions(path, columns = ["age_group_recipient", "time_death"])
+
+CSV files are converted once to a binary columnar cache which is used by all later reads (see
+`output_cache`); set the environment variable MODEL_OUTPUT_CACHE=0 to disable the cache.
+"""
+
+from os.path import exists, splitext
+from fnmatch import fnmatchcase
+import os
+
+import pandas as pd
+
+import output_cache
+
+OUTPUT_FORMATS = ["csv", "parquet", "feather"]
+
+# File extension of each output format
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+# Should CSV files be read through the columnar cache
+USE_CACHE = os.environ.get("MODEL_OUTPUT_CACHE", "1") != "0"
+
+# Schemas of model output files: (column name pattern, dtype); the first matching pattern is used
+# and columns not matching any pattern have their dtype inferred
+TRANSMISSION_SCHEMA = [
+    ("ID_*", "int32"),
+    ("house_no_*", "int32"),
+    ("age_group_*", "int8"),
+    ("occupation_network_*", "int8"),
+    ("worker_type_*", "int8"),
+    ("hospital_state_*", "int8"),
+    ("status_*", "int8"),
+    ("infector_network", "category"),
+    ("generation_time", "int16"),
+    ("time_*", "int16"),
+    ("is_case", "int8")
+]
+
+INDIVIDUAL_SCHEMA = [
+    ("ID", "int32"),
+    ("house_no", "int32"),
+    ("age_group", "int8"),
+    ("current_status", "int8"),
+    ("occupation_network", "int8"),
+    ("worker_type", "int8"),
+    ("assigned_worker_ward_type", "int8"),
+    ("quarantined", "int8"),
+    ("test_status", "int8"),
+    ("app_user", "int8"),
+    ("time_*", "int16"),
+    ("infection_count", "int16")
+]
+
+INTERACTION_SCHEMA = [
+    ("ID_*", "int32"),
+    ("house_no_*", "int32"),
+    ("age_group_*", "int8"),
+    ("occupation_network_*", "int8"),
+    ("worker_type_*", "int8"),
+    ("type", "category"),
+    ("traceable", "int8"),
+    ("manual_traceable", "int8")
+]
+
+TIMESERIES_SCHEMA = [
+    ("time", "int16"),
+    ("lockdown", "int8"),
+    ("test_on_symptoms", "int8"),
+    ("app_turned_on", "int8")
+]
+
+
+def schema_dtypes(schema, columns):
+    """
+    Dictionary of column: dtype for columns with a dtype in a schema
+
+    Arguments
+    ---------
+    schema : list of tuples
+        Schema of (column name pattern, dtype) tuples
+    columns : list of str
+        Column names
+    """
+    dtypes = dict()
+    for col in columns:
+        for pattern, dtype in schema:
+            if fnmatchcase(col, pattern):
+                dtypes[col] = dtype
+                break
+    return(dtypes)
+
+
+def apply_schema(df, schema):
+    """
+    Cast columns of a DataFrame to the dtypes of a schema (other columns are left unchanged)
+    """
+    dtypes = schema_dtypes(schema, df.columns)
+    dtypes = {col: dtype for col, dtype in dtypes.items() if df[col].dtype != dtype}
+
+    if dtypes:
+        df = df.astype(dtypes)
+    return(df)
+
+
+def narrow_dtypes(df):
+    """
+    Downcast integer columns of a DataFrame to the smallest integer type holding their values
+    (used for output files without a schema)
+    """
+    for col in df.columns:
+        if pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast = "integer")
+    return(df)
+
+
+def write_output(df, path, output_format = "csv", schema = None):
+    """
+    Write a DataFrame of model output in a given format
+
+    Arguments
+    ---------
+    df : pandas.DataFrame
+        Model output
+    path : str
+        Path of the output file (the extension is replaced with that of `output_format`)
+    output_format : str
+        One of "csv", "parquet", or "feather"
+    schema : list of tuples
+        Schema of the output file (integer columns are downcast if not given)
+
+    Returns
+    -------
+    Path of the written file
+    """
+    path = splitext(path)[0] + EXTENSIONS[output_format]
+
+    if output_format != "csv":
+        df = apply_schema(df, schema) if schema else narrow_dtypes(df)
+
+    if output_format == "csv":
+        df.to_csv(path, index = False)
+    elif output_format == "parquet":
+        df.to_parquet(path, index = False, compression = "zstd")
+    elif output_format == "feather":
+        df.reset_index(drop = True).to_feather(path, compression = "zstd")
+    else:
+        raise ValueError("Unknown output format: {}".format(output_format))
+
+    return(path)
+
+
+def convert_output(csv_file, output_format, schema = None, remove = True):
+    """
+    Convert a CSV file written by the model to another output format
+
+    Arguments
+    ---------
+    csv_file : str
+        Path to CSV file of model output
+    output_format : str
+        One of "csv", "parquet", or "feather"
+    schema : list of tuples
+        Schema of the output file
+    remove : bool
+        Should the CSV file be removed after conversion
+
+    Returns
+    -------
+    Path of the converted file
+    """
+    if output_format == "csv":
+        return(csv_file)
+
+    df = read_output(csv_file, schema = schema, cache = False)
+    path = write_output(df, csv_file, output_format, schema)
+
+    if remove:
+        os.remove(csv_file)
+
+    return(path)
+
+
+def find_output_file(path):
+    """
+    Find a model output file in any of the output formats
+
+    If `path` doesn't exist, files with the same name but with the extension of another output
+    format are searched for (so that "data/transmission_Run1.csv" will find
+    "data/transmission_Run1.parquet").
+    """
+    if exists(path):
+        return(path)
+
+    stem = splitext(path)[0]
+    for ext in EXTENSIONS.values():
+        if exists(stem + ext):
+            return(stem + ext)
+
+    raise FileNotFoundError("No model output file found for {}".format(path))
+
+
+def read_output(path, columns = None, schema = None, cache = None):
+    """
+    Read a model output file in any of the output formats
+
+    Arguments
+    ---------
+    path : str
+        Path to output file (see `find_output_file`)
+    columns : list of str
+        Columns to read (defaults to all columns)
+    schema : list of tuples
+        Schema of the output file; columns are read with (or cast to) the dtypes of the schema
+    cache : bool
+        Should CSV files be read through the columnar cache (defaults to USE_CACHE)
+
+    Returns
+    -------
+    pandas.DataFrame of model output
+    """
+    path = find_output_file(path)
+    ext = splitext(path)[1]
+
+    if cache is None:
+        cache = USE_CACHE
+
+    if ext == EXTENSIONS["parquet"]:
+        df = pd.read_parquet(path, columns = columns)
+    elif ext == EXTENSIONS["feather"]:
+        df = pd.read_feather(path, columns = columns)
+    elif cache:
+        df = output_cache.read_cached(path,
+            lambda p: read_output(p, schema = schema, cache = False), columns)
+    else:
+        dtypes = None
+        if schema:
+            header = columns if columns is not None else pd.read_csv(path, nrows = 0).columns
+
+            # Categories are cast after parsing (read_csv would create categories of strings)
+            dtypes = {col: dtype for col, dtype in schema_dtypes(schema, header).items()
+                if dtype != "category"}
+
+        df = pd.read_csv(path, usecols = columns, dtype = dtypes)
+
+    return(apply_schema(df, schema) if schema else df)
+
+
+def iter_output(path, columns = None, schema = None, chunksize = 2**22):
+    """
+    Read a model output file in chunks of rows (so that memory use is bounded by `chunksize`)
+    
+    Arguments
+    ---------
+    path : str
+        Path to output file (see `find_output_file`)
+    columns : list of str
+        Columns to read (defaults to all columns)
+    schema : list of tuples
+        Schema of the output file
+    chunksize : int
+        Maximum number of rows in each chunk of CSV and parquet files (feather files are read in
+        the record batches they were written in)
+    
+    Yields
+    ------
+    pandas.DataFrame of each chunk of model output
+    """
+    path = find_output_file(path)
+    ext = splitext(path)[1]
+    
+    if ext == EXTENSIONS["parquet"]:
+        import pyarrow.parquet as pq
+        
+        batches = (batch.to_pandas() for batch in 
+            pq.ParquetFile(path).iter_batches(batch_size = chunksize, columns = columns))
+    elif ext == EXTENSIONS["feather"]:
+        import pyarrow as pa
+        
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        batches = (reader.get_batch(i).select(columns).to_pandas() if columns else 
+            reader.get_batch(i).to_pandas() for i in range(reader.num_record_batches))
+    else:
+        dtypes = None
+        if schema:
+            header = columns if columns is not None else pd.read_csv(path, nrows = 0).columns
+            dtypes = {col: dtype for col, dtype in schema_dtypes(schema, header).items()
+                if dtype != "category"}
+        
+        batches = pd.read_csv(path, usecols = columns, dtype = dtypes, chunksize = chunksize)
+    
+    for df in batches:
+        yield(apply_schema(df, schema) if schema else df)
+
+
+def read_transmissions(path, columns = None):
+    """Read a transmission file (see `read_output`)"""
+    return(read_output(path, columns, TRANSMISSION_SCHEMA))
+
+
+def read_individuals(path, columns = None):
+    """Read an individual file (see `read_output`)"""
+    return(read_output(path, columns, INDIVIDUAL_SCHEMA))
+
+
+def read_interactions(path, columns = None):
+    """Read an interactions file (see `read_output`)"""
+    return(read_output(path, columns, INTERACTION_SCHEMA))
+
+
+def read_timeseries(path, columns = None):
+    """Read a timeseries file (see `read_output`)"""
+    return(read_output(path, columns, TIMESERIES_SCHEMA))
+
+
+def iter_interactions(path, columns = None, chunksize = 2**22):
+    """Read an interactions file in chunks (see `iter_output`)"""
+    return(iter_output(path, columns, INTERACTION_SCHEMA, chunksize))
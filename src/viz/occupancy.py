@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Daily occupancy of hospital beds (general ward and ICU) by age group
+
+Each stay in a setting is an interval [entry, exit) of days built from the time_* columns of the
+transmission file:
+
+    ward : [time_hospitalised, first of time_critical, time_recovered, time_death) and
+           [time_hospitalised_recovering, first of time_recovered, time_death)
+    ICU  : [time_critical, first of time_hospitalised_recovering, time_death)
+
+Stays that haven't ended by the end of the simulation are counted until the last day.  Occupancy
+is computed with an event sweep: +1 on the day of entry and -1 on the day of exit of every stay
+are summed by age group and day with one np.bincount, and the cumulative sum over days gives the
+number of occupied beds on each day, at a cost of O(N + T) rather than one pass over the stays per
+day.  Occupancy of runs of an ensemble (processed in parallel) is summarised by quantiles across
+runs:
+
+    python src/viz/occupancy.py <output_figure> <format> <transmission_file> \
+        [transmission_file ...]
+
+writes the figure and the daily occupancy (median and 90% band across runs) to
+<output_figure>.csv.
+"""
+
+from os.path import splitext
+from functools import partial
+from multiprocessing import Pool, cpu_count
+import sys
+
+import numpy as np, pandas as pd
+from matplotlib import pyplot as plt
+
+import constants, model_output, plotting
+
+SETTINGS = ["ward", "icu"]
+SETTING_LABELS = ["General ward", "ICU"]
+
+OCCUPANCY_COLUMNS = ["age_group_recipient", "time_hospitalised", "time_critical",
+    "time_hospitalised_recovering", "time_recovered", "time_death"]
+
+# Quantiles of occupancy across runs of an ensemble
+QUANTILES = [0.05, 0.5, 0.95]
+
+
+def first_time(*times):
+    """
+    First of several event times of each individual (-1 if none of the events occurred)
+    """
+    times = np.column_stack([np.asarray(t, dtype = np.int64) for t in times]).astype(float)
+    times[times < 0] = np.inf
+    first = times.min(axis = 1)
+
+    return(np.where(np.isfinite(first), first, -1).astype(np.int64))
+
+
+def stays(df_trans):
+    """
+    Stays in each setting
+
+    Arguments
+    ---------
+    df_trans : pandas.DataFrame
+        Transmission file (with the columns in OCCUPANCY_COLUMNS)
+
+    Returns
+    -------
+    dict of setting to (entry, exit, age_group) arrays of each stay (exit is -1 for stays that
+    haven't ended)
+    """
+    t = {col: df_trans[col].values.astype(np.int64) for col in OCCUPANCY_COLUMNS}
+    age = t["age_group_recipient"]
+
+    ward_exit = first_time(t["time_critical"], t["time_recovered"], t["time_death"])
+    step_down_exit = first_time(t["time_recovered"], t["time_death"])
+    icu_exit = first_time(t["time_hospitalised_recovering"], t["time_death"])
+
+    hospitalised = t["time_hospitalised"] >= 0
+    step_down = t["time_hospitalised_recovering"] >= 0
+    critical = t["time_critical"] >= 0
+
+    ward = (np.concatenate([t["time_hospitalised"][hospitalised],
+            t["time_hospitalised_recovering"][step_down]]),
+        np.concatenate([ward_exit[hospitalised], step_down_exit[step_down]]),
+        np.concatenate([age[hospitalised], age[step_down]]))
+
+    icu = (t["time_critical"][critical], icu_exit[critical], age[critical])
+
+    return({"ward": ward, "icu": icu})
+
+
+def daily_occupancy(entry, exit, n_days, groups = None, n_groups = 1):
+    """
+    Number of stays in progress on each day, by group, from +1/-1 events and a cumulative sum
+
+    Arguments
+    ---------
+    entry, exit : np.array
+        First day and day after the last day of each stay (exit < 0 if the stay hasn't ended)
+    n_days : int
+        Number of days (stays are counted on days 0, ..., n_days - 1)
+    groups : np.array
+        Integer-coded group (0, ..., n_groups - 1) of each stay
+
+    Returns
+    -------
+    np.array (n_groups, n_days)
+
+    Stays starting on or after day n_days are not counted:
+
+    >>> daily_occupancy([1, 12], [3, 14], 10, groups = [0, 0], n_groups = 2)
+    array([[0, 1, 1, 0, 0, 0, 0, 0, 0, 0],
+           [0, 0, 0, 0, 0, 0, 0, 0, 0, 0]])
+    """
+    entry = np.asarray(entry, dtype = np.int64)
+    exit = np.asarray(exit, dtype = np.int64)
+
+    if groups is None:
+        groups = np.zeros(len(entry), dtype = np.int64)
+    groups = np.asarray(groups, dtype = np.int64)
+
+    # Stays within the window of n_days (ongoing stays are counted until the last day)
+    within = entry < n_days
+    entry, exit, groups = entry[within], exit[within], groups[within]
+    exit = np.where(exit < 0, n_days, np.minimum(exit, n_days))
+
+    keys = np.concatenate([groups*(n_days + 1) + entry, groups*(n_days + 1) + exit])
+    events = np.concatenate([np.ones(len(entry)), -np.ones(len(exit))])
+
+    counts = np.bincount(keys, weights = events, minlength = n_groups*(n_days + 1))
+    counts = counts.reshape(n_groups, n_days + 1)
+
+    return(np.cumsum(counts, axis = 1)[:, :n_days].astype(np.int64))
+
+
+def occupancy_by_age(df_trans, n_days = None, n_age_groups = constants.n_age_groups):
+    """
+    Daily occupancy of each setting by age group
+
+    Arguments
+    ---------
+    df_trans : pandas.DataFrame
+        Transmission file (with the columns in OCCUPANCY_COLUMNS)
+    n_days : int
+        Number of days (defaults to the last day of any event + 1)
+
+    Returns
+    -------
+    np.array (n_settings, n_age_groups, n_days)
+    """
+    setting_stays = stays(df_trans)
+
+    if n_days is None:
+        n_days = int(df_trans[OCCUPANCY_COLUMNS[1:]].values.max()) + 1
+
+    return(np.stack([daily_occupancy(*setting_stays[setting][:2], n_days,
+        setting_stays[setting][2], n_age_groups) for setting in SETTINGS]))
+
+
+def run_occupancy(transmission_file, n_days = None):
+    """Daily occupancy of one run (see `occupancy_by_age`)"""
+    df_trans = model_output.read_transmissions(transmission_file, columns = OCCUPANCY_COLUMNS)
+    return(occupancy_by_age(df_trans, n_days))
+
+
+def ensemble_occupancy(transmission_files, n_days = None, n_workers = None):
+    """
+    Daily occupancy of several runs, with runs processed in parallel over `n_workers` processes
+    (defaults to the number of CPUs)
+
+    Runs are padded to the same number of days with their occupancy on their last day.
+
+    Returns
+    -------
+    np.array (n_runs, n_settings, n_age_groups, n_days)
+    """
+    func = partial(run_occupancy, n_days = n_days)
+
+    if len(transmission_files) == 1:
+        runs = [func(transmission_files[0])]
+    else:
+        n_workers = n_workers if n_workers else cpu_count()
+        with Pool(processes = min(n_workers, len(transmission_files))) as pool:
+            runs = pool.map(func, transmission_files, chunksize = 1)
+
+    n_days = max(run.shape[-1] for run in runs)
+    return(np.stack([np.pad(run, [(0, 0), (0, 0), (0, n_days - run.shape[-1])], mode = "edge")
+        for run in runs]))
+
+
+def occupancy_quantiles(occupancy, quantiles = QUANTILES):
+    """
+    Quantiles of occupancy across runs
+
+    Returns
+    -------
+    np.array (n_quantiles, n_settings, n_age_groups, n_days)
+    """
+    return(np.quantile(occupancy, quantiles, axis = 0))
+
+
+def occupancy_table(occupancy_q, quantiles = QUANTILES):
+    """
+    Quantiles of occupancy as a DataFrame with one row per setting, age group and day
+    """
+    n_q, n_settings, n_age, n_days = occupancy_q.shape
+    setting, age, time = np.indices((n_settings, n_age, n_days)).reshape(3, -1)
+
+    df = pd.DataFrame({"setting": np.array(SETTINGS)[setting],
+        "age_group": np.array(constants.age_group_labels)[age], "time": time})
+    for q, values in zip(quantiles, occupancy_q):
+        df["q{:g}".format(100*q)] = values.ravel()
+
+    return(df)
+
+
+def figure_occupancy(occupancy_q):
+    """
+    Daily occupancy of each setting (panels) by age group (median and band across runs)
+
+    Arguments
+    ---------
+    occupancy_q : np.array (3, n_settings, n_age_groups, n_days)
+        Lower quantile, median, and upper quantile of occupancy (see `occupancy_quantiles`)
+
+    Returns
+    -------
+    fig, ax : figure and axis handles to the generated figure using matplotlib.pyplot
+    """
+    lower, median, upper = occupancy_q
+
+    fig, ax = plt.subplots(ncols = len(SETTINGS))
+    for i, label in enumerate(SETTING_LABELS):
+        plotting.plot_occupancy_by_age(ax[i], median[i], lower[i], upper[i],
+            labels = constants.age_group_labels)
+        ax[i].set_title(label)
+
+    ax[0].set_ylabel("Beds occupied")
+    ax[-1].legend(frameon = False, title = "Age group")
+
+    return(fig, ax)
+
+
+if __name__ == "__main__":
+
+    output_file = sys.argv[1]
+    file_format = sys.argv[2]
+    transmission_files = sys.argv[3:]
+
+    plt.rcParams["savefig.format"] = file_format
+    plt.rcParams['figure.figsize'] = [14, 6]
+
+    occupancy = ensemble_occupancy(transmission_files)
+    occupancy_q = occupancy_quantiles(occupancy)
+
+    occupancy_table(occupancy_q).to_csv(splitext(output_file)[0] + ".csv", index = False)
+
+    fig, ax = figure_occupancy(occupancy_q)
+
+    plt.savefig(output_file)
+    plt.close()
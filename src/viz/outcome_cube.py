@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Counts of outcomes (infected, hospitalised, critical, dead, recovered) by one or more strata
+(age group, occupation network, household size, ...) computed in a single pass
+
+An outcome has occurred for an individual in the transmission file when the corresponding time_*
+column is > 0.  The outcome cube is an array of shape (n_levels of each stratum..., n_outcomes),
+built with one np.bincount over the combined integer keys of all strata and outcomes, and the
+population of each stratum is counted from the individual file in the same way, so no merges or
+per-outcome filtering of the transmission file are needed:
+
+    cube = compute_outcome_cube(df_trans, df_indiv, strata = ["age_group", "house_size"])
+    proportions = cube["counts"] / cube["population"][..., None]
+
+Strata are looked up for each recipient by ID in the individual file; without an individual file
+only strata recorded in the transmission file (age_group, occupation_network) can be used.  The
+cube can be written to a CSV file (one row per combination of strata levels):
+
+    python src/viz/outcome_cube.py <transmission_file> <individual_file> <output_file.csv> \
+        [strata ...]
+"""
+
+import sys
+
+import numpy as np, pandas as pd
+
+import counting, model_output, rates
+
+# Outcomes and the columns of the transmission file recording the time of each outcome
+OUTCOMES = ["infected", "hospitalised", "critical", "dead", "recovered"]
+OUTCOME_VARS = ["time_infected", "time_hospitalised", "time_critical", "time_death",
+    "time_recovered"]
+
+# Strata that can be read directly from the transmission file (column of the recipient)
+RECIPIENT_COLUMNS = {"age_group": "age_group_recipient",
+    "occupation_network": "occupation_network_recipient"}
+
+
+def individual_strata(df_indiv, stratum):
+    """
+    Integer-coded stratum of each individual indexed by ID
+
+    Arguments
+    ---------
+    df_indiv : pandas.DataFrame
+        Individual file (with columns ID and those needed by `stratum`)
+    stratum : str
+        "house_size" or a column of the individual file (e.g. "age_group", "occupation_network")
+    """
+    if stratum == "house_size":
+        values = rates.house_sizes(df_indiv["house_no"].values)
+    else:
+        values = df_indiv[stratum].values
+
+    ids = df_indiv["ID"].values if "ID" in df_indiv else np.arange(df_indiv.shape[0])
+
+    codes = np.zeros(len(ids), dtype = np.int64)
+    codes[ids] = values
+    return(codes)
+
+
+def outcome_counts(strata_codes, n_levels, outcome_times):
+    """
+    Outcome cube from integer-coded strata and times of outcomes (in a single pass)
+
+    Arguments
+    ---------
+    strata_codes : list of np.array
+        Integer-coded level of each row in each stratum
+    n_levels : tuple of int
+        Number of levels of each stratum
+    outcome_times : np.array (n_rows, n_outcomes)
+        Times of each outcome (an outcome has occurred when time > 0)
+
+    Returns
+    -------
+    np.array of shape n_levels + (n_outcomes, )
+    """
+    outcome_times = np.asarray(outcome_times)
+    rows, outcomes = np.nonzero(outcome_times > 0)
+
+    keys = tuple(np.asarray(codes)[rows] for codes in strata_codes) + (outcomes, )
+    return(counting.count_tensor(keys, tuple(n_levels) + (outcome_times.shape[1], )))
+
+
+def compute_outcome_cube(df_trans, df_indiv = None, strata = ["age_group"], n_levels = None):
+    """
+    Outcome cube of the transmission file and population of each stratum (see module docstring)
+
+    Arguments
+    ---------
+    df_trans : pandas.DataFrame
+        Transmission file (with ID_recipient, the columns in OUTCOME_VARS, and the recipient's
+        strata if `df_indiv` is not given)
+    df_indiv : pandas.DataFrame
+        Individual file, used to look up the strata of each recipient and the population
+    strata : list of str
+        Strata of the cube (see `individual_strata`)
+    n_levels : list of int
+        Number of levels of each stratum (defaults to the maximum level + 1)
+
+    Returns
+    -------
+    dict with entries counts (np.array of shape n_levels + (n_outcomes, )), population (np.array
+    of shape n_levels; None without an individual file), strata, and outcomes
+    """
+    if df_indiv is not None:
+        codes_indiv = [individual_strata(df_indiv, stratum) for stratum in strata]
+        ids = df_trans["ID_recipient"].values
+        codes_trans = [codes[ids] for codes in codes_indiv]
+    else:
+        codes_trans = [df_trans[RECIPIENT_COLUMNS[stratum]].values for stratum in strata]
+
+    if n_levels is None:
+        codes = codes_indiv if df_indiv is not None else codes_trans
+        n_levels = [int(np.max(c)) + 1 for c in codes]
+
+    counts = outcome_counts(codes_trans, n_levels, df_trans[OUTCOME_VARS].values)
+
+    population = None
+    if df_indiv is not None:
+        population = counting.count_tensor(codes_indiv, tuple(n_levels))
+
+    return({"counts": counts, "population": population, "strata": list(strata),
+        "outcomes": list(OUTCOMES)})
+
+
+def outcome_proportions(cube):
+    """
+    Proportion of the population of each stratum with each outcome
+    """
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+        return(cube["counts"] / cube["population"][..., None])
+
+
+def cube_table(cube):
+    """
+    Outcome cube as a DataFrame with one row per combination of strata levels (and columns of
+    the population and counts of each outcome)
+    """
+    counts = cube["counts"]
+    levels = np.indices(counts.shape[:-1]).reshape(len(cube["strata"]), -1)
+
+    df = pd.DataFrame(dict(zip(cube["strata"], levels)))
+    if cube["population"] is not None:
+        df["population"] = cube["population"].ravel()
+
+    for i, outcome in enumerate(cube["outcomes"]):
+        df[outcome] = counts[..., i].ravel()
+
+    return(df)
+
+
+if __name__ == "__main__":
+
+    transmission_file = sys.argv[1]
+    individual_file = sys.argv[2]
+    output_file = sys.argv[3]
+    strata = sys.argv[4:] if len(sys.argv) > 4 else ["age_group"]
+
+    df_trans = model_output.read_transmissions(transmission_file,
+        columns = ["ID_recipient"] + OUTCOME_VARS)
+    df_indiv = model_output.read_individuals(individual_file)
+
+    cube = compute_outcome_cube(df_trans, df_indiv, strata)
+    cube_table(cube).to_csv(output_file, index = False)
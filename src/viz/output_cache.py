@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Cache of model output files converted to a binary columnar format (one .npy file per column)
+
+The first read of a (CSV) output file parses it and saves each column as a .npy file; later reads
+load only the requested columns through a memory map.  Cache entries are keyed by the path of the
+source file and validated against its size, modification time and (if these have changed) a hash
+of its contents, so the cache is rebuilt automatically when the source file changes.
+
+Cache entries are stored in a ".cache" directory next to the source file (or in the directory set
+by the MODEL_OUTPUT_CACHE_DIR environment variable).
+"""
+
+from os.path import abspath, basename, dirname, exists, join
+import hashlib, json, os, shutil, uuid
+
+import numpy as np, pandas as pd
+
+CACHE_DIR_NAME = ".cache"
+
+# Size of chunks (bytes) used when hashing the contents of a file
+HASH_CHUNK_SIZE = 2**20
+
+
+def file_hash(path):
+    """Hash (BLAKE2b) of the contents of a file"""
+    h = hashlib.blake2b(digest_size = 16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return(h.hexdigest())
+
+
+def cache_entry_dir(path):
+    """Directory of the cache entry of a source file"""
+    path = abspath(path)
+    cache_dir = os.environ.get("MODEL_OUTPUT_CACHE_DIR", join(dirname(path), CACHE_DIR_NAME))
+    path_key = hashlib.blake2b(path.encode(), digest_size = 8).hexdigest()
+
+    return(join(cache_dir, "{}-{}".format(basename(path), path_key)))
+
+
+def _read_meta(entry_dir):
+    try:
+        with open(join(entry_dir, "meta.json")) as f:
+            return(json.load(f))
+    except (OSError, ValueError):
+        return(None)
+
+
+def _write_meta(entry_dir, meta):
+    """Write metadata of a cache entry atomically"""
+    tmp_file = join(entry_dir, "meta.json.{}".format(uuid.uuid4().hex))
+    with open(tmp_file, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_file, join(entry_dir, "meta.json"))
+
+
+def _save_columns(df, columns_dir):
+    """Save each column of a DataFrame as a .npy file (written atomically as a directory)"""
+    tmp_dir = "{}.tmp-{}".format(columns_dir, uuid.uuid4().hex)
+    os.makedirs(tmp_dir)
+
+    for i, col in enumerate(df.columns):
+        values = np.asarray(df[col])
+        if values.dtype == object:
+            values = values.astype(str)
+        np.save(join(tmp_dir, "{}.npy".format(i)), values)
+
+    try:
+        os.rename(tmp_dir, columns_dir)
+    except OSError:
+        # Built concurrently by another process
+        shutil.rmtree(tmp_dir, ignore_errors = True)
+
+
+def _source_state(path):
+    stat = os.stat(path)
+    return({"path": abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+
+
+def update_cache(path, reader):
+    """
+    Return the metadata of a valid cache entry of a source file, building the entry if needed
+
+    Arguments
+    ---------
+    path : str
+        Path to source file
+    reader : callable
+        Function reading the complete source file as a pandas.DataFrame
+
+    Returns
+    -------
+    entry_dir, meta : str, dict
+        Directory and metadata (source state, content hash, and columns) of the cache entry
+    """
+    entry_dir = cache_entry_dir(path)
+    state = _source_state(path)
+    meta = _read_meta(entry_dir)
+    content_hash = None
+
+    if meta is not None:
+        if all(meta[key] == value for key, value in state.items()):
+            return(entry_dir, meta)
+
+        # Size or modification time has changed; reuse the entry if the contents haven't
+        if meta["size"] == state["size"]:
+            content_hash = file_hash(path)
+            if meta["hash"] == content_hash:
+                meta.update(state)
+                _write_meta(entry_dir, meta)
+                return(entry_dir, meta)
+
+    if content_hash is None:
+        content_hash = file_hash(path)
+    df = reader(path)
+
+    os.makedirs(entry_dir, exist_ok = True)
+    _save_columns(df, join(entry_dir, content_hash))
+
+    meta = dict(state, hash = content_hash, columns = [str(c) for c in df.columns])
+    _write_meta(entry_dir, meta)
+
+    # Remove entries of previous contents of the source file (but not files and directories
+    # being written by other processes building the entry concurrently)
+    for name in os.listdir(entry_dir):
+        if name in [content_hash, "meta.json"] or name.startswith("meta.json.") or \
+                ".tmp-" in name:
+            continue
+        shutil.rmtree(join(entry_dir, name), ignore_errors = True)
+
+    return(entry_dir, meta)
+
+
+def read_cached(path, reader, columns = None):
+    """
+    Read columns of a source file from its cache entry (building the entry if needed)
+
+    Arguments
+    ---------
+    path : str
+        Path to source file
+    reader : callable
+        Function reading the complete source file as a pandas.DataFrame (used to build the cache)
+    columns : list of str
+        Columns to read (defaults to all columns)
+
+    Returns
+    -------
+    pandas.DataFrame of the requested columns (backed by read-only memory maps where possible)
+    """
+    entry_dir, meta = update_cache(path, reader)
+    columns_dir = join(entry_dir, meta["hash"])
+
+    if columns is None:
+        columns = meta["columns"]
+
+    missing = [col for col in columns if col not in meta["columns"]]
+    if missing:
+        raise KeyError("Columns not in {}: {}".format(path, missing))
+
+    data = {col: np.load(join(columns_dir, "{}.npy".format(meta["columns"].index(col))),
+        mmap_mode = "r") for col in columns}
+
+    return(pd.DataFrame(data, columns = columns, copy = False))
+
+
+def clear_cache(path):
+    """Remove the cache entry of a source file"""
+    entry_dir = cache_entry_dir(path)
+    if exists(entry_dir):
+        shutil.rmtree(entry_dir)
@@ -7,59 +7,41 @@ from os.path import join
 
 import pandas as pd, numpy as np, sys
 from matplotlib import pyplot as plt
-from collections import Counter
 
-from scipy.stats import gamma
+import plotting, constants, model_output, transmission_aggregates, reproduction
+from model_enums import TransmissionTypeEnum
 
-import plotting, constants
-from COVID19.model import TransmissionTypeEnum
 
-if __name__ == "__main__":
-    
-    transmission_file = sys.argv[1]
-    timeseries_file = sys.argv[2]
-    baseline_parameters_file = sys.argv[3]
-    output_file = sys.argv[4]
-    file_format = sys.argv[5]
-    
-    # Import the data output from the model
-    df_trans = pd.read_csv(transmission_file)
-    df_ts = pd.read_csv(timeseries_file)
-    df_params = pd.read_csv(baseline_parameters_file)
-    
+def figure_S13(aggregates, df_ts, df_params):
+    """
+    Plot R through time as calculated from the transmission file (actual R) and as estimated from
+    daily incidence in the timeseries file (instantaneous R)
+    
+    Arguments
+    ---------
+    aggregates : dict
+        Aggregates of the transmission file (see `transmission_aggregates`)
+    df_ts : pandas.DataFrame
+        Timeseries file output from the model
+    df_params : pandas.DataFrame
+        Parameters used in the model (mean_infectious_period and sd_infectious_period are used)
+    """
     # Outbreak-specific outputs
     times = df_ts.time.values
     end_time = df_ts.time.max()
     lockdown_time = np.min(np.where(df_ts.lockdown == True))
     intervention_time = np.min(np.where(df_ts.total_infected/1E6 >= 0.005))
-
-    infectiontimevar = "time_infected"
     
-    plt.rcParams["savefig.format"] = file_format
     plt.rcParams['figure.figsize'] = [12, 8]
     
     #############
     # Actual R (R from transmission file)
     # --------
-    # At each time point, calculate the number of future infections for each individual
-    # that is infected at the time point in question
-    
-    # Change seed cases to be nan values for ID_source
-    df_trans.loc[df_trans.ID_source == df_trans.ID_recipient, "ID_source"] = np.nan
+    # At each time point, calculate the mean number of future infections of individuals
+    # that were infected at the time point in question
     
-    # Total offspring for each source
-    offspring = Counter(df_trans.ID_source)
-    
-    actual_R = []
-    for t in times:
-        # Find individuals who were infected precisely at the time point in question.  
-        condition = df_trans[infectiontimevar] == t
-        
-        # Count number of recipients in the future for each currently infected individual
-        offspring_values = [offspring[i] for i in df_trans[ condition ].ID_recipient.values]
-        actual_R.append(offspring_values)
-    
-    actual_R_means = [np.mean(np.array(R)) for R in actual_R if (len(R) > 0)]
+    df_actual_R = reproduction.actual_R(aggregates["offspring_by_day"], times)
+    actual_R_means = df_actual_R["mean"].dropna().values
     
     fig, ax = plt.subplots()
     
@@ -69,6 +51,7 @@ if __name__ == "__main__":
         c = "#CC79A7")
     
     # This will plot a scatter plot of the offspring distribution at each point in time.  
+    # actual_R = reproduction.offspring_samples(aggregates["offspring_by_day"], times[1:])
     # for i, t in enumerate(times[1:]):
     #     ax.scatter([t]*len(actual_R[i]), actual_R[i], alpha = 0.2, c = "blue")
     
@@ -97,33 +80,40 @@ if __name__ == "__main__":
     # R from timeseries data
     # --------------------
 
-    # Calculate parameters for gamma distribution of infectious period
-    a, b = plotting.gamma_params(
-        df_params["mean_infectious_period"],
-        df_params["sd_infectious_period"])
-
-    # Container for R
-    R = []
-    
-    # Calculate daily incidence (seed cases as first element)
-    daily_incidence = df_ts.total_infected.diff(1)
-    daily_incidence[0] = df_ts.total_infected.values[0]
-    
-    # Loop over days of simulation
-    for t in times[:-1]:
-        I_t = daily_incidence[t]
-        
-        # Loop "back" through time
-        G = 0
-        for k in np.arange(1, t + 1):
-            G += (gamma.cdf(k, a, loc = 0, scale = b) - \
-                gamma.cdf(k - 1, a, loc = 0, scale = b)) * (daily_incidence[t - k])
-        
-        R.append(I_t / G)
+    # Renewal equation with the discretised (gamma) distribution of the infectious period,
+    # using daily incidence with seed cases as first element
+    daily_incidence = reproduction.daily_incidence(df_ts.total_infected.values)
+    
+    # R on each day of `times` (the first day, with no earlier infections, is not plotted)
+    R = reproduction.instantaneous_R(daily_incidence, 
+        df_params["mean_infectious_period"].values[0], 
+        df_params["sd_infectious_period"].values[0])[1:]
     
     ax.plot(times[1:] - lockdown_time, R,
         label = "$R_{instantaneous}$", lw = 3, alpha = 0.8, c = "#0072B2")
     
     plt.legend(frameon = False, fontsize = 20)
+    
+    return(fig, ax)
+
+
+if __name__ == "__main__":
+    
+    transmission_file = sys.argv[1]
+    timeseries_file = sys.argv[2]
+    baseline_parameters_file = sys.argv[3]
+    output_file = sys.argv[4]
+    file_format = sys.argv[5]
+    
+    # Import the data output from the model
+    aggregates = transmission_aggregates.load_aggregates(transmission_file)
+    df_ts = model_output.read_timeseries(timeseries_file, 
+        columns = ["time", "lockdown", "total_infected"])
+    df_params = pd.read_csv(baseline_parameters_file)
+    
+    plt.rcParams["savefig.format"] = file_format
+    
+    fig, ax = figure_S13(aggregates, df_ts, df_params)
+    
     plt.savefig(output_file, dpi = 300)
     plt.close()
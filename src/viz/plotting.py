@@ -4,12 +4,17 @@ Helper functions for plotting
 """
 
 import numpy as np, pandas as pd
-from scipy.stats import gamma
 
 import matplotlib
 from matplotlib import pyplot as plt
 from matplotlib import cm
-from mpl_toolkits.axes_grid1.inset_locator import inset_axes
+
+# scipy.stats and mpl_toolkits are imported by the functions that use them (so that importing
+# this module is fast)
+
+# Counts and histograms (without matplotlib) used by the plotting functions below
+from counting import grouped_histogram, histogram_by_indicator, group_histogram_df, \
+    count_tensor, combine_counts, transmission_tensor
 
 network_colours = ["#D55E00", "#56B4E9", "#009E73"]
 
@@ -86,15 +91,6 @@ def gamma_params(mn, sd):
     return(shape, scale)
 
 
-def overlapping_bins(start, stop, window, by):
-    """Generate overlapping bins"""
-    
-    bins = []
-    for i in np.arange(start, stop - window + 1, step = by):
-        bins.append((i, i + window))
-    return(bins)
-
-
 def get_discrete_viridis_colours(n):
     """
     Generate n colours from the viridis colour map
@@ -113,6 +109,45 @@ def get_discrete_viridis_colours(n):
     return(colours)
 
 
+def plot_occupancy_by_age(ax, occupancy, lower = None, upper = None, time = None,
+        labels = None, lw = 2):
+    """
+    Plot daily occupancy (e.g. of hospital beds) of each age group, with optional bands
+
+    Arguments
+    ---------
+    ax : matplotlib.Axes
+        Axis to plot on
+    occupancy : np.array (n_age_groups, n_days)
+        Occupancy of each age group on each day (e.g. the median across runs)
+    lower, upper : np.array (n_age_groups, n_days)
+        Lower and upper limits of a band around the occupancy of each age group
+    time : np.array
+        Day of each column of `occupancy` (defaults to 0, 1, ...)
+    labels : list of str
+        Label of each age group
+    lw : float
+        Line width
+    """
+    occupancy = np.asarray(occupancy)
+    n_groups, n_days = occupancy.shape
+
+    if time is None:
+        time = np.arange(n_days)
+    if labels is None:
+        labels = np.arange(n_groups)
+
+    colours = get_discrete_viridis_colours(n_groups)
+    for i in range(n_groups):
+        if lower is not None:
+            ax.fill_between(time, lower[i], upper[i], color = colours[i], alpha = 0.2,
+                linewidth = 0)
+        ax.plot(time, occupancy[i], color = colours[i], linewidth = lw, label = labels[i])
+
+    ax.set_xlabel("Day of simulation")
+    remove_spines(ax, ["top", "right"])
+
+
 def plot_hist_by_group(ax, df, groupvar, binvar, bins = None, groups = None, 
     group_labels = None, group_colours = None, xlimits = None, density = False, 
     title = "", xlabel = "", ylabel = "", legend_title = "", xticklabels = None, 
@@ -165,8 +200,10 @@ def plot_hist_by_group(ax, df, groupvar, binvar, bins = None, groups = None,
     
     width = np.diff(bins)[0]/(n_groups + 1)
     
-    for i, g in enumerate(groups):
-        heights, b = np.histogram(df.loc[df[groupvar] == g][binvar], bins, density = density)
+    heights_by_group = group_histogram_df(df, groupvar, binvar, bins, groups = groups, 
+        density = density)
+    
+    for i, heights in enumerate(heights_by_group):
         
         if normalising_constant:
             heights = heights/float(normalising_constant)
@@ -232,17 +269,47 @@ def transmission_heatmap_by_age_by_panels(df,
     
     """
     
-    if not isinstance(bins, list):
-        bin_list = np.arange(bins + 1) - 0.5
-    
     if not panels: 
         panels = np.unique(df[panelvar])
     
-    n_panels = len(panels)
-    
     if not panel_labels:
         panel_labels = panels
     
+    transmission_arrays = transmission_tensor(df, group1var, group2var, 
+        n_groups = bins if not isinstance(bins, list) else len(bins) - 1, 
+        panelvar = panelvar, panels = panels)
+    
+    return(plot_heatmap_panels(transmission_arrays, panel_labels = panel_labels, 
+        xlabel = xlabel, ylabel = ylabel, legend_title = legend_title, 
+        xticklabels = xticklabels, yticklabels = yticklabels, title_fontsize = title_fontsize, 
+        ncols = ncols, nrows = nrows, vmin_panels = vmin_panels, vmax_panels = vmax_panels))
+
+
+def plot_heatmap_panels(transmission_arrays, panel_labels = None,
+        xlabel = "", ylabel = "", legend_title = "",
+        xticklabels = None, yticklabels = None, title_fontsize = 20,
+        ncols = None, nrows = None, vmin_panels = None, vmax_panels = None
+    ):
+    """
+    Plot subplots of heatmaps of precomputed 2D arrays of transmission counts (one per panel)
+    
+    Arguments
+    ---------
+    transmission_arrays : list or np.array
+        2D arrays of counts (one per panel); the first dimension is plotted on the y-axis
+    panel_labels : list of str
+        Titles of each panel
+    
+    See `transmission_heatmap_by_age_by_panels` for remaining arguments.  
+    """
+    from mpl_toolkits.axes_grid1.inset_locator import inset_axes
+    
+    transmission_arrays = np.asarray(transmission_arrays, dtype = float)
+    n_panels = len(transmission_arrays)
+    
+    if panel_labels is None:
+        panel_labels = np.arange(n_panels)
+    
     if not ncols:
         ncols = n_panels
         nrows = 1
@@ -252,17 +319,6 @@ def transmission_heatmap_by_age_by_panels(df,
     ax[0][0].set_ylabel(ylabel, size = 16)
     ax[1][0].set_ylabel(ylabel, size = 16)
     
-    transmission_arrays = []
-    for i, panel in enumerate(panels):
-        
-        df_sub = df.loc[df[panelvar] == panel]
-        
-        array, xbins, ybins = np.histogram2d(
-            x = df_sub[group1var].values, 
-            y = df_sub[group2var].values, 
-            bins = bin_list)
-        transmission_arrays.append(array)
-    
     if not vmin_panels:
         vmin_panels = 1
     if not vmax_panels:
@@ -270,7 +326,7 @@ def transmission_heatmap_by_age_by_panels(df,
     
     ims = []
     
-    for i, (panel, axi) in enumerate(zip(panels, ax.reshape(-1))):
+    for i, axi in enumerate(ax.reshape(-1)[:n_panels]):
         im = axi.imshow(np.ma.masked_where(transmission_arrays[i] == 0, transmission_arrays[i]), 
             origin = "lower", aspect = "equal", 
             vmin = vmin_panels, vmax = vmax_panels)
@@ -315,13 +371,33 @@ def plot_transmission_heatmap_by_age(df, group1var, group2var, bins = None,
     fig, ax : figure and axis handles to the generated figure using matplotlib.pyplot
     
     """
-    if not isinstance(bins, list):
-        bin_list = np.arange(bins + 1) - 0.5
+    array = transmission_tensor(df, group1var, group2var, 
+        n_groups = bins if not isinstance(bins, list) else len(bins) - 1)[0]
+    
+    return(plot_heatmap(array, xlabel = xlabel, ylabel = ylabel, title = title, 
+        legend_title = legend_title, xticklabels = xticklabels, yticklabels = yticklabels, 
+        vmin = vmin, vmax = vmax, cbar_ticks = cbar_ticks))
+
+
+def plot_heatmap(array, xlabel = "", ylabel = "", title = "", legend_title = "", 
+    xticklabels = None, yticklabels = None, vmin = 0, vmax = None, cbar_ticks = None):
+    """
+    Plot a heatmap of a precomputed 2D array of counts (zero counts are shown in white)
+    
+    Arguments
+    ---------
+    array : np.array
+        2D array of counts; the first dimension is plotted on the y-axis
+    
+    See `plot_transmission_heatmap_by_age` for remaining arguments.  
     
+    Returns
+    -------
+    fig, ax : figure and axis handles to the generated figure using matplotlib.pyplot
+    """
     fig, ax = plt.subplots()
     
-    ax, im = add_heatmap_to_axes(ax, df[group1var].values, df[group2var].values, bin_list, 
-        vmin = vmin, vmax = vmax)
+    ax, im = add_array_heatmap_to_axes(ax, array, vmin = vmin, vmax = vmax)
     
     ax = adjust_ticks(ax, xtick_fontsize = 16, ytick_fontsize = 16,
         xticklabels = xticklabels, yticklabels = yticklabels)
@@ -353,18 +429,40 @@ def ifr_hist_by_age(df,
     
     bins = np.arange(0, NBINS + 1) - 0.5
     
-    fig, ax = plt.subplots()
-    
-    height_n, bins_n = np.histogram(df[df[numerator_var] > 0][age_group_var], 
-        bins, density = False)
-    height_d, bins_d = np.histogram(df[df[denominator_var] > 0][age_group_var], 
-        bins, density = False)
+    height_n, height_d = histogram_by_indicator(df[age_group_var].values, 
+        df[[numerator_var, denominator_var]].values > 0, bins)
     
     heights = np.divide(height_n, height_d)
     
+    return(plot_ifr_by_age(heights, xlabel = xlabel, ylabel = ylabel, 
+        xticklabels = xticklabels))
+
+
+def plot_ifr_by_age(heights, xlabel = "", ylabel = "Infection fatality ratio (IFR)", 
+        xticklabels = None, yerr = None):
+    """
+    Plot precomputed IFR by age
+    
+    Arguments
+    ---------
+    heights : np.array
+        IFR in each age group
+    xlabel, ylabel : str
+        X-axis and Y-axis labels
+    xticklabels : list of str
+        Labels to use for x-ticks (age groups)
+    yerr : np.array
+        Error bars (e.g. confidence intervals) as an array of shape (2, n_age) of distances below
+        and above each bar (no error bars if None)
+    """
+    bins = np.arange(0, len(heights) + 1) - 0.5
+    
+    fig, ax = plt.subplots()
+    
     bar_width = 0.8
     ax.bar(bins[:-1], heights, align = "center", color = "#0072B2", 
-        edgecolor = "#0d1a26", linewidth = 0.5, zorder = 3, width = bar_width)
+        edgecolor = "#0d1a26", linewidth = 0.5, zorder = 3, width = bar_width, 
+        yerr = yerr, error_kw = {"ecolor": "#0d1a26", "elinewidth": 1, "capsize": 4, "zorder": 4})
     
     remove_spines(ax, ["top", "right"])
     
@@ -376,7 +474,8 @@ def ifr_hist_by_age(df,
     ax.set_yticklabels([0.0, 0.02, 0.04, 0.06, 0.08, 0.1], size = 16)
     
     ax.set_xlim([-1, np.max(bins)])
-    ax.set_ylim([0, np.max(heights)*1.1])
+    ymax = np.max(heights) if yerr is None else np.nanmax(heights + yerr[1])
+    ax.set_ylim([0, ymax*1.1])
     
     ax.set_xlabel(xlabel, size = 18)
     ax.set_ylabel(ylabel, size = 18)
@@ -384,11 +483,102 @@ def ifr_hist_by_age(df,
     return(fig, ax)
 
 
-def plot_parameter_assumptions(df_parameters, xlimits = [0, 30], lw = 3):
+# Gamma-distributed waiting times in the parameters of OpenABM-Covid19: stem of the parameter names
+# (mean_<stem>, sd_<stem>), panel of Figure S3, and x-axis label
+GAMMA_WAITING_TIMES = [
+    ("time_to_critical", (1, 0), "Time to critical\n(from hospitalised; days)"),
+    ("time_to_symptoms", (0, 1), "Time to symptoms\n(from presymptomatic; days)"),
+    ("infectious_period", (0, 2), "Infectious period (days)"),
+    ("time_to_recover", (1, 1), "Time to recover\n(from hospitalised or critical; days)"),
+    ("asymptomatic_to_recovery", (2, 0), "Time to recover\n(from asymptomatic; days)"),
+    ("time_hospitalised_recovery", (2, 1), "Time to recover\n(from hospitalisation to hospital "
+        "discharge if not ICU\nor from ICU discharge to hospital discharge if ICU; days)"),
+    ("time_to_death", (1, 2), "Time to death\n(from critical; days)"),
+    ("time_critical_survive", (2, 2), "Time to survive\n(if ICU; days)")
+]
+
+
+def waiting_time_parameters(df_parameters, stems = None):
+    """
+    Means and standard deviations of gamma-distributed waiting times of each parameter set
+    
+    Arguments
+    ---------
+    df_parameters : pandas.DataFrame
+        Parameter sets of the OpenABM-Covid19 model (one per row)
+    stems : list of str
+        Waiting times (stem of the parameter names; defaults to all of GAMMA_WAITING_TIMES)
+    
+    Returns
+    -------
+    means, sds : np.array (n_param_sets, n_waiting_times), np.array (n_param_sets, n_waiting_times)
+    """
+    if stems is None:
+        stems = [stem for stem, panel, xlabel in GAMMA_WAITING_TIMES]
+    
+    means = df_parameters[["mean_" + stem for stem in stems]].values.astype(float)
+    sds = df_parameters[["sd_" + stem for stem in stems]].values.astype(float)
+    
+    return(means, sds)
+
+
+def gamma_distributions(means, sds, x, cdf = False):
+    """
+    PDFs (or CDFs) of gamma distributions of all waiting times of all parameter sets evaluated in
+    one vectorised call
+    
+    Arguments
+    ---------
+    means, sds : np.array (n_param_sets, n_waiting_times)
+        Means and standard deviations of the gamma distributions (see `waiting_time_parameters`)
+    x : np.array (n_x, )
+        Times at which the distributions are evaluated
+    cdf : bool
+        Evaluate CDFs instead of PDFs
+    
+    Returns
+    -------
+    np.array (n_param_sets, n_waiting_times, n_x)
+    """
+    from scipy.stats import gamma
+    
+    shape, scale = gamma_params(np.asarray(means, dtype = float), np.asarray(sds, dtype = float))
+    distribution = gamma.cdf if cdf else gamma.pdf
+    
+    return(distribution(np.asarray(x), a = shape[..., None], loc = 0, scale = scale[..., None]))
+
+
+def bernoulli_time_to_hospital(mean_time_to_hospital):
+    """
+    Distribution of the time to hospital (from symptoms), the floor or ceiling of its mean with
+    probabilities given by its fractional part, pooled over parameter sets
+    
+    Returns
+    -------
+    days, probabilities : np.array, np.array
+    """
+    mean_time_to_hospital = np.asarray(mean_time_to_hospital, dtype = float)
+    lower = np.floor(mean_time_to_hospital)
+    p_upper = mean_time_to_hospital - lower
+    
+    days, index = np.unique(np.concatenate([lower, lower + 1]), return_inverse = True)
+    probabilities = np.bincount(index, weights = np.concatenate([1 - p_upper, p_upper]))
+    probabilities = probabilities/len(mean_time_to_hospital)
+    
+    keep = probabilities > 0
+    return(days[keep], probabilities[keep])
+
+
+def plot_parameter_assumptions(df_parameters, xlimits = [0, 30], lw = 3, overlay = False, 
+        quantiles = None):
     """
     Plot distributions of mean transition times between compartments in the parameters of the 
     OpenABM-Covid19 model
     
+    The gamma PDFs of all waiting times of all parameter sets are evaluated at once (see 
+    `gamma_distributions`), so many parameter sets (e.g. a calibration posterior) can be compared 
+    in one figure.
+    
     Arguments
     ---------
     df_parameters : pandas.DataFrame
@@ -408,160 +598,114 @@ def plot_parameter_assumptions(df_parameters, xlimits = [0, 30], lw = 3):
         Limits of x axis of gamma distributions showing mean transition times
     lw : float
         Line width used in plotting lines of the PDFs
+    overlay : bool
+        Plot the distributions of all rows of `df_parameters` (only the first row is plotted 
+        otherwise)
+    quantiles : list of float
+        Lower and upper quantiles of a band of the PDFs across parameter sets (plotted with the 
+        median PDF in place of the PDF of each parameter set if `overlay` is True)
     
     Returns
     -------
     fig, ax : figure and axis handles to the generated figure using matplotlib.pyplot
     """
-    df = df_parameters # for brevity
+    df = df_parameters if overlay else df_parameters.iloc[[0]]
     x = np.linspace(xlimits[0], xlimits[1], num = 50)
     
+    means, sds = waiting_time_parameters(df)
+    pdfs = gamma_distributions(means, sds, x)
+    
     fig, ax = plt.subplots(nrows = 3, ncols = 3)
     
     ####################################
     # Bernoulli of mean time to hospital
     ####################################
     
-    height1 = np.ceil(df.mean_time_to_hospital.values[0]) - df.mean_time_to_hospital.values[0]
-    height2 = df.mean_time_to_hospital.values[0] - np.floor(df.mean_time_to_hospital.values[0])
-    
-    x1 = np.floor(df.mean_time_to_hospital.values[0])
-    x2 = np.ceil(df.mean_time_to_hospital.values[0])
-    ax[0,0].bar([x1, x2], [height1, height2], color = "#0072B2")
+    days, probabilities = bernoulli_time_to_hospital(df.mean_time_to_hospital.values)
+    ax[0,0].bar(days, probabilities, color = "#0072B2")
     
     ax[0,0].set_ylim([0, 1.0])
-    ax[0,0].set_xticks([x1, x2])
+    ax[0,0].set_xticks(days)
     ax[0,0].set_xlabel("Time to hospital\n(from symptoms; days)")
     ax[0,0].set_ylabel("Density")
     ax[0,0].set_title("")
     remove_spines(ax[0,0], ["top", "right"])
     
-    ####################################
-    # Gamma of mean time to critical
-    ####################################
+    ############################
+    # Gamma-distributed waiting times
+    ############################
     
-    a, b = gamma_params(df.mean_time_to_critical.values, df.sd_time_to_critical.values)
-    ax[1,0].plot(x, gamma.pdf(x, a = a, loc = 0, scale = b), linewidth= lw, color = "#0072B2")
-    ax[1,0].axvline(df.mean_time_to_critical.values, color = "#D55E00", 
-        linestyle = "dashed", alpha = 0.7)
-    ax[1,0].set_xlabel("Time to critical\n(from hospitalised; days)")
-    ax[1,0].set_title("")
-    remove_spines(ax[1,0], ["top", "right"])
-    ax[1,0].text(0.9, 0.7, 'mean: {}\nsd: {}'.format(df.mean_time_to_critical.values[0],
-        df.sd_time_to_critical.values[0]), 
-        ha = 'right', va = 'center', transform = ax[1,0].transAxes)
-    
-    
-    ################################
-    # Gamma of mean time to symptoms
-    ################################
-    
-    a, b = gamma_params(df.mean_time_to_symptoms.values, df.sd_time_to_symptoms.values)
-    ax[0,1].plot(x, gamma.pdf(x, a = a, loc = 0, scale = b), linewidth= lw, color = "#0072B2")
-    ax[0,1].axvline(df.mean_time_to_symptoms.values, color = "#D55E00", 
-        linestyle = "dashed", alpha = 0.7)
-    ax[0,1].set_xlabel("Time to symptoms\n(from presymptomatic; days)")
-    ax[0,1].set_title("")
-    remove_spines(ax[0, 1], ["top", "right"])
-    ax[0,1].text(0.9, 0.7, 'mean: {}\nsd: {}'.format(df.mean_time_to_symptoms.values[0],
-        df.sd_time_to_symptoms.values[0]), 
-        ha = 'right', va = 'center', transform = ax[0,1].transAxes)
-    
-    ################################
-    # Gamma of mean infectious period
-    ################################
-    
-    a, b = gamma_params(df.mean_infectious_period, df.sd_infectious_period)
-    ax[0,2].plot(x, gamma.pdf(x, a = a, loc = 0, scale = b), linewidth= lw, color = "#0072B2")
-    ax[0,2].axvline(df.mean_infectious_period.values, color = "#D55E00", 
-        linestyle = "dashed", alpha = 0.7)
-    ax[0,2].set_xlabel("Infectious period (days)")
-    ax[0,2].set_title("")
-    remove_spines(ax[0, 2], ["top", "right"])
-    ax[0,2].text(0.9, 0.7, 'mean: {}\nsd: {}'.format(df.mean_infectious_period.values[0],
-        df.sd_infectious_period.values[0]), 
-        ha = 'right', va = 'center', transform = ax[0,2].transAxes)
-    
-    ################################
-    # Gamma of mean time to recover
-    ################################
-    
-    a, b = gamma_params(df.mean_time_to_recover, df.sd_time_to_recover)
-    ax[1,1].plot(x, gamma.pdf(x, a = a, loc = 0, scale = b), linewidth= lw, color = "#0072B2")
-    ax[1,1].axvline(df.mean_time_to_recover.values, color = "#D55E00", 
-        linestyle = "dashed", alpha = 0.7)
-    ax[1,1].set_xlabel("Time to recover\n(from hospitalised or critical; days)")
-    ax[1,1].set_title("")
-    remove_spines(ax[1, 1], ["top", "right"])
-    ax[1,1].text(0.9, 0.7, 'mean: {}\nsd: {}'.format(df.mean_time_to_recover.values[0],
-        df.sd_time_to_recover.values[0]), 
-        ha = 'right', va = 'center', transform = ax[1,1].transAxes)
-    
-    ########################################
-    # Gamma of mean asymptomatic to recovery
-    ########################################
-    
-    a, b = gamma_params(df.mean_asymptomatic_to_recovery, df.sd_asymptomatic_to_recovery)
-    ax[2,0].plot(x, gamma.pdf(x, a = a, loc = 0, scale = b), linewidth= lw, color = "#0072B2")
-    ax[2,0].axvline(df.mean_asymptomatic_to_recovery.values, color = "#D55E00", 
-        linestyle = "dashed", alpha = 0.7)
-    ax[2,0].set_xlabel("Time to recover\n(from asymptomatic; days)")
-    ax[2,0].set_title("")
-    remove_spines(ax[2, 0], ["top", "right"])
-    ax[2,0].text(0.9, 0.7, 'mean: {}\nsd: {}'.format(df.mean_asymptomatic_to_recovery.values[0],
-        df.sd_asymptomatic_to_recovery.values[0]), 
-        ha = 'right', va = 'center', transform = ax[2,0].transAxes)
-    
-    ########################################
-    # Gamma of mean hospitalised to recovery
-    ########################################
-    
-    a, b = gamma_params(df.mean_time_hospitalised_recovery, df.sd_time_hospitalised_recovery)
-    ax[2,1].plot(x, gamma.pdf(x, a = a, loc = 0, scale = b), linewidth= lw, color = "#0072B2")
-    ax[2,1].axvline(df.mean_time_hospitalised_recovery.values, color = "#D55E00", 
-        linestyle = "dashed", alpha = 0.7)
-    ax[2,1].set_xlabel("Time to recover\n(from hospitalisation to hospital discharge if not ICU\nor from ICU discharge to hospital discharge if ICU; days)")
-    ax[2,1].set_title("")
-    remove_spines(ax[2, 1], ["top", "right"])
-    ax[2,1].text(0.9, 0.7, 'mean: {}\nsd: {}'.format(df.mean_time_hospitalised_recovery.values[0],
-        df.sd_time_hospitalised_recovery.values[0]), 
-        ha = 'right', va = 'center', transform = ax[2,1].transAxes)
-    
-    #############################
-    # Gamma of mean time to death
-    #############################
-    
-    a, b = gamma_params(df.mean_time_to_death.values, df.sd_time_to_death.values)
-    ax[1,2].plot(x, gamma.pdf(x, a = a, loc = 0, scale = b), linewidth= lw, c = "#0072B2")
-    ax[1,2].axvline(df.mean_time_to_death.values, color = "#D55E00", 
-        linestyle = "dashed", alpha = 0.7)
-    ax[1,2].set_xlabel("Time to death\n(from critical; days)")
-    ax[1,2].set_title("")
-    remove_spines(ax[1, 2], ["top", "right"])
-    ax[1,2].text(0.9, 0.7, 'mean: {}\nsd: {}'.format(df.mean_time_to_death.values[0],
-        df.sd_time_to_death.values[0]), 
-        ha = 'right', va = 'center', transform = ax[1,2].transAxes)
-    
-    ########################################
-    # Gamma of mean time to survive if critical: FIXME - definitions
-    ########################################
-    
-    a, b = gamma_params(df.mean_time_critical_survive, df.sd_time_critical_survive)
-    ax[2,2].plot(x, gamma.pdf(x, a = a, loc = 0, scale = b), linewidth= lw, color = "#0072B2")
-    ax[2,2].axvline(df.mean_time_critical_survive.values, color = "#D55E00", 
-        linestyle = "dashed", alpha = 0.7)
-    ax[2,2].set_xlabel("Time to survive\n(if ICU; days)")
-    ax[2,2].set_title("")
-    remove_spines(ax[2, 2], ["top", "right"])
-    ax[2,2].text(0.9, 0.7, 'mean: {}\nsd: {}'.format(df.mean_time_critical_survive.values[0],
-        df.sd_time_critical_survive.values[0]), 
-        ha = 'right', va = 'center', transform = ax[2,2].transAxes)
+    for i, (stem, (row, col), xlabel) in enumerate(GAMMA_WAITING_TIMES):
+        axi = ax[row, col]
+        
+        if df.shape[0] == 1:
+            axi.plot(x, pdfs[0, i], linewidth = lw, color = "#0072B2")
+            axi.axvline(means[0, i], color = "#D55E00", linestyle = "dashed", alpha = 0.7)
+            axi.text(0.9, 0.7, 'mean: {}\nsd: {}'.format(df["mean_" + stem].values[0],
+                df["sd_" + stem].values[0]), 
+                ha = 'right', va = 'center', transform = axi.transAxes)
+        elif quantiles is not None:
+            lower, median, upper = np.quantile(pdfs[:, i], [quantiles[0], 0.5, quantiles[1]], 
+                axis = 0)
+            axi.fill_between(x, lower, upper, color = "#0072B2", alpha = 0.3, linewidth = 0)
+            axi.plot(x, median, linewidth = lw, color = "#0072B2")
+        else:
+            axi.plot(x, pdfs[:, i].T, linewidth = lw/3, color = "#0072B2", 
+                alpha = min(1, 10/df.shape[0]))
+        
+        axi.set_xlabel(xlabel)
+        axi.set_title("")
+        remove_spines(axi, ["top", "right"])
     
     plt.subplots_adjust(hspace = 0.5)
     
     return(fig, ax)
 
 
+def plot_parameter_sets(df_parameters, set_labels = None, xlimits = [0, 30], lw = 2):
+    """
+    Small multiples of the gamma-distributed waiting times (columns) of each parameter set (rows)
+    
+    Arguments
+    ---------
+    df_parameters : pandas.DataFrame
+        Parameter sets of the OpenABM-Covid19 model (one per row; see `plot_parameter_assumptions`)
+    set_labels : list of str
+        Label of each parameter set (defaults to the row number)
+    xlimits : list of ints
+        Limits of x axis
+    lw : float
+        Line width used in plotting lines of the PDFs
+    
+    Returns
+    -------
+    fig, ax : figure and axis handles to the generated figure using matplotlib.pyplot
+    """
+    x = np.linspace(xlimits[0], xlimits[1], num = 50)
+    
+    means, sds = waiting_time_parameters(df_parameters)
+    pdfs = gamma_distributions(means, sds, x)
+    n_sets, n_times = means.shape
+    
+    if set_labels is None:
+        set_labels = np.arange(1, n_sets + 1)
+    
+    fig, ax = plt.subplots(nrows = n_sets, ncols = n_times, sharex = True, sharey = "col", 
+        squeeze = False)
+    
+    for i in range(n_sets):
+        for j in range(n_times):
+            ax[i, j].plot(x, pdfs[i, j], linewidth = lw, color = "#0072B2")
+            ax[i, j].axvline(means[i, j], color = "#D55E00", linestyle = "dashed", alpha = 0.7)
+            remove_spines(ax[i, j], ["top", "right"])
+        ax[i, 0].set_ylabel(set_labels[i])
+    
+    for j, (stem, panel, xlabel) in enumerate(GAMMA_WAITING_TIMES):
+        ax[-1, j].set_xlabel(xlabel, size = 8)
+    
+    return(fig, ax)
+
+
 def plot_hist_by_age(df, 
         groupvars, 
         age_group_var = "age_group",
@@ -578,16 +722,49 @@ def plot_hist_by_age(df,
     
     bin_list = np.arange(0, NBINS + 1) - 0.5
     
-    # Define number of groups
-    n_groups = len(groupvars)
+    counts = histogram_by_indicator(df[age_group_var].values, df[groupvars].values > 0, bin_list)
     
     if group_labels is None:
         group_labels = groupvars
     
+    return(plot_bars_by_age(counts, group_labels = group_labels, xlabel = xlabel, 
+        xticklabels = xticklabels, density = density, ylim = ylim))
+
+
+def plot_bars_by_age(counts, 
+        group_labels = None,
+        xlabel = "",
+        xticklabels = None,
+        density = False,
+        ylim = 0.5
+    ):
+    """
+    Plot precomputed counts by age group, with one subplot per group
+    
+    Arguments
+    ---------
+    counts : list of np.array
+        Counts in each age group (one array per group)
+    group_labels : list of str
+        Labels of each group
+    density : boolean
+        Should counts be normalised within each group
+    
+    See `plot_hist_by_age` for remaining arguments.  
+    """
+    
+    bin_list = np.arange(0, len(counts[0]) + 1) - 0.5
+    
+    # Define number of groups
+    n_groups = len(counts)
+    
+    if group_labels is None:
+        group_labels = [""]*n_groups
+    
     fig, ax = plt.subplots(nrows = n_groups)
     
-    for axi, var in enumerate(groupvars):
-        height, bins, objs = ax[axi].hist(df[df[var] > 0][age_group_var], bin_list, 
+    for axi, count in enumerate(counts):
+        height, bins, objs = ax[axi].hist(bin_list[:-1] + 0.5, bin_list, weights = count,
             width = 0.8, color = "#0072B2", edgecolor = "#0d1a26", 
             linewidth = 0.5, zorder = 3, density = density)
         
@@ -656,6 +833,15 @@ def add_heatmap_to_axes(ax, x, y, bin_list, vmin, vmax):
     
     array, xbins, ybins = np.histogram2d(x, y, bin_list)
     
+    return(add_array_heatmap_to_axes(ax, array, vmin, vmax))
+
+
+def add_array_heatmap_to_axes(ax, array, vmin, vmax):
+    """
+    Plot heatmap of a precomputed 2D array of counts (see `add_heatmap_to_axes`)
+    """
+    array = np.asarray(array, dtype = float)
+    
     im = ax.imshow(np.ma.masked_where(array == 0, array), 
         origin = "lower", aspect = "equal", vmin = vmin, vmax = vmax)
     
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Rates stratified by a categorical variable (age group, occupation network, house size, ...) with
+bootstrap confidence intervals
+
+Rates are ratios of event counts in each stratum, for instance the infection fatality ratio (IFR)
+is the number of deaths over the number of infections in each age group.  Confidence intervals are
+computed by resampling the count matrices rather than the rows of the transmission file: each
+bootstrap replicate resamples the individuals in the denominator (multinomial over strata and
+outcome), or draws the counts of individuals with and without the event from independent Poisson
+distributions.  All replicates are drawn in one vectorised call, so thousands of replicates take
+milliseconds regardless of the population size.
+"""
+
+import numpy as np, pandas as pd
+
+import counting
+
+# Default number of bootstrap replicates and confidence level
+N_BOOTSTRAP = 2000
+CI_LEVEL = 0.95
+
+BOOTSTRAP_METHODS = ["multinomial", "poisson"]
+
+
+def stratified_counts(strata, indicators, n_strata):
+    """
+    Number of rows in each stratum for which each indicator is true (in a single pass)
+
+    Arguments
+    ---------
+    strata : np.array
+        Integer-coded stratum (0, ..., n_strata - 1) of each row
+    indicators : np.array (n_rows, n_vars)
+        Boolean array of whether each event has occurred for each row
+    n_strata : int
+        Number of strata
+
+    Returns
+    -------
+    np.array (n_strata, n_vars) of counts
+    """
+    return(counting.histogram_by_indicator(strata, indicators, np.arange(n_strata + 1) - 0.5).T)
+
+
+def stratified_counts_df(df, stratumvar, event_vars, n_strata = None):
+    """
+    Number of rows with an event (column value > 0) in each stratum of a DataFrame
+
+    Arguments
+    ---------
+    df : pandas.DataFrame
+        Model output (e.g. the transmission file)
+    stratumvar : str
+        Column name of the (integer-coded) stratum
+    event_vars : list of str
+        Column names of events (e.g. ["time_infected", "time_death"]); an event has occurred when
+        the column is > 0
+    n_strata : int
+        Number of strata (defaults to the maximum stratum + 1)
+
+    Returns
+    -------
+    np.array (n_strata, len(event_vars)) of counts
+    """
+    strata = df[stratumvar].values
+    if n_strata is None:
+        n_strata = int(strata.max()) + 1
+
+    return(stratified_counts(strata, df[event_vars].values > 0, n_strata))
+
+
+def house_sizes(house_no):
+    """
+    Size of the household of each individual
+
+    Arguments
+    ---------
+    house_no : np.array
+        Household number of each individual in the population (from the individual file)
+
+    Returns
+    -------
+    np.array of household size of each individual
+    """
+    house_no = np.asarray(house_no, dtype = np.int64)
+    return(np.bincount(house_no)[house_no])
+
+
+def bootstrap_rates(numerator, denominator, n_bootstrap = N_BOOTSTRAP, method = "multinomial",
+        seed = 0):
+    """
+    Bootstrap replicates of stratified rates from count matrices
+
+    The events counted in `numerator` must be a subset of those counted in `denominator` (e.g.
+    deaths among infections).
+
+    Arguments
+    ---------
+    numerator, denominator : np.array
+        Counts in each stratum
+    n_bootstrap : int
+        Number of bootstrap replicates
+    method : str
+        "multinomial" (resample the individuals in the denominator, keeping its total fixed) or
+        "poisson" (independent Poisson counts of individuals with and without the event)
+    seed : int
+        Seed of the random number generator
+
+    Returns
+    -------
+    np.array (n_bootstrap, n_strata + 1) of rates in each stratum (the last column is the rate
+    across all strata)
+    """
+    numerator = np.asarray(numerator, dtype = np.int64)
+    denominator = np.asarray(denominator, dtype = np.int64)
+    n_strata = len(numerator)
+
+    rng = np.random.default_rng(seed)
+
+    # Counts of individuals with and without the event in each stratum
+    cells = np.concatenate([numerator, denominator - numerator])
+
+    if method == "multinomial":
+        total = cells.sum()
+        samples = rng.multinomial(total, cells/max(total, 1), size = n_bootstrap)
+    elif method == "poisson":
+        samples = rng.poisson(cells, size = (n_bootstrap, len(cells)))
+    else:
+        raise ValueError("Unknown bootstrap method: {}".format(method))
+
+    events = samples[:, :n_strata]
+    totals = events + samples[:, n_strata:]
+
+    events = np.column_stack([events, events.sum(axis = 1)])
+    totals = np.column_stack([totals, totals.sum(axis = 1)])
+
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+        return(events/totals)
+
+
+def stratified_rates(numerator, denominator, n_bootstrap = N_BOOTSTRAP, level = CI_LEVEL,
+        method = "multinomial", seed = 0, labels = None):
+    """
+    Stratified rates with percentile bootstrap confidence intervals
+
+    Arguments
+    ---------
+    numerator, denominator : np.array
+        Counts in each stratum
+    n_bootstrap : int
+        Number of bootstrap replicates (intervals are NaN if 0)
+    level : float
+        Confidence level of the intervals
+    method, seed
+        See `bootstrap_rates`
+    labels : list of str
+        Labels of each stratum
+
+    Returns
+    -------
+    pandas.DataFrame with one row per stratum and a last row for all strata ("overall"), and
+    columns stratum, numerator, denominator, rate, lower, and upper
+    """
+    numerator = np.asarray(numerator)
+    denominator = np.asarray(denominator)
+
+    if labels is None:
+        labels = list(range(len(numerator)))
+
+    num = np.append(numerator, numerator.sum())
+    den = np.append(denominator, denominator.sum())
+
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+        rate = num/den
+
+    df = pd.DataFrame({"stratum": list(labels) + ["overall"], "numerator": num,
+        "denominator": den, "rate": rate})
+
+    if n_bootstrap:
+        replicates = bootstrap_rates(numerator, denominator, n_bootstrap, method, seed)
+        alpha = (1 - level)/2
+        with np.errstate(invalid = "ignore"):
+            df["lower"], df["upper"] = np.nanquantile(replicates, [alpha, 1 - alpha], axis = 0)
+    else:
+        df["lower"], df["upper"] = np.nan, np.nan
+
+    return(df)
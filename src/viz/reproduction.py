@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Estimators of the reproduction number from model output
+
+Actual R
+--------
+The actual reproduction number on day t is the mean number of offspring (secondary infections) of
+individuals infected on day t, calculated from the transmission file.  All per-day statistics are
+computed from the distribution of offspring on each day, an array of counts of shape
+(n_days, max offspring + 1) built with a single np.bincount (see
+`transmission_aggregates.compute_aggregates`), so no per-day scans of the transmission file are
+needed.  Per-day statistics can be written to a CSV file:
+
+    python src/viz/reproduction.py <transmission_file or aggregates.npz> <output_file.csv>
+
+Instantaneous R
+---------------
+The instantaneous reproduction number on day t is estimated from daily incidence I with the
+renewal equation, R_t = I_t / sum_{k=1}^{t} w_k I_{t-k}, where w_k is the gamma distribution of the
+infectious period discretised to days.  The weights are computed once and the denominator is
+computed for a whole incidence series (or for many series at once, e.g. of an ensemble) with a
+single FFT convolution.  `cori_R` estimates R over sliding windows with the Bayesian method of
+Cori et al. (2013), which gives credible intervals.
+"""
+
+import sys
+
+import numpy as np, pandas as pd
+
+# scipy is imported by the functions that use it (so that importing this module is fast)
+
+import plotting, transmission_aggregates
+
+# Default quantiles of the offspring distribution reported by `actual_R`
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+def offspring_distribution(offspring_by_day, times):
+    """
+    Distribution of the number of offspring of individuals infected on each day in `times`
+
+    Arguments
+    ---------
+    offspring_by_day : np.array (n_days, max offspring + 1)
+        Number of individuals infected on each day with each number of offspring
+    times : np.array
+        Days of infection
+
+    Returns
+    -------
+    np.array (len(times), max offspring + 1) of counts (rows are zero for days outside the range
+    of `offspring_by_day`)
+    """
+    times = np.asarray(times, dtype = np.int64)
+    counts = np.zeros((len(times), offspring_by_day.shape[1]), dtype = offspring_by_day.dtype)
+
+    observed = (times >= 0) & (times < offspring_by_day.shape[0])
+    counts[observed] = offspring_by_day[times[observed]]
+    return(counts)
+
+
+def offspring_samples(offspring_by_day, times):
+    """
+    Number of offspring of each individual infected on each day in `times`
+
+    Returns
+    -------
+    list of np.array (one per day) of the number of offspring of each individual infected on that
+    day (in increasing order)
+    """
+    counts = offspring_distribution(offspring_by_day, times)
+    n_offspring = np.arange(counts.shape[1])
+
+    samples = np.repeat(np.tile(n_offspring, len(counts)), counts.ravel())
+    return(np.split(samples, np.cumsum(counts.sum(axis = 1))[:-1]))
+
+
+def _quantiles(cumulative, n, q):
+    """
+    Quantiles of samples given as histograms over 0, 1, 2, ... (one row per day), with the linear
+    interpolation of np.quantile
+    """
+    position = (n - 1)*q
+    lower = np.floor(position)
+
+    # Value of the sorted sample at index i is the first bin with cumulative count > i
+    value_lower = (cumulative <= lower[:, None]).sum(axis = 1)
+    value_upper = (cumulative <= np.minimum(lower + 1, n - 1)[:, None]).sum(axis = 1)
+
+    return(value_lower + (position - lower)*(value_upper - value_lower))
+
+
+def actual_R(offspring_by_day, times, quantiles = QUANTILES):
+    """
+    Per-day statistics of the number of offspring of individuals infected on each day (actual R)
+
+    Arguments
+    ---------
+    offspring_by_day : np.array (n_days, max offspring + 1)
+        Number of individuals infected on each day with each number of offspring
+    times : np.array
+        Days of infection
+    quantiles : list of float
+        Quantiles of the offspring distribution to calculate
+
+    Returns
+    -------
+    pandas.DataFrame with columns time, n_infected, mean, var (population variance), and one
+    column per quantile (named "q<quantile>", e.g. "q0.5"); statistics are nan on days without
+    infections
+    """
+    counts = offspring_distribution(offspring_by_day, times).astype(float)
+    n_offspring = np.arange(counts.shape[1])
+
+    n = counts.sum(axis = 1)
+    observed = n > 0
+
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+        mean = counts @ n_offspring / n
+        var = counts @ n_offspring**2 / n - mean**2
+
+    df = pd.DataFrame({"time": np.asarray(times), "n_infected": n.astype(int),
+        "mean": mean, "var": np.maximum(var, 0)})
+
+    cumulative = np.cumsum(counts[observed], axis = 1)
+    for q in quantiles:
+        values = np.full(len(n), np.nan)
+        values[observed] = _quantiles(cumulative, n[observed], q)
+        df["q{}".format(q)] = values
+
+    return(df)
+
+
+def daily_incidence(total_infected):
+    """
+    Daily incidence from cumulative infections (the first element is the number of seed cases)
+
+    Arguments
+    ---------
+    total_infected : np.array
+        Cumulative number of infections on each day (the last axis is time)
+    """
+    total_infected = np.asarray(total_infected, dtype = float)
+    return(np.diff(total_infected, axis = -1, prepend = 0))
+
+
+def discretised_gamma(mean, sd, n_days):
+    """
+    Gamma distribution (with mean `mean` and standard deviation `sd`) discretised to days
+
+    Returns
+    -------
+    np.array of length n_days of weights w_k = F(k) - F(k - 1), where F is the gamma CDF (so that
+    w_0 = 0)
+    """
+    from scipy.stats import gamma
+
+    a, b = plotting.gamma_params(float(mean), float(sd))
+
+    cdf = gamma.cdf(np.arange(n_days), a, loc = 0, scale = b)
+    return(np.diff(cdf, prepend = 0))
+
+
+def renewal_denominator(incidence, w):
+    """
+    Total infectiousness, sum_{k=1}^{t} w_k I_{t-k}, on each day (with a single FFT convolution)
+
+    Arguments
+    ---------
+    incidence : np.array
+        Daily incidence (the last axis is time, so several series can be given at once)
+    w : np.array
+        Discretised distribution of the infectious period (see `discretised_gamma`); w_0 is
+        ignored
+
+    Returns
+    -------
+    np.array of the same shape as `incidence`
+    """
+    from scipy.signal import fftconvolve
+
+    incidence = np.asarray(incidence, dtype = float)
+    n_days = incidence.shape[-1]
+
+    weights = np.zeros(n_days)
+    weights[1:min(n_days, len(w))] = w[1:min(n_days, len(w))]
+    weights = weights.reshape((1,)*(incidence.ndim - 1) + (n_days, ))
+
+    denominator = fftconvolve(incidence, weights, axes = -1)[..., :n_days]
+
+    # Remove round-off from the FFT where no earlier infections have occurred (denominator is 0)
+    no_history = np.cumsum(incidence != 0, axis = -1) == 0
+    denominator[..., 1:][no_history[..., :-1]] = 0
+    denominator[..., 0] = 0
+
+    return(denominator)
+
+
+def instantaneous_R(incidence, mean, sd):
+    """
+    Instantaneous reproduction number on each day from daily incidence (see module docstring)
+
+    Arguments
+    ---------
+    incidence : np.array
+        Daily incidence (the last axis is time)
+    mean, sd : float
+        Mean and standard deviation of the infectious period (gamma distributed)
+
+    Returns
+    -------
+    np.array of the same shape as `incidence` (inf or nan where the denominator is zero)
+    """
+    incidence = np.asarray(incidence, dtype = float)
+    weights = discretised_gamma(mean, sd, incidence.shape[-1])
+
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+        return(incidence / renewal_denominator(incidence, weights))
+
+
+def cori_R(incidence, mean, sd, window = 7, a_prior = 1, b_prior = 5, 
+        quantiles = [0.025, 0.5, 0.975]):
+    """
+    Sliding-window estimate of the instantaneous reproduction number (Cori et al., 2013)
+
+    Assuming R is constant over the `window` days ending on day t, with a gamma prior of shape
+    `a_prior` and scale `b_prior`, the posterior of R is gamma with shape 
+    a_prior + sum_s I_s and scale 1 / (1/b_prior + sum_s Lambda_s), where Lambda_s is the total
+    infectiousness on day s (see `renewal_denominator`).  
+
+    Arguments
+    ---------
+    incidence : np.array
+        Daily incidence (the last axis is time)
+    mean, sd : float
+        Mean and standard deviation of the infectious period (gamma distributed)
+    window : int
+        Number of days in each window
+    a_prior, b_prior : float
+        Shape and scale of the gamma prior of R
+    quantiles : list of float
+        Quantiles of the posterior to calculate (for credible intervals)
+
+    Returns
+    -------
+    dict of np.array of the same shape as `incidence`: "mean", "sd", and one entry per quantile
+    (named "q<quantile>", e.g. "q0.025"); estimates are nan for windows that start before day 1
+    """
+    from scipy.stats import gamma
+
+    incidence = np.asarray(incidence, dtype = float)
+    n_days = incidence.shape[-1]
+
+    weights = discretised_gamma(mean, sd, n_days)
+    denominator = renewal_denominator(incidence, weights)
+
+    def window_sums(x):
+        cumulative = np.cumsum(x, axis = -1)
+        sums = np.full(x.shape, np.nan)
+        sums[..., window:] = cumulative[..., window:] - cumulative[..., :-window]
+        return(sums)
+
+    shape = a_prior + window_sums(incidence)
+    scale = 1 / (1 / b_prior + window_sums(denominator))
+
+    posterior = {"mean": shape*scale, "sd": np.sqrt(shape)*scale}
+    for q in quantiles:
+        posterior["q{}".format(q)] = gamma.ppf(q, shape, scale = scale)
+
+    return(posterior)
+
+
+if __name__ == "__main__":
+
+    transmission_file = sys.argv[1]
+    output_file = sys.argv[2]
+
+    aggregates = transmission_aggregates.load_aggregates(transmission_file)
+    offspring_by_day = aggregates["offspring_by_day"]
+
+    df_R = actual_R(offspring_by_day, np.arange(offspring_by_day.shape[0]))
+    df_R.to_csv(output_file, index = False)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Statistics over sliding windows of time
+
+Events are first binned by day (a per-day array of counts, see `daily_counts`); the count in
+every window is then the difference of two elements of the cumulative sum of the daily array, so
+counts, rates and means for all overlapping windows are computed at once, at a cost that does not
+depend on the number of windows.  For instance, the infection fatality ratio by day of infection
+over 7-day windows:
+
+    windows = window_bounds(n_days, window = 7)
+    deaths = window_sums(daily_deaths, windows)
+    infected = window_sums(daily_infected, windows)
+    ifr = window_ratio(deaths, infected)
+
+Time-varying IFR and attack rate can be written to a CSV file:
+
+    python src/viz/rolling.py <transmission_file or aggregates.npz> <output_file.csv> \
+        [window] [n_total]
+"""
+
+import sys
+
+import numpy as np, pandas as pd
+
+import outcome_cube, transmission_aggregates
+
+# Default length of windows (days)
+WINDOW_LENGTH = 7
+
+
+def window_bounds(n_days, window = WINDOW_LENGTH, step = 1, start = 0):
+    """
+    Start (inclusive) and end (exclusive) days of all windows of `window` days starting every
+    `step` days from day `start` that fit within `n_days` days
+
+    Returns
+    -------
+    np.array (n_windows, 2)
+    """
+    starts = np.arange(start, n_days - window + 1, step)
+    return(np.column_stack([starts, starts + window]))
+
+
+def daily_counts(times, n_days = None, weights = None):
+    """
+    Number of events (or sum of weights) on each day, ignoring negative times (events that have
+    not occurred)
+
+    Arguments
+    ---------
+    times : np.array
+        Day of each event
+    n_days : int
+        Number of days (defaults to the last day + 1)
+    weights : np.array
+        Weight of each event
+    """
+    times = np.asarray(times, dtype = np.int64)
+    occurred = times >= 0
+
+    if weights is not None:
+        weights = np.asarray(weights)[occurred]
+    if n_days is None:
+        n_days = int(times.max()) + 1 if occurred.any() else 0
+
+    counts = np.bincount(times[occurred], weights = weights, minlength = n_days)
+    return(counts[:n_days])
+
+
+def window_sums(daily, windows, axis = -1):
+    """
+    Sum of a per-day array within each window (from one cumulative sum)
+
+    Arguments
+    ---------
+    daily : np.array
+        Per-day values (days along `axis`)
+    windows : np.array (n_windows, 2)
+        Start and end days of each window (see `window_bounds`); days are clipped to the array
+
+    Returns
+    -------
+    np.array with the days axis replaced by an axis of windows
+    """
+    daily = np.moveaxis(np.asarray(daily), axis, -1)
+    n_days = daily.shape[-1]
+
+    cumulative = np.cumsum(daily, axis = -1)
+    cumulative = np.concatenate([np.zeros_like(cumulative[..., :1]), cumulative], axis = -1)
+
+    windows = np.clip(np.asarray(windows, dtype = np.int64).reshape(-1, 2), 0, n_days)
+    sums = cumulative[..., windows[:, 1]] - cumulative[..., windows[:, 0]]
+
+    return(np.moveaxis(sums, -1, axis))
+
+
+def window_ratio(numerator, denominator):
+    """
+    Ratio of window sums (nan where the denominator is zero)
+    """
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+        return(np.where(denominator > 0, numerator / denominator, np.nan))
+
+
+def window_means(daily_values, daily_n, windows, axis = -1):
+    """
+    Mean of values within each window, from per-day sums of values and per-day numbers of values
+    """
+    return(window_ratio(window_sums(daily_values, windows, axis),
+        window_sums(daily_n, windows, axis)))
+
+
+def time_varying_rates(daily_infected, daily_deaths, windows, n_total = None):
+    """
+    Infection fatality ratio and attack rate of infections in each window
+
+    Arguments
+    ---------
+    daily_infected : np.array
+        Number infected on each day
+    daily_deaths : np.array
+        Number of deaths among those infected on each day (by day of infection)
+    windows : np.array (n_windows, 2)
+        Start and end days of each window
+    n_total : int
+        Population size (the attack rate is not calculated if None)
+
+    Returns
+    -------
+    pandas.DataFrame with columns start, end, infected, deaths, ifr (and attack_rate)
+    """
+    windows = np.asarray(windows).reshape(-1, 2)
+
+    infected = window_sums(daily_infected, windows)
+    deaths = window_sums(daily_deaths, windows)
+
+    df = pd.DataFrame({"start": windows[:, 0], "end": windows[:, 1],
+        "infected": infected, "deaths": deaths, "ifr": window_ratio(deaths, infected)})
+
+    if n_total is not None:
+        df["attack_rate"] = infected / n_total
+
+    return(df)
+
+
+if __name__ == "__main__":
+
+    transmission_file = sys.argv[1]
+    output_file = sys.argv[2]
+    window = int(sys.argv[3]) if len(sys.argv) > 3 else WINDOW_LENGTH
+    n_total = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    aggregates = transmission_aggregates.load_aggregates(transmission_file)
+    outcome_by_day = aggregates["outcome_by_day"]
+
+    daily_infected = outcome_by_day[:, outcome_cube.OUTCOMES.index("infected")]
+    daily_deaths = outcome_by_day[:, outcome_cube.OUTCOMES.index("dead")]
+
+    windows = window_bounds(outcome_by_day.shape[0], window)
+
+    df_rates = time_varying_rates(daily_infected, daily_deaths, windows, n_total)
+    df_rates.to_csv(output_file, index = False)
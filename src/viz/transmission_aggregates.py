@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Aggregates of the transmission file used by the figures and tables of the paper
+
+All aggregates are computed from a single read of the transmission file so that figure and table
+scripts only render precomputed arrays.  Aggregates can be saved to (and loaded from) a .npz file:
+
+    python src/viz/transmission_aggregates.py <transmission_file> <aggregates_file.npz>
+
+Aggregates (keys of the returned dictionary)
+--------------------------------------------
+outcome_by_age : np.array (n_age, n_outcomes)
+    Number of recipients in each age group with time > 0 for each variable in OUTCOME_VARS (the
+    age x outcome cube, see `outcome_cube`)
+outcome_by_day : np.array (max time infected + 1, n_outcomes)
+    Number of recipients infected on each day with time > 0 for each variable in OUTCOME_VARS
+    (for windowed statistics, see `rolling`)
+status_age_age : np.array (n_status, n_age, n_age)
+    Number of transmissions by status of the source, age group of the recipient, and age group of
+    the source
+generation_time_by_status : np.array (n_status, max generation time + 1)
+    Number of transmissions by status of the source and generation time
+generation_time_by_status_day : np.array (n_status, max time infected + 1, max generation time + 1)
+    Number of transmissions by status of the source, day of infection of the recipient, and
+    generation time (see `generation_time`)
+offspring_by_day : np.array (max time infected + 1, max offspring + 1)
+    Number of individuals infected on each day with each number of offspring (seed cases are not
+    counted as the source of their own infection)
+"""
+
+from os.path import splitext
+import sys
+
+import numpy as np
+
+import constants, counting, model_output, outcome_cube, rates
+
+# Outcome variables counted by age group (recipients with time > 0)
+OUTCOME_VARS = outcome_cube.OUTCOME_VARS
+
+# Columns of the transmission file needed to compute all aggregates
+TRANSMISSION_COLUMNS = ["ID_source", "ID_recipient", "age_group_source", "age_group_recipient",
+    "status_source", "generation_time"] + OUTCOME_VARS
+
+
+def offspring_counts(id_source, id_recipient):
+    """
+    Number of offspring of each recipient in the transmission file
+
+    Seed cases (where the source is the recipient) are not counted as the source of an infection.
+
+    Returns
+    -------
+    np.array of number of offspring of each row's recipient
+    """
+    id_source = np.asarray(id_source, dtype = np.int64)
+    id_recipient = np.asarray(id_recipient, dtype = np.int64)
+
+    is_seed = (id_source == id_recipient)
+    n_ids = max(id_source.max(), id_recipient.max()) + 1
+
+    offspring = np.bincount(id_source[~is_seed], minlength = n_ids)
+    return(offspring[id_recipient])
+
+
+def compute_aggregates(df_trans, n_age = constants.n_age, n_status = constants.n_status):
+    """
+    Compute all aggregates of the transmission file (see module docstring)
+
+    Arguments
+    ---------
+    df_trans : pandas.DataFrame
+        Transmission file output from the model (with at least TRANSMISSION_COLUMNS)
+    n_age : int
+        Number of age groups
+    n_status : int
+        Minimum number of statuses of the source (the status axis of the aggregates is indexed by
+        event type, whether or not any source had that status)
+
+    Returns
+    -------
+    dict of np.array
+    """
+    age_recipient = df_trans["age_group_recipient"].values
+    age_source = df_trans["age_group_source"].values
+    status = df_trans["status_source"].values
+    generation_time = df_trans["generation_time"].values
+    time_infected = df_trans["time_infected"].values
+
+    n_status = max(n_status, int(status.max()) + 1)
+
+    outcome_by_age = outcome_cube.outcome_counts([age_recipient], [n_age],
+        df_trans[OUTCOME_VARS].values)
+
+    status_age_age = counting.count_tensor((status, age_recipient, age_source),
+        (n_status, n_age, n_age))
+
+    # Exclude negative generation times (outside the range of all histograms)
+    valid = generation_time >= 0
+    generation_time_by_status_day = counting.count_tensor(
+        (status[valid], time_infected[valid], generation_time[valid]),
+        (n_status, int(time_infected.max()) + 1, int(generation_time.max()) + 1))
+    generation_time_by_status = generation_time_by_status_day.sum(axis = 1)
+
+    outcome_by_day = outcome_cube.outcome_counts([time_infected], [int(time_infected.max()) + 1],
+        df_trans[OUTCOME_VARS].values)
+
+    offspring = offspring_counts(df_trans["ID_source"].values, df_trans["ID_recipient"].values)
+    offspring_by_day = counting.count_tensor((time_infected, offspring),
+        (int(time_infected.max()) + 1, int(offspring.max()) + 1))
+
+    aggregates = dict(
+        outcome_by_age = outcome_by_age,
+        outcome_by_day = outcome_by_day,
+        status_age_age = status_age_age,
+        generation_time_by_status = generation_time_by_status,
+        generation_time_by_status_day = generation_time_by_status_day,
+        offspring_by_day = offspring_by_day
+    )
+    return(aggregates)
+
+
+def save_aggregates(aggregates, path):
+    """Save aggregates to a compressed .npz file"""
+    np.savez_compressed(path, **aggregates)
+
+
+def load_aggregates(path):
+    """
+    Load aggregates from a .npz file or compute them from a transmission file
+
+    Arguments
+    ---------
+    path : str
+        Path to either an aggregates file (.npz, see `save_aggregates`) or a transmission file in
+        any output format (see `model_output.read_output`); only the columns needed are read
+
+    Returns
+    -------
+    dict of np.array
+    """
+    if splitext(path)[1] == ".npz":
+        with np.load(path) as data:
+            return({key: data[key] for key in data.files})
+
+    df_trans = model_output.read_transmissions(path, columns = TRANSMISSION_COLUMNS)
+    return(compute_aggregates(df_trans))
+
+
+def outcome_counts(aggregates, var):
+    """Counts by age group of recipients with time > 0 for an outcome variable"""
+    return(aggregates["outcome_by_age"][:, OUTCOME_VARS.index(var)])
+
+
+def age_outcome_cube(aggregates, df_indiv = None, n_age = constants.n_age):
+    """
+    Age x outcome cube (see `outcome_cube`) from aggregates, with the population of each age
+    group if the individual file is given
+    """
+    population = None
+    if df_indiv is not None:
+        population = np.bincount(df_indiv["age_group"].values, minlength = n_age)
+
+    return({"counts": aggregates["outcome_by_age"], "population": population,
+        "strata": ["age_group"],
+        "outcomes": outcome_cube.OUTCOMES[:aggregates["outcome_by_age"].shape[1]]})
+
+
+def ifr_by_age(aggregates, n_bootstrap = rates.N_BOOTSTRAP, **kwargs):
+    """
+    Infection fatality ratio by age group and in the whole population, with bootstrap confidence
+    intervals (see `rates.stratified_rates` for keyword arguments)
+
+    Returns
+    -------
+    pandas.DataFrame with one row per age group and a last row for the whole population
+    """
+    deaths = outcome_counts(aggregates, "time_death")
+    infected = outcome_counts(aggregates, "time_infected")
+
+    return(rates.stratified_rates(deaths, infected, n_bootstrap, **kwargs))
+
+
+if __name__ == "__main__":
+
+    transmission_file = sys.argv[1]
+    output_file = sys.argv[2]
+
+    save_aggregates(load_aggregates(transmission_file), output_file)
@@ -9,8 +9,8 @@ from os.path import join
 import pandas as pd, numpy as np, sys
 from matplotlib import pyplot as plt
 
-import plotting
-from COVID19.model import AgeGroupEnum, EVENT_TYPES, TransmissionTypeEnum, OccupationNetworkEnum
+import plotting, transmission_aggregates
+from model_enums import AgeGroupEnum, EVENT_TYPES, TransmissionTypeEnum, OccupationNetworkEnum
 
 age_group_labels = [enum.name[1:].replace("_","-") for enum in AgeGroupEnum]
 age_group_labels[-1] = "80+"
@@ -31,6 +31,25 @@ for i in infectious_names:
             infectious_types.append(e.value)
             infectious_labels.append(plotting.EVENT_TYPE_STRING[e.value])
 
+
+def figure_3(aggregates):
+    """
+    Heatmaps of transmissions by age of source and recipient, with one panel per infectious
+    status of the source
+    """
+    plt.rcParams['figure.figsize'] = [12, 10]
+    
+    fig, ax = plotting.plot_heatmap_panels(
+        aggregates["status_age_age"][infectious_types], panel_labels = infectious_labels,
+        xlabel = "Age of source", ylabel = "Age of recipient",
+        legend_title = "Number of\ntransmission events",
+        xticklabels = age_group_labels, yticklabels = age_group_labels,
+        title_fontsize = 16, vmin_panels = 1, 
+        ncols = 3, nrows = 2)
+    
+    return(fig, ax)
+
+
 if __name__ == "__main__":
     
     transmission_file = sys.argv[1]
@@ -38,19 +57,10 @@ if __name__ == "__main__":
     file_format = sys.argv[3]
     
     plt.rcParams["savefig.format"] = file_format
-    plt.rcParams['figure.figsize'] = [12, 10]
     
-    df_trans = pd.read_csv(transmission_file)
+    aggregates = transmission_aggregates.load_aggregates(transmission_file)
     
-    fig, ax = plotting.transmission_heatmap_by_age_by_panels(
-        df_trans, "age_group_recipient", "age_group_source", bins = len(AgeGroupEnum),
-        panels = infectious_types,
-        panelvar = "status_source", panel_labels = infectious_labels,
-        xlabel = "Age of source", ylabel = "Age of recipient",
-        legend_title = "Number of\ntransmission events",
-        xticklabels = age_group_labels, yticklabels = age_group_labels,
-        title_fontsize = 16, spines = True, vmin_panels = 1, 
-        ncols = 3, nrows = 2)
+    fig, ax = figure_3(aggregates)
 
     plt.savefig(output_figure)
     plt.close()
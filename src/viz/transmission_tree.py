@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Index of the transmission tree for fast chain and cluster queries
+
+The transmission file is an edge list from source (parent) to recipient (child).  `build_tree`
+indexes it once into arrays over individual IDs (IDs are 0, ..., n_individuals - 1):
+
+parent : np.array (n_individuals, )
+    ID of the source of each individual's infection (-1 for seed cases and uninfected individuals)
+child_offsets, children : np.array (n_individuals + 1, ), np.array (n_transmissions, )
+    Children in compressed sparse row (CSR) format: the IDs of the individuals infected by
+    individual i are children[child_offsets[i]:child_offsets[i + 1]] (in the order of the file)
+depth : np.array (n_individuals, )
+    Number of generations from the seed case of each individual's chain (0 for seed cases, -1 for
+    uninfected individuals)
+root : np.array (n_individuals, )
+    ID of the seed case at the root of each individual's chain (-1 for uninfected individuals)
+subtree_size : np.array (n_individuals, )
+    Number of individuals in the subtree rooted at each individual, including itself (0 for
+    uninfected individuals)
+levels : list of np.array
+    IDs of the individuals at each depth (breadth-first order)
+
+All queries are array operations over the levels of the tree (one pass per generation), so the
+total cost is O(N).  If an individual appears as a recipient more than once (reinfection) only
+its first infection in the file is used.
+
+Example:
+    df_trans = model_output.read_transmissions(path, columns = ["ID_source", "ID_recipient"])
+    tree = build_tree(df_trans.ID_source.values, df_trans.ID_recipient.values)
+    seeds, sizes = cluster_sizes(tree)
+
+The size and depth of the cluster of each seed case can be written to a CSV file:
+
+    python src/viz/transmission_tree.py <transmission_file> <output_file.csv>
+"""
+
+import sys
+
+import numpy as np, pandas as pd
+
+import model_output
+
+# Columns of the transmission file needed to build the tree
+TREE_COLUMNS = ["ID_source", "ID_recipient"]
+
+
+def gather_children(tree, ids):
+    """
+    IDs of the children of each individual in `ids` (concatenated, in the order of `ids`)
+    """
+    offsets = tree["child_offsets"]
+    ids = np.asarray(ids, dtype = np.int64)
+
+    starts = offsets[ids]
+    counts = offsets[ids + 1] - starts
+
+    # Index into `children` of each child: start of its parent's block + position in the block
+    position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return(tree["children"][np.repeat(starts, counts) + position])
+
+
+def build_tree(id_source, id_recipient, n_individuals = None):
+    """
+    Build the transmission-tree index from the source and recipient of each transmission (seed
+    cases are rows where the source is the recipient); see module docstring
+
+    Arguments
+    ---------
+    id_source, id_recipient : np.array
+        ID_source and ID_recipient columns of the transmission file
+    n_individuals : int
+        Number of individuals (defaults to the largest ID + 1)
+
+    Returns
+    -------
+    dict of np.array
+    """
+    id_source = np.asarray(id_source, dtype = np.int64)
+    id_recipient = np.asarray(id_recipient, dtype = np.int64)
+
+    # First infection of each recipient
+    _, first = np.unique(id_recipient, return_index = True)
+    first = np.sort(first)
+    id_source, id_recipient = id_source[first], id_recipient[first]
+
+    if n_individuals is None:
+        n_individuals = int(max(id_source.max(), id_recipient.max())) + 1
+
+    is_seed = (id_source == id_recipient)
+    parents, recipients = id_source[~is_seed], id_recipient[~is_seed]
+
+    parent = np.full(n_individuals, -1, dtype = np.int64)
+    parent[recipients] = parents
+
+    # Children in CSR format (stable sort keeps the order of the file within each parent)
+    order = np.argsort(parents, kind = "stable")
+    child_offsets = np.zeros(n_individuals + 1, dtype = np.int64)
+    child_offsets[1:] = np.cumsum(np.bincount(parents, minlength = n_individuals))
+
+    tree = {"parent": parent, "child_offsets": child_offsets, "children": recipients[order]}
+
+    # Depth and root, one generation at a time from the seed cases
+    depth = np.full(n_individuals, -1, dtype = np.int64)
+    root = np.full(n_individuals, -1, dtype = np.int64)
+
+    level = id_recipient[is_seed]
+    depth[level] = 0
+    root[level] = level
+    levels = []
+    while len(level) > 0:
+        levels.append(level)
+        children = gather_children(tree, level)
+        depth[children] = len(levels)
+        root[children] = root[parent[children]]
+        level = children
+
+    # Subtree sizes, one generation at a time from the leaves
+    subtree_size = np.zeros(n_individuals, dtype = np.int64)
+    for level in levels:
+        subtree_size[level] = 1
+    for level in reversed(levels[1:]):
+        subtree_size += np.bincount(parent[level], weights = subtree_size[level],
+            minlength = n_individuals).astype(np.int64)
+
+    tree.update(depth = depth, root = root, subtree_size = subtree_size, levels = levels)
+    return(tree)
+
+
+def read_tree(transmission_file, n_individuals = None):
+    """
+    Build the transmission-tree index from a transmission file (in any output format)
+    """
+    df_trans = model_output.read_transmissions(transmission_file, columns = TREE_COLUMNS)
+    return(build_tree(df_trans.ID_source.values, df_trans.ID_recipient.values, n_individuals))
+
+
+def offspring_counts(tree):
+    """Number of individuals infected by each individual"""
+    return(np.diff(tree["child_offsets"]))
+
+
+def descendant_counts(tree):
+    """Number of individuals in the chains of transmission from each individual (excluding it)"""
+    return(np.maximum(tree["subtree_size"] - 1, 0))
+
+
+def seeds(tree):
+    """IDs of the seed cases"""
+    return(tree["levels"][0] if tree["levels"] else np.array([], dtype = np.int64))
+
+
+def cluster_sizes(tree):
+    """
+    Number of individuals infected in the cluster (tree) of each seed case, including the seed
+
+    Returns
+    -------
+    seed_ids, sizes : np.array, np.array
+    """
+    seed_ids = seeds(tree)
+    return(seed_ids, tree["subtree_size"][seed_ids])
+
+
+def chain_depths(tree):
+    """
+    Length (number of generations) of the longest chain of transmission from each seed case
+
+    Returns
+    -------
+    seed_ids, depths : np.array, np.array
+    """
+    max_depth = np.zeros(len(tree["parent"]), dtype = np.int64)
+
+    # Levels are in increasing depth so later assignments are deeper
+    for d, level in enumerate(tree["levels"]):
+        max_depth[tree["root"][level]] = d
+
+    seed_ids = seeds(tree)
+    return(seed_ids, max_depth[seed_ids])
+
+
+def subtree_members(tree, ids):
+    """
+    IDs of all individuals in the subtrees rooted at `ids` (including `ids`)
+    """
+    members = [np.asarray(ids, dtype = np.int64)]
+    while len(members[-1]) > 0:
+        members.append(gather_children(tree, members[-1]))
+    return(np.concatenate(members))
+
+
+def superspreaders(tree, min_offspring = 10):
+    """
+    Individuals who infected at least `min_offspring` others, with the size of their subtrees
+
+    Returns
+    -------
+    ids, n_offspring, n_descendants : np.array, np.array, np.array
+    """
+    offspring = offspring_counts(tree)
+    ids = np.flatnonzero(offspring >= min_offspring)
+    return(ids, offspring[ids], descendant_counts(tree)[ids])
+
+
+def sibling_counts(tree):
+    """
+    Number of siblings of each infected individual that was not a seed case (the number of other
+    individuals infected by its source)
+
+    Returns
+    -------
+    ids, n_siblings : np.array, np.array
+    """
+    ids = np.flatnonzero(tree["parent"] >= 0)
+    return(ids, offspring_counts(tree)[tree["parent"][ids]] - 1)
+
+
+def offspring_sibling_distribution(offspring):
+    """
+    Offspring distribution and the corresponding sibling (size-biased) distribution
+
+    The sibling distribution is the distribution of the number of offspring of the source of a
+    randomly chosen infection, P_sibling(n) proportional to n P_offspring(n).
+
+    Arguments
+    ---------
+    offspring : np.array
+        Number of offspring of each individual (e.g. of parents infected in a given period)
+
+    Returns
+    -------
+    n, p_offspring, p_sibling : np.array
+        Number of offspring, and offspring and sibling distributions
+    """
+    counts = np.bincount(np.asarray(offspring, dtype = np.int64))
+    n = np.arange(len(counts))
+
+    return(n, counts/counts.sum(), n*counts/np.sum(n*counts))
+
+
+def cluster_table(tree):
+    """
+    Cluster of each seed case as a DataFrame with columns seed, size, and depth
+    """
+    seed_ids, sizes = cluster_sizes(tree)
+    _, depths = chain_depths(tree)
+    return(pd.DataFrame({"seed": seed_ids, "size": sizes, "depth": depths}))
+
+
+if __name__ == "__main__":
+
+    transmission_file = sys.argv[1]
+    output_file = sys.argv[2]
+
+    tree = read_tree(transmission_file)
+    cluster_table(tree).to_csv(output_file, index = False)
@@ -1,6 +1,13 @@
 #!/usr/bin/env python3
 """
 Figure of waiting-time distributions
+
+Usage:
+    python waiting_time_distributions.py <parameter_file> <output_file> <format> [style]
+
+where style is "first" (distributions of the first parameter set; default), "overlay" (all
+parameter sets of the file), "band" (median and 90% band across parameter sets), or "grid" (small
+multiples, one row per parameter set).
 """
 
 import pandas as pd, numpy as np, sys
@@ -13,13 +20,25 @@ if __name__ == "__main__":
     input_parameter_file = sys.argv[1]
     output_file = sys.argv[2]
     file_format = sys.argv[3]
+    style = sys.argv[4] if len(sys.argv) > 4 else "first"
     
     plt.rcParams["savefig.format"] = file_format
     plt.rcParams['figure.figsize'] = [14, 12]
     
     df_parameters_used = pd.read_csv(input_parameter_file)
     
-    fig, ax = plotting.plot_parameter_assumptions(df_parameters_used)
+    if style == "first":
+        fig, ax = plotting.plot_parameter_assumptions(df_parameters_used)
+    elif style == "overlay":
+        fig, ax = plotting.plot_parameter_assumptions(df_parameters_used, overlay = True)
+    elif style == "band":
+        fig, ax = plotting.plot_parameter_assumptions(df_parameters_used, overlay = True, 
+            quantiles = [0.05, 0.95])
+    elif style == "grid":
+        plt.rcParams['figure.figsize'] = [24, 2*df_parameters_used.shape[0] + 1]
+        fig, ax = plotting.plot_parameter_sets(df_parameters_used)
+    else:
+        raise ValueError("Unknown style: {}".format(style))
 
     plt.savefig(output_file)
     plt.close()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Realised waiting times between disease states in the transmission file compared with the
+distributions assumed in the parameter file (Figure S3)
+
+The waiting time of each transition is the difference of two time_* columns of the transmission
+file (a time of -1 means the state was never reached).  The waiting times of all transitions of
+all infected individuals are binned by day with one np.bincount over combined (transition, days)
+keys, so a run of 1M individuals takes a fraction of a second and runs of an ensemble (processed
+in parallel) are pooled by summing their histograms.  Goodness of fit of each transition is the
+Kolmogorov-Smirnov distance between the empirical CDF and the CDF of the assumed gamma
+distribution rounded to whole days (as drawn by the model), along with the mean and standard
+deviation of realised and assumed waiting times.
+
+    python src/viz/waiting_time_validation.py <parameter_file> <output_file> <format> \
+        <transmission_file> [transmission_file ...] [--n_workers 8]
+
+writes the figure to <output_file> and the statistics to <output_file>.csv.
+"""
+
+from os.path import splitext
+from functools import partial
+from multiprocessing import Pool, cpu_count
+import argparse
+
+import numpy as np, pandas as pd
+from matplotlib import pyplot as plt
+
+import counting, model_output, plotting
+
+# Transitions: stem of the waiting-time parameters (mean_<stem>, sd_<stem>), column of the start
+# and end of the waiting time, and a condition on other columns (a state that must not have been
+# reached) identifying the path through the model
+TRANSITIONS = [
+    ("time_to_symptoms", "time_infected", "time_symptomatic", None),
+    ("time_to_hospital", "time_symptomatic", "time_hospitalised", None),
+    ("time_to_critical", "time_hospitalised", "time_critical", None),
+    ("time_to_death", "time_critical", "time_death", None),
+    ("time_critical_survive", "time_critical", "time_hospitalised_recovering", None),
+    ("time_hospitalised_recovery", "time_hospitalised", "time_recovered", "time_critical"),
+    ("time_to_recover", "time_symptomatic", "time_recovered", "time_hospitalised"),
+    ("asymptomatic_to_recovery", "time_asymptomatic", "time_recovered", None)
+]
+
+TIME_COLUMNS = sorted({col for transition in TRANSITIONS for col in transition[1:] if col})
+
+# Maximum waiting time (days); longer waiting times are counted in the last bin
+MAX_DAYS = 100
+
+
+def waiting_time_counts(df_trans, transitions = TRANSITIONS, max_days = MAX_DAYS):
+    """
+    Histograms of realised waiting times (in days) of each transition, in a single pass
+
+    Arguments
+    ---------
+    df_trans : pandas.DataFrame
+        Transmission file (with the time_* columns of `transitions`)
+    transitions : list of tuples
+        See TRANSITIONS
+    max_days : int
+        Maximum waiting time
+
+    Returns
+    -------
+    np.array (n_transitions, max_days + 1) of counts
+    """
+    times = {col: df_trans[col].values for col in TIME_COLUMNS}
+
+    starts = np.column_stack([times[start] for _, start, end, without in transitions])
+    ends = np.column_stack([times[end] for _, start, end, without in transitions])
+
+    valid = (starts >= 0) & (ends >= starts)
+    for i, (_, start, end, without) in enumerate(transitions):
+        if without is not None:
+            valid[:, i] &= times[without] < 0
+
+    rows, index = np.nonzero(valid)
+    days = np.minimum(ends[rows, index] - starts[rows, index], max_days)
+
+    return(counting.count_tensor((index, days), (len(transitions), max_days + 1)))
+
+
+def run_waiting_time_counts(transmission_file, transitions = TRANSITIONS, max_days = MAX_DAYS):
+    """Histograms of realised waiting times of one run (see `waiting_time_counts`)"""
+    df_trans = model_output.read_transmissions(transmission_file, columns = TIME_COLUMNS)
+    return(waiting_time_counts(df_trans, transitions, max_days))
+
+
+def ensemble_waiting_time_counts(transmission_files, transitions = TRANSITIONS,
+        max_days = MAX_DAYS, n_workers = None):
+    """
+    Histograms of realised waiting times pooled over several runs, with runs processed in parallel
+    over `n_workers` processes (defaults to the number of CPUs)
+    """
+    func = partial(run_waiting_time_counts, transitions = transitions, max_days = max_days)
+
+    if len(transmission_files) == 1:
+        return(func(transmission_files[0]))
+
+    n_workers = n_workers if n_workers else cpu_count()
+    with Pool(processes = min(n_workers, len(transmission_files))) as pool:
+        return(counting.combine_counts(pool.map(func, transmission_files, chunksize = 1)))
+
+
+def assumed_cdfs(df_parameters, transitions = TRANSITIONS, max_days = MAX_DAYS):
+    """
+    CDFs at 0, 1, ..., max_days days of the waiting times assumed in a parameter set, with draws
+    rounded to whole days (time to hospital is the floor or ceiling of its mean)
+
+    Returns
+    -------
+    np.array (n_transitions, max_days + 1)
+    """
+    days = np.arange(max_days + 1)
+    stems = [stem for stem, start, end, without in transitions]
+
+    cdfs = np.zeros((len(stems), max_days + 1))
+    gamma = [i for i, stem in enumerate(stems) if stem != "time_to_hospital"]
+
+    means, sds = plotting.waiting_time_parameters(df_parameters, [stems[i] for i in gamma])
+    cdfs[gamma] = plotting.gamma_distributions(means, sds, days + 0.5, cdf = True)[0]
+
+    if "time_to_hospital" in stems:
+        hospital_days, p = plotting.bernoulli_time_to_hospital(
+            df_parameters.mean_time_to_hospital.values)
+        pmf = np.zeros(max_days + 1)
+        pmf[np.minimum(hospital_days.astype(int), max_days)] = p
+        cdfs[stems.index("time_to_hospital")] = np.cumsum(pmf)
+
+    return(cdfs)
+
+
+def goodness_of_fit(counts, df_parameters, transitions = TRANSITIONS):
+    """
+    Kolmogorov-Smirnov distance between realised and assumed waiting times of each transition,
+    and the means and standard deviations of both
+
+    Arguments
+    ---------
+    counts : np.array (n_transitions, max_days + 1)
+        Histograms of realised waiting times (see `waiting_time_counts`)
+    df_parameters : pandas.DataFrame
+        Parameter set (first row is used)
+
+    Returns
+    -------
+    pandas.DataFrame with one row per transition
+    """
+    df_parameters = df_parameters.iloc[[0]]
+    counts = np.asarray(counts, dtype = float)
+    days = np.arange(counts.shape[1])
+    n = counts.sum(axis = 1)
+
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+        empirical_cdfs = np.cumsum(counts, axis = 1)/n[:, None]
+        mean = counts @ days/n
+        sd = np.sqrt(counts @ days**2/n - mean**2)
+
+    cdfs = assumed_cdfs(df_parameters, transitions, counts.shape[1] - 1)
+    ks = np.max(np.abs(empirical_cdfs - cdfs), axis = 1)
+
+    stems = [stem for stem, start, end, without in transitions]
+    sd_assumed = [df_parameters["sd_" + stem].values[0] if "sd_" + stem in df_parameters
+        else np.nan for stem in stems]
+
+    return(pd.DataFrame({"transition": stems,
+        "start": [start for _, start, end, without in transitions],
+        "end": [end for _, start, end, without in transitions],
+        "n": n.astype(np.int64), "mean": mean, "mean_assumed":
+        [df_parameters["mean_" + stem].values[0] for stem in stems],
+        "sd": sd, "sd_assumed": sd_assumed, "ks_distance": np.where(n > 0, ks, np.nan)}))
+
+
+def figure_waiting_time_validation(counts, df_parameters, transitions = TRANSITIONS,
+        xlimits = [0, 30]):
+    """
+    Figure S3 (assumed distributions of the first parameter set) with the distribution of
+    realised waiting times of each transition overlaid
+
+    Returns
+    -------
+    fig, ax : figure and axis handles to the generated figure using matplotlib.pyplot
+    """
+    fig, ax = plotting.plot_parameter_assumptions(df_parameters, xlimits)
+
+    panels = {stem: panel for stem, panel, xlabel in plotting.GAMMA_WAITING_TIMES}
+    panels["time_to_hospital"] = (0, 0)
+
+    counts = np.asarray(counts, dtype = float)
+    days = np.arange(counts.shape[1])
+    shown = days <= xlimits[1]
+
+    for i, (stem, start, end, without) in enumerate(transitions):
+        if stem not in panels or counts[i].sum() == 0:
+            continue
+        row, col = panels[stem]
+        ax[row, col].bar(days[shown], counts[i, shown]/counts[i].sum(), width = 0.8,
+            color = "#D55E00", alpha = 0.4, label = "Realised")
+
+    ax[0, 0].legend(frameon = False)
+
+    return(fig, ax)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = __doc__.split("\n\n")[0])
+    parser.add_argument("input_parameter_file", help = "Parameter file (first row is used)")
+    parser.add_argument("output_file", help = "Output figure (statistics are written to CSV)")
+    parser.add_argument("file_format", help = "File format of the figure")
+    parser.add_argument("transmission_files", nargs = "+",
+        help = "Transmission file of each run")
+    parser.add_argument("--n_workers", type = int,
+        help = "Number of worker processes (defaults to number of CPUs)", default = None)
+    args = parser.parse_args()
+
+    plt.rcParams["savefig.format"] = args.file_format
+    plt.rcParams['figure.figsize'] = [14, 12]
+
+    df_parameters = pd.read_csv(args.input_parameter_file)
+
+    counts = ensemble_waiting_time_counts(args.transmission_files, n_workers = args.n_workers)
+
+    df_gof = goodness_of_fit(counts, df_parameters)
+    df_gof.to_csv(splitext(args.output_file)[0] + ".csv", index = False)
+
+    fig, ax = figure_waiting_time_validation(counts, df_parameters)
+
+    plt.savefig(args.output_file)
+    plt.close()